@@ -2,8 +2,19 @@ from django.contrib import admin
 from django.utils.html import format_html
 from .models import (
     CourseModel, VideoModel, SessionModel,
-    NotesModel, ImageModel, QAModel, BookmarkModel
+    NotesModel, ImageModel, QAModel, BookmarkModel, IngestionJob, MCQGenerationJob,
+    MCQBankQuestion
 )
+from .negative_cache import negative_cache
+
+
+@admin.action(description="Clear cached transcript/metadata failures")
+def clear_negative_cache(modeladmin, request, queryset):
+    video_ids = set(queryset.values_list('youtube_video_id', flat=True))
+    for video_id in video_ids:
+        negative_cache.clear(video_id)
+    modeladmin.message_user(request, f"Cleared negative cache entries for {len(video_ids)} video(s).")
+
 
 class CourseModelAdmin(admin.ModelAdmin):
     list_display = ('course_name', 'user', 'created_at', 'is_active')
@@ -24,6 +35,7 @@ class VideoModelAdmin(admin.ModelAdmin):
     raw_id_fields = ('user',)
     readonly_fields = ('created_at', 'last_accessed_at', 'youtube_thumbnail_preview')
     date_hierarchy = 'created_at'
+    actions = [clear_negative_cache]
 
     def youtube_id_link(self, obj):
         return format_html(
@@ -167,10 +179,36 @@ class BookmarkModelAdmin(admin.ModelAdmin):
         return obj.note[:50] + '...' if obj.note and len(obj.note) > 50 else (obj.note or "-")
     truncated_note.short_description = "Note"
 
+class IngestionJobAdmin(admin.ModelAdmin):
+    list_display = ('youtube_video_id', 'kind', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('youtube_video_id',)
+    readonly_fields = ('created_at', 'updated_at', 'locked_at', 'last_error')
+    actions = [clear_negative_cache]
+
+class MCQGenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'session', 'language', 'status', 'stage', 'progress', 'attempts', 'updated_at')
+    list_filter = ('status', 'stage')
+    raw_id_fields = ('session',)
+    readonly_fields = ('created_at', 'updated_at', 'locked_at', 'last_error', 'mcqs')
+
+class MCQBankQuestionAdmin(admin.ModelAdmin):
+    list_display = ('youtube_video_id', 'language', 'short_question', 'difficulty', 'question_type', 'created_at')
+    list_filter = ('difficulty', 'question_type')
+    search_fields = ('youtube_video_id', 'question_text')
+    readonly_fields = ('created_at',)
+
+    def short_question(self, obj):
+        return obj.question_text[:50] + '...' if len(obj.question_text) > 50 else obj.question_text
+    short_question.short_description = "Question"
+
 admin.site.register(CourseModel, CourseModelAdmin)
 admin.site.register(VideoModel, VideoModelAdmin)
 admin.site.register(SessionModel, SessionModelAdmin)
 admin.site.register(NotesModel, NotesModelAdmin)
 admin.site.register(ImageModel, ImageModelAdmin)
 admin.site.register(QAModel, QAModelAdmin)
-admin.site.register(BookmarkModel, BookmarkModelAdmin)
\ No newline at end of file
+admin.site.register(BookmarkModel, BookmarkModelAdmin)
+admin.site.register(IngestionJob, IngestionJobAdmin)
+admin.site.register(MCQGenerationJob, MCQGenerationJobAdmin)
+admin.site.register(MCQBankQuestion, MCQBankQuestionAdmin)
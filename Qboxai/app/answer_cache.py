@@ -0,0 +1,77 @@
+import hashlib
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+
+from . import metrics
+from .cache import TwoTierCache
+
+ENABLED = getattr(settings, 'ANSWER_CACHE_ENABLED', True)
+# Questions asked within the same bucket of the video share an answer; the
+# transcript window is ±60s, so a 30s bucket keeps the context nearly identical
+BUCKET_SECONDS = getattr(settings, 'ANSWER_CACHE_BUCKET_SECONDS', 30)
+
+_space_re = re.compile(r'\s+')
+_strip_re = re.compile(r'[^\w\s]')
+
+
+def normalize_question(question):
+    """Case-, Unicode-form-, whitespace- and punctuation-insensitive form of a question."""
+    text = unicodedata.normalize('NFKC', question).casefold()
+    text = _strip_re.sub(' ', text)
+    return _space_re.sub(' ', text).strip()
+
+
+class AnswerCache:
+    """
+    LLM answers keyed by video, transcript language, timestamp bucket and
+    normalized question. Each entry remembers how long the LLM call took, so
+    hits report the latency they saved.
+    """
+
+    def __init__(self, name="answers", bucket_seconds=BUCKET_SECONDS, enabled=ENABLED, **cache_kwargs):
+        self.bucket_seconds = bucket_seconds
+        self.enabled = enabled
+        self._cache = TwoTierCache(name, **cache_kwargs)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "saved_seconds": 0.0}
+        metrics.register_provider(f"answer_cache.{name}", self.stats)
+
+    def key(self, video_id, language, time_stamp, question):
+        """``language`` is the transcript's language, or None when the answer was made without one."""
+        digest = hashlib.sha1(normalize_question(question).encode('utf-8')).hexdigest()
+        bucket = int(time_stamp) // self.bucket_seconds
+        return f"{video_id}:{language or '-'}:{bucket}:{digest}"
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        entry = self._cache.get(key)
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["saved_seconds"] += entry["latency"]
+        metrics.observe("answer_cache.saved", entry["latency"])
+        return entry["answer"]
+
+    def set(self, key, answer, latency):
+        if self.enabled and answer:
+            self._cache.set(key, {"answer": answer, "latency": latency})
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+        return stats
+
+
+answer_cache = AnswerCache(
+    max_entries=getattr(settings, 'ANSWER_CACHE_MAX_ENTRIES', 4096),
+    ttl=getattr(settings, 'ANSWER_CACHE_TTL', 60 * 60 * 24),
+)
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class App1Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from .transcript_search import ensure_search_index_after_migrate
+
+        # Later migrations that rebuild the segment table drop the SQLite FTS triggers
+        post_migrate.connect(ensure_search_index_after_migrate, sender=self)
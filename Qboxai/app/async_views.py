@@ -0,0 +1,350 @@
+"""
+Async versions of the hot endpoints for ASGI deployments.
+
+Under ``core.asgi:application`` (e.g. ``gunicorn core.asgi:application -k
+uvicorn.workers.UvicornWorker``) these views await RapidAPI and Gemini calls
+instead of holding a worker thread, so one process can keep hundreds of LLM
+requests in flight. They accept the same input and return the same payloads
+as their sync counterparts in views.py.
+"""
+import json
+import logging
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views import View
+from rest_framework import status
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .models import SessionModel, VideoModel
+from .serializers import (
+    YoutubeSerializer,
+    ImageUploadSerializer,
+    YoutubeTranscriptSerializer,
+    TranscriptBucketSerializer,
+    MCQModelSerializer,
+)
+from .llm_limiter import LLMOverloaded
+from .mcq_bank import draw_mcqs, top_up_bank
+from .mcq_generation import agenerate_mcqs
+from .mcq_jobs import async_requested, enqueue_mcq_job, mcq_payload
+from .qa_flow import (
+    RequestRejected, AskAnswer, build_ask_prompt, check_ask_limit, check_clip_limit, clip_contents, clip_jpeg,
+    llm_failures, open_session, require_answer, require_title, require_video_id, save_clip, validated,
+)
+from .llm import llm_registry, VISION_MODEL
+from .streaming import asse_completion, sse_response
+from .transcript_index import get_transcript_buckets
+from .utils import (
+    extract_youtube_video_id,
+    get_video_title_with_cache,
+    aget_or_fetch_best_transcript,
+    transcript_negative_reason,
+    agenerate_ai_response,
+    astream_ai_response,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Title lookups still go through the sync YouTube API client / yt-dlp, off the event loop
+aget_video_title_with_cache = sync_to_async(get_video_title_with_cache, thread_sensitive=False)
+
+
+class AsyncAPIView(View):
+    """JWT-authenticated, CSRF-exempt base for async JSON views."""
+
+    authenticator = JWTAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            result = await sync_to_async(self.authenticator.authenticate)(request)
+        except (InvalidToken, TokenError) as e:
+            return JsonResponse({"detail": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+        if result is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        request.user = result[0]
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except RequestRejected as e:
+            return JsonResponse(e.payload, status=e.status_code)
+        except LLMOverloaded as e:
+            response = JsonResponse({"success": False, "message": str(e.detail)}, status=e.status_code)
+            response['Retry-After'] = str(e.wait)
+            return response
+
+    def get_data(self, request):
+        if request.content_type == 'application/json':
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError:
+                return {}
+        data = request.POST.dict()
+        data.update(request.FILES.dict())
+        return data
+
+
+class AsyncAskQuestionAPIView(AsyncAPIView):
+
+    async def post(self, request):
+        request_started = time.monotonic()
+        user = request.user
+
+        data = validated(YoutubeSerializer(data=self.get_data(request)), "Invalid input data.")
+        video_url = data['youtube_video_url']
+        question = data['question']
+        time_stamp = int(data['time_stamp'])
+
+        video_id = require_video_id(video_url)
+        video_title = require_title(await aget_video_title_with_cache(video_id, settings.YOUTUBE_API_KEY))
+        session, _ = await sync_to_async(open_session)(user, video_id, video_title, video_url)
+        await sync_to_async(check_ask_limit)(user, session)
+
+        transcript_obj, _ = await aget_or_fetch_best_transcript(video_id, data.get('language'), lazy=True)
+        prompt, transcript_segment = await sync_to_async(build_ask_prompt, thread_sensitive=False)(
+            transcript_obj, question, time_stamp, video_id, video_title, video_url
+        )
+
+        ask = AskAnswer(
+            session, question, time_stamp, video_id,
+            transcript_obj.language if transcript_obj else None, data['use_cache'],
+        )
+        answer = await sync_to_async(ask.lookup, thread_sensitive=False)()
+
+        if data['stream']:
+            async def save_answer(full_answer):
+                return await sync_to_async(ask.save)(full_answer, time.monotonic() - llm_started)
+
+            async def cached_tokens():
+                yield answer
+
+            llm_started = time.monotonic()
+            return sse_response(asse_completion(
+                cached_tokens() if ask.cached else astream_ai_response(prompt),
+                request_started, "ask.stream", save_answer,
+                meta={'transcript_segment': transcript_segment, 'cached': ask.cached},
+            ))
+
+        generation_seconds = None
+        if not ask.cached:
+            started = time.monotonic()
+            with llm_failures("Gemini API failed"):
+                answer = require_answer(await agenerate_ai_response(prompt))
+            generation_seconds = time.monotonic() - started
+
+        return JsonResponse({
+            "success": True,
+            "message": "Q&A created successfully.",
+            "data": {
+                **await sync_to_async(ask.save)(answer, generation_seconds),
+                'transcript_segment': transcript_segment,
+            }
+        }, status=status.HTTP_201_CREATED)
+
+
+class AsyncClipTabAPIView(AsyncAPIView):
+
+    async def post(self, request):
+        request_started = time.monotonic()
+        user = request.user
+
+        data = validated(
+            ImageUploadSerializer(data=self.get_data(request), context={'request': request}), "Invalid data submitted."
+        )
+        youtube_url = data['youtube_video_url']
+        time_stamp = data['time_stamp']
+        image = data['image']
+        question = (data.get('question') or "").strip()
+        answer = ""
+
+        video_id = require_video_id(youtube_url)
+        video_title = require_title(
+            await aget_video_title_with_cache(video_id), "Failed to retrieve video title from YouTube."
+        )
+        session, created = await sync_to_async(open_session)(user, video_id, video_title, youtube_url)
+        session_status = "New session created" if created else "Session resumed"
+        await sync_to_async(check_clip_limit)(user, session)
+
+        if question and data['stream']:
+            with llm_failures("Gemini image model processing failed"):
+                image_bytes = await sync_to_async(clip_jpeg, thread_sensitive=False)(image)
+
+            async def save(full_answer):
+                return await sync_to_async(save_clip)(
+                    request, session, session_status, image, question, full_answer, time_stamp
+                )
+
+            return sse_response(asse_completion(
+                astream_ai_response(clip_contents(question, image_bytes), model_name=VISION_MODEL),
+                request_started, "cliptab.stream", save,
+            ))
+
+        if question:
+            with llm_failures("Gemini image model processing failed"):
+                image_bytes = await sync_to_async(clip_jpeg, thread_sensitive=False)(image)
+                answer = await llm_registry.agenerate(clip_contents(question, image_bytes), model=VISION_MODEL)
+
+        return JsonResponse({
+            "success": True,
+            "message": "Image clip created successfully.",
+            "data": await sync_to_async(save_clip)(
+                request, session, session_status, image, question, answer, time_stamp
+            )
+        }, status=status.HTTP_201_CREATED)
+
+
+class AsyncYoutubeTranscriptView(AsyncAPIView):
+
+    async def post(self, request):
+        bucket_serializer = TranscriptBucketSerializer(data=request.GET)
+        if not bucket_serializer.is_valid():
+            return JsonResponse({
+                "success": False,
+                "message": "Invalid bucket size.",
+                "errors": bucket_serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        bucket_minutes = bucket_serializer.validated_data.get('bucket', 5)
+
+        serializer = YoutubeTranscriptSerializer(data=self.get_data(request))
+        if not serializer.is_valid():
+            return JsonResponse({
+                "success": False,
+                "message": "Invalid input data.",
+                "errors": serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        video_url = serializer.validated_data['youtube_video_url']
+
+        video_id = extract_youtube_video_id(video_url)
+        if not video_id:
+            return JsonResponse({
+                "success": False,
+                "message": "Invalid YouTube URL."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        video_title = await aget_video_title_with_cache(video_id)
+        if not video_title:
+            return JsonResponse({
+                "success": False,
+                "message": "Could not retrieve video title."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        video, _ = await VideoModel.objects.aget_or_create(
+            youtube_video_id=video_id,
+            defaults={'video_title': video_title, 'video_url': video_url, 'user': user}
+        )
+        session, created = await SessionModel.objects.aget_or_create(user=user, video=video)
+        session_status = "New session created" if created else "Session resumed"
+
+        transcript_obj, transcript_source = await aget_or_fetch_best_transcript(
+            video_id, serializer.validated_data.get('language'), lazy=True
+        )
+        formatted_segments = (
+            await sync_to_async(get_transcript_buckets)(transcript_obj, bucket_minutes)
+            if transcript_obj else None
+        )
+
+        if not formatted_segments:
+            return JsonResponse({
+                "success": False,
+                "message": "No transcript available for this video. Try with a video that has subtitles.",
+                "reason": await sync_to_async(transcript_negative_reason)(video_id, serializer.validated_data.get('language'))
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return JsonResponse({
+            "success": True,
+            "message": f"Transcript split successfully from {transcript_source}.",
+            "video_title": video_title,
+            "video_url": video_url,
+            "session_id": session.id,
+            "session_status": session_status,
+            "transcript_segments": formatted_segments,
+            "transcript_language": transcript_obj.language,
+            "transcript_source": transcript_source
+        }, status=status.HTTP_200_OK)
+
+
+class AsyncGenerateMCQsAPIView(AsyncAPIView):
+
+    async def post(self, request):
+        user = request.user
+        data = self.get_data(request)
+        youtube_url = data.get("youtube_url")
+
+        if not youtube_url:
+            return JsonResponse({"success": False, "message": "youtube_url is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        video_id = extract_youtube_video_id(youtube_url)
+        if not video_id:
+            return JsonResponse({"success": False, "message": "Invalid YouTube URL."}, status=status.HTTP_400_BAD_REQUEST)
+
+        video_title = await aget_video_title_with_cache(video_id, settings.YOUTUBE_API_KEY)
+        if not video_title:
+            return JsonResponse({"success": False, "message": "Could not retrieve video title."}, status=status.HTTP_400_BAD_REQUEST)
+
+        video, _ = await VideoModel.objects.aget_or_create(
+            user=user,
+            youtube_video_id=video_id,
+            defaults={'video_title': video_title, 'video_url': youtube_url}
+        )
+        session, _ = await SessionModel.objects.aget_or_create(user=user, video=video)
+
+        try:
+            transcript_obj, _ = await aget_or_fetch_best_transcript(video_id, data.get("language"))
+        except Exception:
+            logger.exception("Transcript fetch failed.")
+            return JsonResponse({"success": False, "message": "Transcript fetch failed."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if not transcript_obj or not transcript_obj.get_text():
+            return JsonResponse({
+                "success": False,
+                "message": "No transcript data found for this video."
+            }, status=status.HTTP_404_NOT_FOUND)
+        language = transcript_obj.language
+
+        saved_mcqs = await sync_to_async(draw_mcqs)(session, language)
+        if saved_mcqs:
+            mcq_data = await sync_to_async(lambda: MCQModelSerializer(saved_mcqs, many=True).data)()
+            return JsonResponse(mcq_payload(
+                video_id, f"{len(saved_mcqs)} MCQs drawn from the question bank.", mcq_data,
+            ), status=status.HTTP_201_CREATED)
+
+        if async_requested(data):
+            job, created = await sync_to_async(enqueue_mcq_job)(session, language)
+            return JsonResponse(mcq_payload(
+                video_id, "MCQ generation queued." if created else "MCQ generation already in progress.",
+                job=job, status_url=request.build_absolute_uri(reverse('mcq-job-status', args=[job.id])),
+            ), status=status.HTTP_202_ACCEPTED)
+
+        try:
+            # Through the bank's single-flight, so concurrent requests (sync or async) share one
+            # generation; the LLM calls themselves still run on this event loop
+            await sync_to_async(top_up_bank)(
+                video_id, language, lambda: async_to_sync(agenerate_mcqs)(transcript_obj)
+            )
+        except LLMOverloaded:
+            raise
+        except Exception:
+            logger.exception("MCQ generation failed")
+            return JsonResponse({"success": False, "message": "Failed to generate MCQs."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        saved_mcqs = await sync_to_async(draw_mcqs)(session, language, minimum=1)
+        if not saved_mcqs:
+            return JsonResponse({"success": False, "message": "Parsing Gemini response failed."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        mcq_data = await sync_to_async(lambda: MCQModelSerializer(saved_mcqs, many=True).data)()
+        return JsonResponse(mcq_payload(
+            video_id, f"{len(saved_mcqs)} MCQs generated successfully.", mcq_data,
+        ), status=status.HTTP_201_CREATED)
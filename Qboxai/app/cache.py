@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TwoTierCache:
+    """
+    In-process LRU with a size cap and TTL, backed by the Django cache framework.
+
+    Lookups hit the local LRU first, then the shared backend (Redis in
+    production, see ``CACHES`` in settings). Shared hits are promoted into the
+    local tier so repeat reads inside a worker never leave the process.
+    ``None`` is never stored; a ``get`` returning ``None`` is always a miss.
+    """
+
+    def __init__(self, name, max_entries=256, ttl=60 * 60 * 24, local_ttl=None, alias='default', shared=True):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local_ttl = local_ttl or ttl
+        self.alias = alias
+        self.shared = shared
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "local_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "sets": 0,
+            "backend_errors": 0,
+        }
+        metrics.register_provider(f"cache.{name}", self.stats)
+
+    def _shared_key(self, key):
+        return f"{self.name}:{key}"
+
+    def _backend(self):
+        return caches[self.alias]
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._stats["expirations"] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats["local_hits"] += 1
+            return value
+
+    def _set_local(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get(self, key, default=None):
+        value = self._get_local(key)
+        if value is not None:
+            return value
+
+        if self.shared:
+            try:
+                value = self._backend().get(self._shared_key(key))
+            except Exception as e:
+                self._count("backend_errors")
+                logger.warning(f"Shared cache read failed for {self.name}:{key}: {e}")
+                value = None
+
+            if value is not None:
+                self._count("shared_hits")
+                self._set_local(key, value, self.local_ttl)
+                return value
+
+        self._count("misses")
+        return default
+
+    def get_shared(self, key, default=None):
+        """Like ``get`` but always reads the shared tier, refreshing the local copy."""
+        if not self.shared:
+            return self.get(key, default)
+        try:
+            value = self._backend().get(self._shared_key(key))
+        except Exception as e:
+            self._count("backend_errors")
+            logger.warning(f"Shared cache read failed for {self.name}:{key}: {e}")
+            return self.get(key, default)
+
+        if value is None:
+            with self._lock:
+                self._data.pop(key, None)
+            return default
+        self._set_local(key, value, self.local_ttl)
+        return value
+
+    def set(self, key, value, ttl=None):
+        if value is None:
+            return
+        ttl = ttl or self.ttl
+        self._count("sets")
+        self._set_local(key, value, min(ttl, self.local_ttl))
+
+        if self.shared:
+            try:
+                self._backend().set(self._shared_key(key), value, timeout=ttl)
+            except Exception as e:
+                self._count("backend_errors")
+                logger.warning(f"Shared cache write failed for {self.name}:{key}: {e}")
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+        if self.shared:
+            try:
+                self._backend().delete(self._shared_key(key))
+            except Exception as e:
+                self._count("backend_errors")
+                logger.warning(f"Shared cache delete failed for {self.name}:{key}: {e}")
+
+    def get_or_set(self, key, loader, ttl=None):
+        """Return the cached value for ``key`` or call ``loader()`` and cache its result."""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def clear_local(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._data)
+        stats["max_entries"] = self.max_entries
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["local_hits"] + stats["shared_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+transcript_cache = TwoTierCache(
+    "transcript",
+    max_entries=getattr(settings, 'TRANSCRIPT_CACHE_MAX_ENTRIES', 128),
+    ttl=getattr(settings, 'TRANSCRIPT_CACHE_TTL', 60 * 60 * 24),
+)
+video_title_cache = TwoTierCache(
+    "video_title",
+    max_entries=getattr(settings, 'VIDEO_TITLE_CACHE_MAX_ENTRIES', 4096),
+    ttl=getattr(settings, 'VIDEO_TITLE_CACHE_TTL', 60 * 60 * 24),
+)
+transcript_languages_cache = TwoTierCache(
+    "transcript_languages",
+    max_entries=getattr(settings, 'TRANSCRIPT_LANGUAGES_CACHE_MAX_ENTRIES', 4096),
+    ttl=getattr(settings, 'TRANSCRIPT_LANGUAGES_CACHE_TTL', 60 * 60 * 24),
+)
+video_metadata_cache = TwoTierCache(
+    "video_metadata",
+    max_entries=getattr(settings, 'VIDEO_TITLE_CACHE_MAX_ENTRIES', 4096),
+    ttl=getattr(settings, 'VIDEO_TITLE_CACHE_TTL', 60 * 60 * 24),
+)
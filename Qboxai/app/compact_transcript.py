@@ -0,0 +1,128 @@
+import struct
+import zlib
+from array import array
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is used when it is not installed
+    zstandard = None
+
+
+_MAGIC = b'QBT1'
+_CODEC_ZSTD = b'z'
+_CODEC_ZLIB = b'l'
+
+
+class CompactTranscript:
+    """
+    Array-backed transcript: ``array('d')`` starts and durations, one text
+    buffer and an offsets array instead of a list of per-segment dicts.
+
+    Segment ``i`` spans ``text[offsets[i]:offsets[i + 1]]``. ``to_segments()``
+    rebuilds the ``[{'text', 'start', 'duration'}]`` shape the API returns.
+    """
+
+    __slots__ = ('starts', 'durations', 'offsets', 'text')
+
+    def __init__(self, starts, durations, offsets, text):
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets
+        self.text = text
+
+    @classmethod
+    def from_segments(cls, segments):
+        starts = array('d')
+        durations = array('d')
+        offsets = array('Q', [0])
+        texts = []
+        position = 0
+        for seg in segments or []:
+            text = seg.get('text', '')
+            starts.append(float(seg.get('start', 0)))
+            durations.append(float(seg.get('duration', 0)))
+            texts.append(text)
+            position += len(text)
+            offsets.append(position)
+        return cls(starts, durations, offsets, "".join(texts))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def segment_text(self, i):
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def segment(self, i):
+        return {'text': self.segment_text(i), 'start': self.starts[i], 'duration': self.durations[i]}
+
+    def segments(self, lo=0, hi=None):
+        hi = len(self) if hi is None else hi
+        return [self.segment(i) for i in range(lo, hi)]
+
+    def texts(self, lo=0, hi=None):
+        hi = len(self) if hi is None else hi
+        return [self.segment_text(i) for i in range(lo, hi)]
+
+    def to_segments(self):
+        return self.segments()
+
+    @property
+    def full_text(self):
+        return " ".join(self.texts())
+
+    def as_dict(self):
+        """The ``{"segments", "full_text"}`` shape returned by ``get_transcript_with_cache``."""
+        return {"segments": self.to_segments(), "full_text": self.full_text}
+
+    def is_sorted(self):
+        starts = self.starts
+        return all(starts[i] <= starts[i + 1] for i in range(len(starts) - 1))
+
+    def to_bytes(self):
+        text = self.text.encode('utf-8')
+        payload = b"".join([
+            struct.pack('<II', len(self), len(text)),
+            self.starts.tobytes(),
+            self.durations.tobytes(),
+            self.offsets.tobytes(),
+            text,
+        ])
+        if zstandard is not None:
+            return _MAGIC + _CODEC_ZSTD + zstandard.ZstdCompressor(level=6).compress(payload)
+        return _MAGIC + _CODEC_ZLIB + zlib.compress(payload, 6)
+
+    @classmethod
+    def from_bytes(cls, blob):
+        blob = bytes(blob)
+        if blob[:4] != _MAGIC:
+            raise ValueError("Not a compact transcript blob.")
+        codec, body = blob[4:5], blob[5:]
+        if codec == _CODEC_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Transcript blob is zstd-compressed but zstandard is not installed.")
+            payload = zstandard.ZstdDecompressor().decompress(body)
+        elif codec == _CODEC_ZLIB:
+            payload = zlib.decompress(body)
+        else:
+            raise ValueError(f"Unknown transcript blob codec {codec!r}.")
+
+        count, text_size = struct.unpack_from('<II', payload)
+        position = 8
+        arrays = []
+        for typecode, length in (('d', count), ('d', count), ('Q', count + 1)):
+            values = array(typecode)
+            size = values.itemsize * length
+            values.frombytes(payload[position:position + size])
+            arrays.append(values)
+            position += size
+        text = payload[position:position + text_size].decode('utf-8')
+        return cls(arrays[0], arrays[1], arrays[2], text)
+
+    # Pickled (e.g. into the shared Redis cache tier) as the compressed blob
+    def __getstate__(self):
+        return self.to_bytes()
+
+    def __setstate__(self, state):
+        other = CompactTranscript.from_bytes(state)
+        for name in self.__slots__:
+            setattr(self, name, getattr(other, name))
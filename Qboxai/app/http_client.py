@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = getattr(settings, 'HTTP_CONNECT_TIMEOUT', 3.05)
+READ_TIMEOUT = getattr(settings, 'HTTP_READ_TIMEOUT', 20)
+POOL_MAXSIZE = getattr(settings, 'HTTP_POOL_MAXSIZE', 20)
+MAX_RETRIES = getattr(settings, 'HTTP_MAX_RETRIES', 2)
+BACKOFF_SECONDS = getattr(settings, 'HTTP_BACKOFF_SECONDS', 0.5)
+MAX_RETRY_AFTER_SECONDS = 10
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(host):
+    """One keep-alive ``requests.Session`` (and connection pool) per upstream host."""
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sessions[host] = session
+    return session
+
+
+def _retry_delay(attempt, response=None):
+    if response is not None and response.headers.get("Retry-After", "").isdigit():
+        return min(int(response.headers["Retry-After"]), MAX_RETRY_AFTER_SECONDS)
+    # Full jitter so retries from many workers do not arrive in lockstep
+    return random.uniform(0, BACKOFF_SECONDS * (2 ** attempt))
+
+
+def request(method, url, timeout=None, retries=None, **kwargs):
+    """
+    Send a request through the pooled session for the URL's host.
+
+    ``timeout`` defaults to (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT). Idempotent
+    methods are retried on connection errors, timeouts and 429/5xx responses;
+    other methods are sent once unless ``retries`` is given explicitly.
+    """
+    method = method.upper()
+    host = urlparse(url).hostname or "unknown"
+    session = get_session(host)
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if retries is None:
+        retries = MAX_RETRIES if method in IDEMPOTENT_METHODS else 0
+
+    for attempt in range(retries + 1):
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metrics.observe(f"http.{host}", time.monotonic() - started)
+            metrics.incr(f"http.{host}.errors")
+            if attempt >= retries:
+                raise
+            logger.warning(f"{method} {host} failed ({e}); retrying (attempt {attempt + 1}/{retries}).")
+            time.sleep(_retry_delay(attempt))
+            continue
+
+        metrics.observe(f"http.{host}", time.monotonic() - started)
+        metrics.incr(f"http.{host}.{response.status_code // 100}xx")
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            logger.warning(f"{method} {host} returned {response.status_code}; retrying (attempt {attempt + 1}/{retries}).")
+            time.sleep(_retry_delay(attempt, response))
+            continue
+        return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+class AsyncResponse:
+    """Buffered response returned by ``arequest`` (mirrors the bits of requests.Response we use)."""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+# One aiohttp session (and connection pool) per event loop. Under ASGI there
+# is a single long-lived loop per worker process.
+_async_sessions = {}
+
+
+def _get_async_session():
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        for stale_loop in [other for other in _async_sessions if other.is_closed()]:
+            _async_sessions.pop(stale_loop, None)
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=POOL_MAXSIZE, ttl_dns_cache=300),
+        )
+        _async_sessions[loop] = session
+    return session
+
+
+async def arequest(method, url, timeout=None, retries=None, **kwargs):
+    """Async counterpart of ``request`` with the same timeout, retry and metrics behaviour."""
+    method = method.upper()
+    host = urlparse(url).hostname or "unknown"
+    connect_timeout, read_timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    client_timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+    if retries is None:
+        retries = MAX_RETRIES if method in IDEMPOTENT_METHODS else 0
+
+    session = _get_async_session()
+    for attempt in range(retries + 1):
+        started = time.monotonic()
+        try:
+            async with session.request(method, url, timeout=client_timeout, **kwargs) as resp:
+                response = AsyncResponse(resp.status, resp.headers, await resp.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            metrics.observe(f"http.{host}", time.monotonic() - started)
+            metrics.incr(f"http.{host}.errors")
+            if attempt >= retries:
+                raise
+            logger.warning(f"{method} {host} failed ({e!r}); retrying (attempt {attempt + 1}/{retries}).")
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+
+        metrics.observe(f"http.{host}", time.monotonic() - started)
+        metrics.incr(f"http.{host}.{response.status_code // 100}xx")
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            logger.warning(f"{method} {host} returned {response.status_code}; retrying (attempt {attempt + 1}/{retries}).")
+            await asyncio.sleep(_retry_delay(attempt, response))
+            continue
+        return response
+
+
+async def aget(url, **kwargs):
+    return await arequest("GET", url, **kwargs)
@@ -0,0 +1,168 @@
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import metrics
+from .models import IngestionJob, TranscriptModel, VideoModel
+from .utils import available_transcript_language_codes, get_or_fetch_transcript, get_video_title_with_cache
+from .youtube_metadata import apply_video_metadata, get_video_metadata
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'INGESTION_MAX_ATTEMPTS', 5)
+BACKOFF_SECONDS = getattr(settings, 'INGESTION_BACKOFF_SECONDS', 30)
+# Running jobs whose worker died are picked up again after this long
+STALE_AFTER_SECONDS = getattr(settings, 'INGESTION_STALE_AFTER_SECONDS', 10 * 60)
+INGEST_LANGUAGES = getattr(settings, 'TRANSCRIPT_INGEST_LANGUAGES', ['en'])
+
+
+class IngestionError(Exception):
+    pass
+
+
+def enqueue_ingestion(video_id, kinds=(IngestionJob.KIND_TRANSCRIPT, IngestionJob.KIND_METADATA)):
+    """
+    Queue background fetches for a newly registered video. Kinds that are
+    already warm (or done), or already have a pending/running job, are skipped.
+    Returns the kinds that were queued.
+    """
+    done = set(
+        IngestionJob.objects.filter(youtube_video_id=video_id, status=IngestionJob.STATUS_DONE)
+        .values_list('kind', flat=True)
+    )
+    queued = []
+    for kind in kinds:
+        if kind in done:
+            continue
+        if kind == IngestionJob.KIND_TRANSCRIPT and TranscriptModel.objects.filter(youtube_video_id=video_id).exists():
+            continue
+        try:
+            with transaction.atomic():
+                IngestionJob.objects.create(youtube_video_id=video_id, kind=kind)
+        except IntegrityError:
+            continue  # an active job for this video and kind already exists
+        queued.append(kind)
+        metrics.incr(f"ingestion.{kind}.enqueued")
+    return queued
+
+
+def claim_jobs(limit=10, model=IngestionJob, stale_after=STALE_AFTER_SECONDS):
+    """
+    Atomically mark up to ``limit`` due jobs as running and return them.
+    ``model`` is any job table with the IngestionJob status/run_after/locked_at fields.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=stale_after)
+    due = (
+        model.objects.filter(status=model.STATUS_PENDING, run_after__lte=now)
+        | model.objects.filter(status=model.STATUS_RUNNING, locked_at__lt=stale_before)
+    ).order_by('run_after')
+
+    if not connection.features.has_select_for_update_skip_locked:
+        # No row locks (SQLite): each job is taken with a compare-and-set on the
+        # state it was read in, so two workers can never both claim it
+        jobs = [job for job in due[:limit] if _claim(model, job, now)]
+    else:
+        with transaction.atomic():
+            jobs = list(due.select_for_update(skip_locked=True)[:limit])
+            model.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=model.STATUS_RUNNING, locked_at=now
+            )
+    for job in jobs:
+        job.status, job.locked_at = model.STATUS_RUNNING, now
+    return jobs
+
+
+def _claim(model, job, now):
+    """Mark ``job`` running unless another worker changed it since it was read."""
+    claimed = model.objects.filter(pk=job.pk, status=job.status, locked_at=job.locked_at).update(
+        status=model.STATUS_RUNNING, locked_at=now
+    )
+    return claimed == 1
+
+
+def ingest_languages(video_id):
+    """
+    TRANSCRIPT_INGEST_LANGUAGES the video actually has. When it has none of them,
+    its first listed language, so every video ends up with some transcript.
+    """
+    available = available_transcript_language_codes(video_id)
+    if not available:
+        return list(INGEST_LANGUAGES)
+    return [code for code in INGEST_LANGUAGES if code in available] or available[:1]
+
+
+def _run_transcript_job(job):
+    stored = [
+        language for language in ingest_languages(job.youtube_video_id)
+        if get_or_fetch_transcript(job.youtube_video_id, lazy=True, language=language)[0]
+    ]
+    if not stored:
+        raise IngestionError("No transcript returned by provider.")
+
+
+def _run_metadata_job(job):
+    if settings.YOUTUBE_API_KEY:
+        # Title and duration in one videos.list call
+        try:
+            metadata = get_video_metadata([job.youtube_video_id], settings.YOUTUBE_API_KEY)
+        except Exception as e:
+            logger.warning(f"YouTube metadata lookup failed for {job.youtube_video_id}: {e}")
+        else:
+            if metadata:
+                apply_video_metadata(metadata)
+                return
+
+    title = get_video_title_with_cache(job.youtube_video_id, settings.YOUTUBE_API_KEY)
+    if not title:
+        raise IngestionError("Could not fetch video title.")
+    VideoModel.objects.filter(youtube_video_id=job.youtube_video_id, video_title='').update(video_title=title)
+
+
+JOB_RUNNERS = {
+    IngestionJob.KIND_TRANSCRIPT: _run_transcript_job,
+    IngestionJob.KIND_METADATA: _run_metadata_job,
+}
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with full jitter: up to BACKOFF_SECONDS * 2**(attempts - 1)."""
+    return random.uniform(0, BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)))
+
+
+def run_job(job):
+    job.attempts += 1
+    try:
+        with metrics.timer(f"ingestion.{job.kind}"):
+            JOB_RUNNERS[job.kind](job)
+    except Exception as e:
+        job.last_error = str(e)[:2000]
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = IngestionJob.STATUS_FAILED
+            metrics.incr(f"ingestion.{job.kind}.failed")
+            logger.error(f"Ingestion {job.kind} for {job.youtube_video_id} failed permanently: {e}")
+        else:
+            job.status = IngestionJob.STATUS_PENDING
+            job.run_after = timezone.now() + timedelta(seconds=backoff_delay(job.attempts))
+            metrics.incr(f"ingestion.{job.kind}.retried")
+            logger.warning(f"Ingestion {job.kind} for {job.youtube_video_id} failed (attempt {job.attempts}): {e}")
+    else:
+        job.status = IngestionJob.STATUS_DONE
+        job.last_error = ''
+        metrics.incr(f"ingestion.{job.kind}.done")
+
+    job.locked_at = None
+    job.save(update_fields=['status', 'attempts', 'run_after', 'locked_at', 'last_error', 'updated_at'])
+    return job
+
+
+def process_pending(limit=10):
+    """Claim and run one batch of due jobs. Returns the number processed."""
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict
+
+import google.generativeai as genai
+from django.conf import settings
+
+from . import metrics
+from .llm_limiter import llm_limiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = getattr(settings, 'LLM_DEFAULT_MODEL', 'gemini-1.5-pro')
+VISION_MODEL = getattr(settings, 'LLM_VISION_MODEL', 'models/gemini-1.5-flash')
+MCQ_MODEL = getattr(settings, 'LLM_MCQ_MODEL', 'models/gemini-1.5-flash-latest')
+# 'grpc' or 'rest'; None keeps the library default
+TRANSPORT = getattr(settings, 'LLM_TRANSPORT', None)
+
+
+def _text(response):
+    try:
+        return response.text
+    except ValueError:
+        # No parts (e.g. only safety ratings or a finish reason)
+        return ""
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class LLMRegistry:
+    """
+    One place for every Gemini call in the app.
+
+    ``genai.configure`` runs once, on first use. Model handles are built once
+    per (model, generation config, system instruction) and reused, so their
+    gRPC channels are too. Async handles are kept per event loop, because a
+    grpc.aio channel is bound to the loop it was first used on.
+
+    ``generate`` / ``agenerate`` return the stripped answer text, and
+    ``stream`` / ``astream`` yield text pieces as they arrive. ``contents`` is
+    anything ``generate_content`` accepts (a prompt, or a list mixing text
+    and ``{"mime_type", "data"}`` parts). Every call is timed and its token
+    usage counted per model, and each hook added with ``add_hook`` is called
+    with the same record. Every call first takes a slot from ``limiter``
+    (``LLMOverloaded`` when none frees up in time); streams hold theirs until
+    the last piece.
+    """
+
+    def __init__(self, default_model=DEFAULT_MODEL, transport=TRANSPORT, api_key=None, limiter=llm_limiter):
+        self.default_model = default_model
+        self.limiter = limiter
+        self.transport = transport
+        self.api_key = api_key
+        self._configured = False
+        self._models = {}
+        self._async_models = weakref.WeakKeyDictionary()
+        self._hooks = []
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {
+            "calls": 0, "errors": 0, "seconds": 0.0, "prompt_tokens": 0, "output_tokens": 0,
+        })
+        metrics.register_provider("llm", self.stats)
+
+    def _configure(self):
+        if self._configured:
+            return
+        with self._lock:
+            if not self._configured:
+                options = {"api_key": self.api_key or settings.GEMINI_API_KEY}
+                if self.transport:
+                    options["transport"] = self.transport
+                genai.configure(**options)
+                self._configured = True
+
+    def _build(self, key):
+        model_name, generation_config, system_instruction = key
+        return genai.GenerativeModel(
+            model_name,
+            generation_config=dict(generation_config) if generation_config else None,
+            system_instruction=system_instruction,
+        )
+
+    def _key(self, model, generation_config, system_instruction):
+        return (model or self.default_model, _freeze(generation_config or {}), system_instruction)
+
+    def model(self, model=None, generation_config=None, system_instruction=None):
+        """The shared ``GenerativeModel`` for this configuration (sync calls only)."""
+        self._configure()
+        key = self._key(model, generation_config, system_instruction)
+        handle = self._models.get(key)
+        if handle is None:
+            with self._lock:
+                handle = self._models.get(key)
+                if handle is None:
+                    handle = self._models[key] = self._build(key)
+        return handle
+
+    def amodel(self, model=None, generation_config=None, system_instruction=None):
+        """The ``GenerativeModel`` for this configuration on the running event loop."""
+        self._configure()
+        key = self._key(model, generation_config, system_instruction)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            models = self._async_models.get(loop)
+            if models is None:
+                models = self._async_models[loop] = {}
+            handle = models.get(key)
+            if handle is None:
+                handle = models[key] = self._build(key)
+        return handle
+
+    def add_hook(self, hook):
+        """``hook(record)`` after every call; ``record`` has model, kind, seconds, token counts and error."""
+        self._hooks.append(hook)
+
+    def _record(self, model, kind, started, usage, error):
+        seconds = time.monotonic() - started
+        record = {
+            "model": model or self.default_model,
+            "kind": kind,
+            "seconds": seconds,
+            "prompt_tokens": getattr(usage, 'prompt_token_count', 0) or 0,
+            "output_tokens": getattr(usage, 'candidates_token_count', 0) or 0,
+            "error": error,
+        }
+        with self._lock:
+            stats = self._stats[record["model"]]
+            stats["calls"] += 1
+            stats["errors"] += error is not None
+            stats["seconds"] += seconds
+            stats["prompt_tokens"] += record["prompt_tokens"]
+            stats["output_tokens"] += record["output_tokens"]
+        metrics.observe(f"llm.{kind}", seconds)
+        for hook in self._hooks:
+            try:
+                hook(record)
+            except Exception as e:
+                logger.warning(f"LLM hook {hook!r} failed: {e}")
+
+    def generate(self, contents, model=None, **options):
+        with self.limiter.slot(model or self.default_model):
+            started, response, error = time.monotonic(), None, None
+            try:
+                response = self.model(model, **options).generate_content(contents)
+                return _text(response).strip()
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._record(model, "generate", started, getattr(response, 'usage_metadata', None), error)
+
+    async def agenerate(self, contents, model=None, **options):
+        async with self.limiter.aslot(model or self.default_model):
+            started, response, error = time.monotonic(), None, None
+            try:
+                response = await self.amodel(model, **options).generate_content_async(contents)
+                return _text(response).strip()
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._record(model, "generate", started, getattr(response, 'usage_metadata', None), error)
+
+    def stream(self, contents, model=None, **options):
+        with self.limiter.slot(model or self.default_model):
+            started, usage, error = time.monotonic(), None, None
+            try:
+                for chunk in self.model(model, **options).generate_content(contents, stream=True):
+                    # Usage is reported on the last chunk
+                    usage = getattr(chunk, 'usage_metadata', None) or usage
+                    text = _text(chunk)
+                    if text:
+                        yield text
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._record(model, "stream", started, usage, error)
+
+    async def astream(self, contents, model=None, **options):
+        async with self.limiter.aslot(model or self.default_model):
+            started, usage, error = time.monotonic(), None, None
+            try:
+                response = await self.amodel(model, **options).generate_content_async(contents, stream=True)
+                async for chunk in response:
+                    usage = getattr(chunk, 'usage_metadata', None) or usage
+                    text = _text(chunk)
+                    if text:
+                        yield text
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._record(model, "stream", started, usage, error)
+
+    def stats(self):
+        with self._lock:
+            models = {model: dict(values) for model, values in self._stats.items()}
+            handles = len(self._models) + sum(len(handles) for handles in self._async_models.values())
+        for values in models.values():
+            values["seconds"] = round(values["seconds"], 3)
+        return {"handles": handles, "models": models}
+
+
+llm_registry = LLMRegistry()
@@ -0,0 +1,315 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import metrics
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RPM = getattr(settings, 'LLM_DEFAULT_RPM', 60)
+DEFAULT_BURST = getattr(settings, 'LLM_DEFAULT_BURST', 5)
+DEFAULT_CONCURRENCY = getattr(settings, 'LLM_DEFAULT_CONCURRENCY', 8)
+RATE_LIMITS = getattr(settings, 'LLM_RATE_LIMITS', {})
+CONCURRENCY_LIMITS = getattr(settings, 'LLM_CONCURRENCY_LIMITS', {})
+MAX_QUEUE = getattr(settings, 'LLM_MAX_QUEUE', 16)
+MAX_WAIT = getattr(settings, 'LLM_MAX_WAIT', 20.0)
+# A held slot frees itself after this long, so a crashed worker cannot leak it.
+# Live workers renew their slots every third of it, however long the call runs.
+SLOT_LEASE = getattr(settings, 'LLM_SLOT_LEASE', 120)
+
+# Redis compare-and-delete, so a slot is only released by the lease that holds it
+_COMPARE_AND_DELETE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+class LLMOverloaded(APIException):
+    """
+    Raised when a call cannot get an LLM slot in time. DRF turns it into a 503
+    with ``Retry-After: <wait>``; the async views do the same by hand.
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The AI service is busy right now. Please retry shortly."
+    default_code = 'llm_overloaded'
+
+    def __init__(self, wait, detail=None):
+        super().__init__(detail)
+        self.wait = max(1, math.ceil(wait))
+
+
+class _Lease:
+    __slots__ = ('model', 'key', 'token', 'semaphore')
+
+    def __init__(self, model=None, key=None, token=None, semaphore=None):
+        self.model = model
+        self.key = key
+        self.token = token
+        self.semaphore = semaphore
+
+
+class LLMLimiter:
+    """
+    Per-model request rate and concurrency limits for LLM calls, shared by all
+    workers through the Django cache.
+
+    Rate: ``burst`` calls are allowed per window of ``burst * 60 / rpm``
+    seconds (a token bucket refilled a whole burst at a time), counted with
+    ``add`` + ``incr`` on a per-window key. Concurrency: ``concurrency`` slot
+    keys per model, read with one ``get_many`` and taken with ``add``. Slots
+    are leased for ``slot_lease`` seconds and renewed by a background thread
+    while held, so a crashed worker's slots free themselves but long calls
+    keep theirs. When the cache backend fails, an in-process ``TokenBucket``
+    and semaphore per model take over.
+
+    Callers wait up to ``max_wait`` seconds for a slot. At most ``max_queue``
+    callers per model wait in a worker; beyond that, and on timeout,
+    ``LLMOverloaded`` is raised at once.
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, burst=DEFAULT_BURST, concurrency=DEFAULT_CONCURRENCY,
+                 rate_limits=RATE_LIMITS, concurrency_limits=CONCURRENCY_LIMITS, max_queue=MAX_QUEUE,
+                 max_wait=MAX_WAIT, slot_lease=SLOT_LEASE, poll_interval=0.05, alias='default'):
+        self.rpm = rpm
+        self.burst = burst
+        self.concurrency = concurrency
+        self.rate_limits = dict(rate_limits)
+        self.concurrency_limits = dict(concurrency_limits)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.slot_lease = slot_lease
+        self.poll_interval = poll_interval
+        self.alias = alias
+        self._fallbacks = {}
+        self._waiting = defaultdict(int)
+        self._held = set()
+        self._renewer = None
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {
+            "acquired": 0, "rejected": 0, "timeouts": 0, "backend_errors": 0, "max_waiting": 0, "lost_leases": 0,
+        })
+        metrics.register_provider("llm_limiter", self.stats)
+
+    def budget(self, model):
+        """``(rpm, burst, concurrency)`` for ``model``."""
+        rpm = self.rate_limits.get(model, self.rpm)
+        return rpm, min(self.burst, max(1, int(rpm))), self.concurrency_limits.get(model, self.concurrency)
+
+    def _fallback(self, model):
+        with self._lock:
+            fallback = self._fallbacks.get(model)
+            if fallback is None:
+                rpm, burst, concurrency = self.budget(model)
+                fallback = self._fallbacks[model] = (
+                    TokenBucket(rpm / 60, burst), threading.BoundedSemaphore(concurrency)
+                )
+        return fallback
+
+    def _slot_keys(self, model, concurrency):
+        return [f"llm_limiter:{model}:slot:{slot}" for slot in range(concurrency)]
+
+    def _try_shared(self, model):
+        backend = caches[self.alias]
+        rpm, burst, concurrency = self.budget(model)
+
+        # An int, so every backend stores it as-is and Redis can compare it in _release_shared
+        token = uuid.uuid4().int >> 64
+        keys = self._slot_keys(model, concurrency)
+        # One round trip to find the free slots; a full model costs a single get_many per poll
+        taken = backend.get_many(keys)
+        for key in keys:
+            if key not in taken and backend.add(key, token, timeout=self.slot_lease):
+                break
+        else:
+            return None, self.poll_interval
+
+        window = burst * 60 / rpm
+        now = time.time()
+        window_key = f"llm_limiter:{model}:rate:{int(now // window)}"
+        try:
+            backend.add(window_key, 0, timeout=math.ceil(window) + 1)
+            allowed = backend.incr(window_key) <= burst
+        except Exception:
+            self._release_shared(backend, key, token)
+            raise
+        if not allowed:
+            self._release_shared(backend, key, token)
+            return None, (now // window + 1) * window - now
+        lease = _Lease(model=model, key=key, token=token)
+        self._hold(lease)
+        return lease, 0
+
+    def _release_shared(self, backend, key, token):
+        client = getattr(backend, 'client', None)
+        if hasattr(client, 'get_client') and hasattr(client, 'make_key'):
+            # django-redis: atomic compare-and-delete
+            client.get_client(write=True).eval(_COMPARE_AND_DELETE, 1, client.make_key(key), token)
+            return
+        # Other backends have no compare-and-delete. The get/delete race only
+        # matters once the lease has expired while still held, and the renewer
+        # keeps held leases alive, so it needs a worker stalled for a whole
+        # slot_lease; by then the slot has been handed out twice anyway.
+        if backend.get(key) == token:
+            backend.delete(key)
+
+    def _hold(self, lease):
+        with self._lock:
+            self._held.add(lease)
+            if self._renewer is None:
+                self._renewer = threading.Thread(target=self._renew_loop, name="llm-limiter-renew", daemon=True)
+                self._renewer.start()
+
+    def _renew_loop(self):
+        while True:
+            time.sleep(self.slot_lease / 3)
+            self.renew_held()
+
+    def renew_held(self):
+        """Extend every slot this process holds by ``slot_lease``; drops leases that were lost."""
+        with self._lock:
+            leases = list(self._held)
+        if not leases:
+            return
+        backend = caches[self.alias]
+        for lease in leases:
+            try:
+                if backend.get(lease.key) == lease.token:
+                    backend.touch(lease.key, self.slot_lease)
+                    continue
+            except Exception as e:
+                logger.warning(f"Failed to renew LLM slot {lease.key}: {e}")
+                continue
+            logger.warning(f"LLM slot {lease.key} expired while held")
+            with self._lock:
+                self._held.discard(lease)
+                self._stats[lease.model]["lost_leases"] += 1
+
+    def _try_local(self, model):
+        bucket, semaphore = self._fallback(model)
+        if not semaphore.acquire(blocking=False):
+            return None, self.poll_interval
+        wait = bucket.try_acquire()
+        if wait:
+            semaphore.release()
+            return None, wait
+        return _Lease(semaphore=semaphore), 0
+
+    def _try(self, model):
+        """``(lease, 0)`` when a slot was taken, else ``(None, seconds to wait)``."""
+        try:
+            return self._try_shared(model)
+        except Exception as e:
+            with self._lock:
+                self._stats[model]["backend_errors"] += 1
+            logger.warning(f"LLM limiter cache unavailable, limiting in-process: {e}")
+            return self._try_local(model)
+
+    def release(self, lease):
+        if lease.semaphore is not None:
+            lease.semaphore.release()
+            return
+        with self._lock:
+            self._held.discard(lease)
+        try:
+            self._release_shared(caches[self.alias], lease.key, lease.token)
+        except Exception as e:
+            logger.warning(f"Failed to release LLM slot {lease.key}: {e}")
+
+    def _enter_queue(self, model):
+        with self._lock:
+            stats = self._stats[model]
+            if self._waiting[model] >= self.max_queue:
+                stats["rejected"] += 1
+                metrics.incr("llm_limiter.rejected")
+                raise LLMOverloaded(self._retry_after(model))
+            self._waiting[model] += 1
+            stats["max_waiting"] = max(stats["max_waiting"], self._waiting[model])
+
+    def _leave_queue(self, model, started, lease):
+        waited = time.monotonic() - started
+        with self._lock:
+            self._waiting[model] -= 1
+            self._stats[model]["acquired" if lease else "timeouts"] += 1
+        metrics.observe("llm_limiter.wait", waited)
+        metrics.observe(f"llm_limiter.{model}.wait", waited)
+
+    def _retry_after(self, model):
+        rpm, burst, _ = self.budget(model)
+        return burst * 60 / rpm
+
+    def acquire(self, model, timeout=None):
+        """Block until a slot for ``model`` is free; returns the lease for ``release``."""
+        self._enter_queue(model)
+        started = time.monotonic()
+        deadline = started + (self.max_wait if timeout is None else timeout)
+        lease = None
+        try:
+            while True:
+                lease, wait = self._try(model)
+                if lease or time.monotonic() + wait > deadline:
+                    break
+                time.sleep(wait)
+        finally:
+            self._leave_queue(model, started, lease)
+        if lease is None:
+            metrics.incr("llm_limiter.timeouts")
+            raise LLMOverloaded(self._retry_after(model))
+        return lease
+
+    async def aacquire(self, model, timeout=None):
+        """
+        ``acquire`` for the async views: the cache calls run on a worker thread
+        and waits use ``asyncio.sleep``, so the event loop is never blocked.
+        """
+        self._enter_queue(model)
+        started = time.monotonic()
+        deadline = started + (self.max_wait if timeout is None else timeout)
+        lease = None
+        try_slot = sync_to_async(self._try, thread_sensitive=False)
+        try:
+            while True:
+                lease, wait = await try_slot(model)
+                if lease or time.monotonic() + wait > deadline:
+                    break
+                await asyncio.sleep(wait)
+        finally:
+            self._leave_queue(model, started, lease)
+        if lease is None:
+            metrics.incr("llm_limiter.timeouts")
+            raise LLMOverloaded(self._retry_after(model))
+        return lease
+
+    @contextmanager
+    def slot(self, model, timeout=None):
+        lease = self.acquire(model, timeout)
+        try:
+            yield
+        finally:
+            self.release(lease)
+
+    @asynccontextmanager
+    async def aslot(self, model, timeout=None):
+        lease = await self.aacquire(model, timeout)
+        try:
+            yield
+        finally:
+            await sync_to_async(self.release, thread_sensitive=False)(lease)
+
+    def stats(self):
+        with self._lock:
+            return {
+                model: {**stats, "waiting": self._waiting[model]}
+                for model, stats in self._stats.items()
+            }
+
+
+llm_limiter = LLMLimiter()
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from app.models import VideoModel
+from app.youtube_metadata import MAX_IDS_PER_CALL, apply_video_metadata, get_video_metadata
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill video_title and duration_seconds on VideoModel rows from the YouTube Data API, '
+        'fetching 50 videos per videos.list call and writing each chunk with bulk_update.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Refresh every video, overwriting stored titles and durations.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Video ids fetched and written per chunk.')
+        parser.add_argument('--limit', type=int, help='Stop after this many distinct videos.')
+
+    def handle(self, *args, **options):
+        api_key = settings.YOUTUBE_API_KEY
+        if not api_key:
+            raise CommandError("YOUTUBE_API_KEY is not set.")
+
+        videos = VideoModel.objects.all()
+        if not options['all']:
+            videos = videos.filter(Q(duration_seconds__isnull=True) | Q(video_title=''))
+        video_ids = list(videos.order_by().values_list('youtube_video_id', flat=True).distinct())
+        if options['limit']:
+            video_ids = video_ids[:options['limit']]
+        self.stdout.write(f"{len(video_ids)} video(s) to look up.")
+
+        chunk_size = max(MAX_IDS_PER_CALL, options['chunk_size'])
+        found = updated = failed = 0
+        started = time.monotonic()
+        for i in range(0, len(video_ids), chunk_size):
+            chunk = video_ids[i:i + chunk_size]
+            try:
+                metadata = get_video_metadata(chunk, api_key)
+            except Exception as e:
+                failed += len(chunk)
+                self.stderr.write(f"❌ Lookup failed for {len(chunk)} video(s) from {chunk[0]}: {e}")
+                continue
+            found += len(metadata)
+            updated += apply_video_metadata(metadata, overwrite=options['all'])
+            self.stdout.write(f"  {min(i + chunk_size, len(video_ids))}/{len(video_ids)} looked up")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {found} found, {len(video_ids) - found - failed} unavailable, {failed} failed; "
+            f"{updated} row(s) updated in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import statistics
+import time
+
+import aiohttp
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Each pair is (sync path, async path) for the same endpoint
+ENDPOINTS = {
+    'ask': ('/app/ask-question/', '/app/async/ask-question/'),
+    'transcript': ('/app/youtube/transcript/', '/app/async/youtube/transcript/'),
+    'mcqs': ('/app/generate-mcqs/', '/app/async/generate-mcqs/'),
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+async def fire(session, url, payload, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                async with session.post(url, json=payload) as resp:
+                    await resp.read()
+                    code = resp.status
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                code = 'error'
+            latencies.append(time.perf_counter() - started)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - started, latencies, statuses
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent requests at the sync and async variants of an endpoint and report '
+        'throughput and latency percentiles. Run it against the same code served by gunicorn '
+        '(core.wsgi) and by uvicorn (core.asgi) to compare the two deployments.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--token', required=True, help='JWT access token sent as a Bearer header.')
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='ask')
+        parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--timeout', type=float, default=120.0)
+        parser.add_argument('--payload', default=None, help='JSON body; defaults to a sample request for the endpoint.')
+        parser.add_argument('--video-url', default='https://www.youtube.com/watch?v=dQw4w9WgXcQ')
+
+    def default_payload(self, endpoint, video_url):
+        if endpoint == 'ask':
+            return {'youtube_video_url': video_url, 'question': 'What is this part about?', 'time_stamp': 60}
+        if endpoint == 'transcript':
+            return {'youtube_video_url': video_url}
+        return {'youtube_url': video_url}
+
+    def handle(self, *args, **options):
+        if options['payload']:
+            try:
+                payload = json.loads(options['payload'])
+            except ValueError as e:
+                raise CommandError(f"--payload is not valid JSON: {e}")
+        else:
+            payload = self.default_payload(options['endpoint'], options['video_url'])
+
+        sync_path, async_path = ENDPOINTS[options['endpoint']]
+        paths = {'sync': [sync_path], 'async': [async_path], 'both': [sync_path, async_path]}[options['mode']]
+        asyncio.run(self.run(options, paths, payload))
+
+    async def run(self, options, paths, payload):
+        headers = {'Authorization': f"Bearer {options['token']}"}
+        timeout = aiohttp.ClientTimeout(total=options['timeout'])
+        connector = aiohttp.TCPConnector(limit=options['concurrency'])
+        base_url = options['base_url'].rstrip('/')
+
+        self.stdout.write(
+            f"{options['requests']} requests, concurrency {options['concurrency']}, against {base_url}"
+        )
+        async with aiohttp.ClientSession(headers=headers, timeout=timeout, connector=connector) as session:
+            for path in paths:
+                elapsed, latencies, statuses = await fire(
+                    session, base_url + path, payload, options['requests'], options['concurrency']
+                )
+                ms = [latency * 1000 for latency in latencies]
+                self.stdout.write(f"\n{path}")
+                self.stdout.write(f"  throughput: {len(latencies) / elapsed:8.1f} req/s ({elapsed:.1f}s total)")
+                self.stdout.write(
+                    f"  latency ms: p50 {percentile(ms, 50):8.1f}  p95 {percentile(ms, 95):8.1f}  "
+                    f"p99 {percentile(ms, 99):8.1f}  mean {statistics.fmean(ms):8.1f}"
+                )
+                self.stdout.write(f"  statuses:   {dict(sorted(statuses.items(), key=str))}")
@@ -0,0 +1,101 @@
+import math
+import random
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from app.retrieval import BM25Index, ChunkIndex, tokenize
+from app.transcript_index import TranscriptIndex
+
+
+def build_lecture_transcript(segment_count, vocabulary_size=5000, seed=0):
+    """Synthetic transcript with a Zipf-distributed vocabulary, closer to real speech than a handful of words."""
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(vocabulary_size)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary_size)]
+    segments = []
+    start = 0.0
+    for _ in range(segment_count):
+        duration = rng.uniform(1.5, 6.0)
+        segments.append({
+            'text': " ".join(rng.choices(vocabulary, weights, k=rng.randint(6, 14))),
+            'start': round(start, 3),
+            'duration': round(duration, 3),
+        })
+        start += duration
+    return segments, vocabulary
+
+
+def python_bm25_top(texts, query, k, k1=1.5, b=0.75):
+    """Reference pure-Python BM25, for timing and for checking the NumPy ranking."""
+    docs = [Counter(tokenize(text)) for text in texts]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = sum(lengths) / len(lengths)
+    terms = set(tokenize(query))
+    df = {term: sum(1 for doc in docs if term in doc) for term in terms}
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in terms:
+            tf = doc.get(term, 0)
+            if tf:
+                idf = math.log1p((len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    ranked = sorted(range(len(texts)), key=lambda i: -scores[i])[:k]
+    return [(i, scores[i]) for i in ranked if scores[i] > 0]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark building and querying the BM25 chunk index used for ask-question context.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segments', type=int, default=20000, help='Transcript segments (20000 is about 21h).')
+        parser.add_argument('--chunk-seconds', type=int, default=30)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--top-k', type=int, default=4)
+
+    def handle(self, *args, **options):
+        segments, vocabulary = build_lecture_transcript(options['segments'])
+        duration = segments[-1]['start']
+        chunks = list(TranscriptIndex(segments).buckets(options['chunk_seconds']))
+        texts = [text for _, text in chunks]
+        rng = random.Random(1)
+        queries = [" ".join(rng.sample(vocabulary[50:2000], 4)) for _ in range(options['queries'])]
+        k = options['top_k']
+
+        started = time.perf_counter()
+        index = ChunkIndex(chunks)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for query in queries:
+            index.search(query, k)
+        query_s = time.perf_counter() - started
+
+        sample = queries[:20]
+        started = time.perf_counter()
+        expected = [python_bm25_top(texts, query, k) for query in sample]
+        python_s = time.perf_counter() - started
+
+        bm25 = BM25Index(texts)
+        # Compare scores rather than ids: equal-scoring chunks may come back in either order
+        mismatches = sum(
+            1 for query, want in zip(sample, expected)
+            if len(want) != len(got := bm25.top(query, k))
+            or any(not math.isclose(a, b, rel_tol=1e-4) for (_, a), (_, b) in zip(want, got))
+        )
+
+        per_query = lambda total, n: total / n * 1_000_000
+        self.stdout.write(
+            f"Segments: {len(segments)} ({duration / 3600:.1f}h), chunks: {len(chunks)} x {options['chunk_seconds']}s, "
+            f"vocabulary: {len(index.bm25.vocabulary)} terms, postings: {len(index.bm25.weights)}"
+        )
+        self.stdout.write(f"Index build: {build_ms:.1f} ms")
+        self.stdout.write(f"NumPy BM25 top-{k}: {per_query(query_s, len(queries)):.1f} µs/query")
+        self.stdout.write(f"Pure-Python BM25 (rebuilt per query): {per_query(python_s, len(sample)):.1f} µs/query")
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f"{mismatches}/{len(sample)} rankings differ from the reference."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rankings match the reference on {len(sample)} queries."))
@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.transcript_index import TranscriptIndex
+
+
+def build_synthetic_transcript(segment_count, seed=0):
+    rng = random.Random(seed)
+    segments = []
+    start = 0.0
+    for i in range(segment_count):
+        duration = rng.uniform(1.5, 6.0)
+        segments.append({
+            'text': f"segment {i} " + " ".join(rng.choice("lorem ipsum dolor sit amet".split()) for _ in range(8)),
+            'start': round(start, 3),
+            'duration': round(duration, 3),
+        })
+        start += duration
+    return segments
+
+
+def scan_window(segments, start, end):
+    return [entry for entry in segments if start <= entry['start'] <= end]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bisect-based TranscriptIndex window reads against a full list scan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segments', type=int, default=10000)
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--radius', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        segments = build_synthetic_transcript(options['segments'])
+        radius = options['radius']
+        duration = segments[-1]['start']
+        rng = random.Random(1)
+        timestamps = [rng.uniform(0, duration) for _ in range(options['queries'])]
+
+        started = time.perf_counter()
+        index = TranscriptIndex(segments)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for t in timestamps:
+            scan_window(segments, max(0, t - radius), t + radius)
+        scan_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for t in timestamps:
+            index.around(t, radius)
+        index_s = time.perf_counter() - started
+
+        for t in timestamps[:50]:
+            assert scan_window(segments, max(0, t - radius), t + radius) == index.around(t, radius)
+
+        per_query = lambda total: total / len(timestamps) * 1_000_000
+        self.stdout.write(f"Segments: {len(segments)} ({duration / 3600:.1f}h), queries: {len(timestamps)}, radius: ±{radius:g}s")
+        self.stdout.write(f"Index build: {build_ms:.2f} ms")
+        self.stdout.write(f"Linear scan: {per_query(scan_s):.1f} µs/query")
+        self.stdout.write(f"Bisect index: {per_query(index_s):.1f} µs/query")
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {scan_s / index_s:.0f}x"))
@@ -0,0 +1,72 @@
+import json
+import pickle
+import random
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from app.compact_transcript import CompactTranscript, zstandard
+
+WORDS = (
+    "so the eigenvalue of this matrix tells us how the vector is stretched and "
+    "we can see that when we apply the transformation again the result follows "
+    "from the definition which is why the determinant here must be zero"
+).split()
+
+
+def build_lecture_transcript(hours, seed=0):
+    """Caption-style segments: 2-5 seconds and 6-14 words each, like auto-generated YouTube captions."""
+    rng = random.Random(seed)
+    segments = []
+    start = 0.0
+    end = hours * 3600
+    while start < end:
+        duration = round(rng.uniform(2.0, 5.0), 3)
+        segments.append({
+            'text': " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))),
+            'start': round(start, 3),
+            'duration': duration,
+        })
+        start += duration
+    return segments
+
+
+def measure(build):
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    obj = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, after - before
+
+
+class Command(BaseCommand):
+    help = 'Compare memory and at-rest size of list-of-dict transcripts against CompactTranscript.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=3.0)
+
+    def handle(self, *args, **options):
+        raw = json.dumps(build_lecture_transcript(options['hours']))
+
+        segments, list_bytes = measure(lambda: json.loads(raw))
+        full_text, text_bytes = measure(lambda: " ".join(seg['text'] for seg in segments))
+        compact, compact_bytes = measure(lambda: CompactTranscript.from_segments(json.loads(raw)))
+        assert compact.to_segments() == segments
+
+        blob = compact.to_bytes()
+        codec = "zstd" if zstandard is not None else "zlib"
+        kib = lambda n: f"{n / 1024:,.0f} KiB"
+
+        self.stdout.write(f"Transcript: {options['hours']:g}h, {len(segments)} segments")
+        self.stdout.write("In memory (per worker):")
+        self.stdout.write(f"  {'list of dicts + full_text:':40} {kib(list_bytes + text_bytes)}")
+        self.stdout.write(f"  {'CompactTranscript:':40} {kib(compact_bytes)}")
+        self.stdout.write("At rest:")
+        self.stdout.write(f"  {'transcript_data JSON + transcript_text:':40} {kib(len(raw) + len(full_text.encode()))}")
+        self.stdout.write(f"  {'pickled segments (shared cache tier):':40} {kib(len(pickle.dumps(segments)))}")
+        self.stdout.write(f"  {f'transcript_blob ({codec}):':40} {kib(len(blob))}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Memory reduction: {(list_bytes + text_bytes) / compact_bytes:.1f}x, "
+            f"storage reduction: {(len(raw) + len(full_text.encode())) / len(blob):.1f}x"
+        ))
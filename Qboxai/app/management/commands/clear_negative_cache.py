@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.negative_cache import negative_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Show or clear remembered "no transcript" / "no metadata" results for videos. '
+        'Other workers drop their local copies within a minute.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('video_ids', nargs='*')
+        parser.add_argument('--all', action='store_true', help='Clear every entry.')
+        parser.add_argument('--show', action='store_true', help='Print the entries instead of clearing them.')
+
+    def handle(self, *args, **options):
+        video_ids = options['video_ids']
+        if options['all']:
+            negative_cache.clear_all()
+            self.stdout.write(self.style.SUCCESS("✅ Negative cache cleared."))
+            return
+        if not video_ids:
+            raise CommandError("Give one or more video ids, or --all.")
+
+        for video_id in video_ids:
+            if options['show']:
+                entries = negative_cache.entries(video_id)
+                if not entries:
+                    self.stdout.write(f"{video_id}: -")
+                for kind, (reason, seconds_left) in sorted(entries.items()):
+                    self.stdout.write(f"{video_id}: {kind} = {reason} ({seconds_left}s left)")
+            else:
+                negative_cache.clear(video_id)
+                self.stdout.write(f"Cleared {video_id}.")
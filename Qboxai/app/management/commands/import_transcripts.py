@@ -0,0 +1,204 @@
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app import metrics
+from app.models import TranscriptModel, TranscriptSegment, VideoModel
+from app.ratelimit import TokenBucket
+from app.utils import (
+    DEFAULT_TRANSCRIPT_LANGUAGE,
+    extract_youtube_video_id,
+    fetch_transcript_with_super_data_api,
+    get_video_title_with_cache,
+    transcript_defaults,
+    transcript_segment_rows,
+)
+
+VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+LOOKUP_CHUNK = 500
+
+
+def read_video_ids(stream):
+    """Video ids from a file of ids or YouTube URLs, one per line; blank lines and ``#`` comments are skipped."""
+    ids, invalid = [], []
+    seen = set()
+    for line in stream:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        video_id = line if VIDEO_ID_RE.match(line) else extract_youtube_video_id(line)
+        if not video_id:
+            invalid.append(line)
+        elif video_id not in seen:
+            seen.add(video_id)
+            ids.append(video_id)
+    return ids, invalid
+
+
+def existing_video_ids(video_ids, language):
+    existing = set()
+    for i in range(0, len(video_ids), LOOKUP_CHUNK):
+        existing.update(
+            TranscriptModel.objects.filter(youtube_video_id__in=video_ids[i:i + LOOKUP_CHUNK], language=language)
+            .values_list('youtube_video_id', flat=True)
+        )
+    return existing
+
+
+class Command(BaseCommand):
+    help = (
+        'Pre-load transcripts (and titles) for a file of YouTube video ids or URLs. '
+        'Fetches run on a worker pool under per-provider rate limits; rows are written '
+        'with bulk_create and videos that already have a transcript are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File with one video id or URL per line ('-' for stdin).")
+        parser.add_argument('--language', default=DEFAULT_TRANSCRIPT_LANGUAGE, help='Transcript language to import.')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--transcript-rate', type=float, default=5.0,
+                            help='Max transcript provider (RapidAPI) requests per second.')
+        parser.add_argument('--title-rate', type=float, default=10.0,
+                            help='Max YouTube Data API title lookups per second.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Transcripts written per bulk_create.')
+        parser.add_argument('--skip-titles', action='store_true')
+        parser.add_argument('--failures-out', help='Write the ids that failed to this file, for a later retry.')
+
+    def handle(self, *args, **options):
+        try:
+            if options['path'] == '-':
+                video_ids, invalid = read_video_ids(sys.stdin)
+            else:
+                with open(options['path'], encoding='utf-8') as f:
+                    video_ids, invalid = read_video_ids(f)
+        except OSError as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        for line in invalid:
+            self.stderr.write(f"❌ Not a YouTube id or URL: {line}")
+
+        self.language = options['language']
+        existing = existing_video_ids(video_ids, self.language)
+        todo = [video_id for video_id in video_ids if video_id not in existing]
+        self.stdout.write(
+            f"{len(video_ids)} video(s) listed, {len(existing)} already stored, {len(todo)} to import."
+        )
+        if not todo:
+            return
+
+        self.transcript_bucket = TokenBucket(options['transcript_rate'])
+        self.title_bucket = TokenBucket(options['title_rate'])
+        self.fetch_titles = not options['skip_titles']
+        self.segment_table = getattr(settings, 'TRANSCRIPT_SEGMENT_TABLE', True)
+
+        imported, conflicts, failures = 0, 0, {}
+        pending = {}
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(self.fetch_one, video_id) for video_id in todo]
+            for done, future in enumerate(as_completed(futures), 1):
+                video_id, segments, title, error = future.result()
+                if error:
+                    failures[video_id] = error
+                    metrics.incr("import.transcripts.failed")
+                else:
+                    pending[video_id] = (segments, title)
+
+                if len(pending) >= options['batch_size']:
+                    batch_imported, batch_conflicts = self.flush(pending)
+                    imported += batch_imported
+                    conflicts += batch_conflicts
+                    pending = {}
+                if done % 100 == 0:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(f"  {done}/{len(todo)} fetched ({done / elapsed:.1f}/s)")
+
+        if pending:
+            batch_imported, batch_conflicts = self.flush(pending)
+            imported += batch_imported
+            conflicts += batch_conflicts
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"Imported {imported} transcript(s) in {elapsed:.1f}s "
+            f"({imported / elapsed:.1f}/s), {conflicts} already stored meanwhile, {len(failures)} failed."
+        )
+        for video_id, error in list(failures.items())[:20]:
+            self.stderr.write(f"❌ {video_id}: {error}")
+        if len(failures) > 20:
+            self.stderr.write(f"... and {len(failures) - 20} more.")
+
+        if failures and options['failures_out']:
+            with open(options['failures_out'], 'w', encoding='utf-8') as f:
+                f.write("\n".join(failures) + "\n")
+            self.stdout.write(f"Failed ids written to {options['failures_out']}.")
+
+    def fetch_one(self, video_id):
+        """Runs on a pool thread; returns ``(video_id, segments, title, error)``. No DB access here."""
+        try:
+            self.transcript_bucket.acquire()
+            segments = fetch_transcript_with_super_data_api(video_id, self.language)
+            if not segments:
+                return video_id, None, None, "no transcript returned"
+
+            title = None
+            if self.fetch_titles:
+                self.title_bucket.acquire()
+                title = get_video_title_with_cache(video_id, settings.YOUTUBE_API_KEY)
+            return video_id, segments, title, None
+        except Exception as e:
+            return video_id, None, None, str(e) or e.__class__.__name__
+
+    def flush(self, pending):
+        """
+        Write one batch: transcripts, their segment rows, and any missing video titles.
+        Returns ``(imported, conflicts)``; conflicts are ids stored by someone else meanwhile.
+        """
+        rows = [
+            TranscriptModel(
+                youtube_video_id=video_id,
+                language=self.language,
+                **transcript_defaults({
+                    "segments": segments,
+                    "full_text": " ".join(seg['text'] for seg in segments),
+                })
+            )
+            for video_id, (segments, _) in pending.items()
+        ]
+        with transaction.atomic():
+            # ignore_conflicts: a request may have stored one of these since the existence
+            # check in handle(). Those rows are left alone and reported as conflicts.
+            already_stored = existing_video_ids(list(pending), self.language)
+            TranscriptModel.objects.bulk_create(
+                [row for row in rows if row.youtube_video_id not in already_stored], ignore_conflicts=True
+            )
+            inserted = [video_id for video_id in pending if video_id not in already_stored]
+            stored = list(
+                TranscriptModel.objects.filter(youtube_video_id__in=inserted, language=self.language)
+                .only('id', 'youtube_video_id')
+            )
+            if self.segment_table:
+                segment_rows = []
+                for transcript_obj in stored:
+                    segments = pending[transcript_obj.youtube_video_id][0]
+                    segment_rows.extend(transcript_segment_rows(transcript_obj, segments))
+                    transcript_obj.segment_count = len(segments)
+                TranscriptSegment.objects.bulk_create(segment_rows, batch_size=1000, ignore_conflicts=True)
+                TranscriptModel.objects.bulk_update(stored, ['segment_count'])
+
+            for video_id, (_, title) in pending.items():
+                if title:
+                    VideoModel.objects.filter(youtube_video_id=video_id, video_title='').update(video_title=title)
+
+        conflicts = len(pending) - len(stored)
+        metrics.incr("import.transcripts.imported", len(stored))
+        if conflicts:
+            metrics.incr("import.transcripts.conflicts", conflicts)
+        self.stdout.write(f"  wrote batch of {len(stored)}, {conflicts} already stored by another writer")
+        return len(stored), conflicts
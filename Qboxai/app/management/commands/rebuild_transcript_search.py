@@ -0,0 +1,44 @@
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.models import TranscriptModel
+from app.utils import store_transcript_segments
+
+search_migration = import_module('app.migrations.0010_transcript_search')
+
+
+class Command(BaseCommand):
+    help = (
+        'Make every stored transcript searchable: writes TranscriptSegment rows for transcripts '
+        'that have none, then recreates the full-text index (SQLite FTS5 table and triggers, or '
+        'the Postgres GIN index) and rebuilds it. Run after a migration that rebuilds the segment table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-segments', action='store_true', help='Only rebuild the index.')
+
+    def handle(self, *args, **options):
+        if not options['skip_segments']:
+            written = 0
+            for transcript_obj in TranscriptModel.objects.filter(segment_count=0).iterator(chunk_size=50):
+                segments = transcript_obj.get_segments()
+                if segments:
+                    store_transcript_segments(transcript_obj, segments)
+                    written += 1
+            self.stdout.write(f"Wrote segment rows for {written} transcript(s).")
+
+        vendor = connection.vendor
+        with connection.schema_editor() as schema_editor:
+            if vendor == 'sqlite':
+                for sql in search_migration.SQLITE_FORWARD:
+                    schema_editor.execute(sql)
+            elif vendor == 'postgresql':
+                for sql in search_migration.POSTGRES_FORWARD:
+                    schema_editor.execute(sql)
+                schema_editor.execute("REINDEX INDEX app_transcriptsegment_text_fts")
+            else:
+                self.stdout.write(f"No full-text index for {vendor}; search uses a substring match.")
+                return
+        self.stdout.write(self.style.SUCCESS(f"✅ Transcript search index rebuilt ({vendor})."))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.mcq_jobs import process_pending_mcq_jobs
+
+
+class Command(BaseCommand):
+    help = 'Process queued MCQ generation jobs from the MCQGenerationJob table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1, help='Jobs claimed per poll.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the due jobs once and exit.')
+
+    def handle(self, *args, **options):
+        self.stdout.write("MCQ worker started.")
+        try:
+            while True:
+                processed = process_pending_mcq_jobs(limit=options['batch'])
+                if processed:
+                    self.stdout.write(f"Processed {processed} job(s).")
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write("MCQ worker stopped.")
@@ -0,0 +1,152 @@
+import logging
+import random
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+from .mcq_generation import DIFFICULTY_MIX, QUESTION_COUNT, dedupe_mcqs, difficulty_bucket
+from .models import MCQBankQuestion, MCQModel
+from .singleflight import SingleFlight
+from .utils import classify_question_type
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_DIFFICULTIES = {"Beginner", "Intermediate", "Advanced", "Expert"}
+# Generation may queue behind the LLM limiter, so other workers wait this long for a top-up
+TOP_UP_TIMEOUT = getattr(settings, 'MCQ_BANK_TOP_UP_TIMEOUT', 300)
+
+bank_flight = SingleFlight("mcq_bank", lock_timeout=TOP_UP_TIMEOUT, wait_timeout=TOP_UP_TIMEOUT)
+
+# Copied from the bank question onto each session's MCQModel row
+COPIED_FIELDS = (
+    'question_text', 'option_a', 'option_b', 'option_c', 'option_d',
+    'correct_option', 'explanation', 'difficulty', 'question_type',
+)
+
+
+def bank_questions(video_id, language=''):
+    return MCQBankQuestion.objects.filter(youtube_video_id=video_id, language=language or '')
+
+
+def unseen_questions(session, language=''):
+    """Bank questions for the session's video that the session has not drawn yet."""
+    return bank_questions(session.video.youtube_video_id, language).exclude(session_copies__session=session)
+
+
+def sample_balanced(questions, count=QUESTION_COUNT, mix=DIFFICULTY_MIX):
+    """
+    A random ``count`` of ``questions`` following ``mix``; shortfalls in one
+    difficulty are filled from the others. The result is in bank order.
+    """
+    pools = defaultdict(list)
+    for question in questions:
+        pools[difficulty_bucket(question.difficulty)].append(question)
+    for pool in pools.values():
+        random.shuffle(pool)
+
+    selected = []
+    for difficulty, wanted in mix:
+        selected.extend(pools[difficulty][:wanted])
+        pools[difficulty] = pools[difficulty][wanted:]
+    leftovers = [question for pool in pools.values() for question in pool]
+    selected.extend(random.sample(leftovers, min(len(leftovers), max(0, count - len(selected)))))
+    return sorted(selected[:count], key=lambda question: question.pk)
+
+
+def draw_mcqs(session, language='', count=QUESTION_COUNT, minimum=None):
+    """
+    Copy a balanced sample of up to ``count`` unseen bank questions into
+    ``session`` and return the new MCQModel rows. Returns ``[]`` when fewer
+    than ``minimum`` (default ``count``) are left, i.e. the bank needs a top-up.
+    """
+    minimum = count if minimum is None else minimum
+    questions = list(unseen_questions(session, language))
+    if len(questions) < max(minimum, 1):
+        metrics.incr("mcq_bank.exhausted")
+        return []
+
+    rows = [
+        MCQModel(session=session, bank_question=question, **{f: getattr(question, f) for f in COPIED_FIELDS})
+        for question in sample_balanced(questions, count)
+    ]
+    with transaction.atomic():
+        rows = MCQModel.objects.bulk_create(rows)
+    metrics.incr("mcq_bank.drawn", len(rows))
+    return rows
+
+
+def _bank_question(video_id, language, mcq):
+    question = mcq.get("question")
+    options = mcq.get("options", {})
+    correct_answer = mcq.get("correct_answer")
+    if not (question and len(options) == 4 and all(k in options for k in ["A", "B", "C", "D"]) and correct_answer):
+        return None
+
+    difficulty = mcq.get("difficulty", "").capitalize()
+    if difficulty not in ALLOWED_DIFFICULTIES:
+        difficulty = "Intermediate"
+    return MCQBankQuestion(
+        youtube_video_id=video_id,
+        language=language,
+        question_text=question,
+        option_a=options.get("A", ""),
+        option_b=options.get("B", ""),
+        option_c=options.get("C", ""),
+        option_d=options.get("D", ""),
+        correct_option=correct_answer,
+        explanation=mcq.get("explanation", ""),
+        difficulty=difficulty,
+        question_type=classify_question_type(question),
+    )
+
+
+def add_to_bank(video_id, language, mcqs):
+    """Store the well-formed ``mcqs`` that are not already in the bank. Returns how many were added."""
+    language = language or ''
+    existing = [
+        (-1, {"question": text})
+        for text in bank_questions(video_id, language).values_list('question_text', flat=True)
+    ]
+    candidates = existing + [(0, mcq) for mcq in mcqs if mcq.get("question")]
+    fresh = [mcq for source, mcq in dedupe_mcqs(candidates) if source == 0]
+
+    rows = [row for row in (_bank_question(video_id, language, mcq) for mcq in fresh) if row is not None]
+    with transaction.atomic():
+        MCQBankQuestion.objects.bulk_create(rows)
+    metrics.incr("mcq_bank.added", len(rows))
+    logger.info(f"Added {len(rows)} MCQs to the bank for {video_id} ({len(existing)} already there)")
+    return len(rows)
+
+
+def _top_up_done_key(video_id, language):
+    return f"mcq_bank:top_up_done:{video_id}:{language}"
+
+
+def top_up_bank(video_id, language, generate):
+    """
+    Add the MCQs from ``generate()`` to the video's bank. Concurrent top-ups
+    for the same video and language, in this or another worker, share one
+    generation. Returns how many questions the bank gained.
+
+    The leader records each finished top-up (with its own id) in the cache;
+    workers waiting on it return once they see a record newer than the one
+    they started with, even when the generation added nothing.
+    """
+    language = language or ''
+    done_key = _top_up_done_key(video_id, language)
+    seen = (cache.get(done_key) or {}).get("id")
+
+    def run():
+        added = add_to_bank(video_id, language, generate() or [])
+        cache.set(done_key, {"id": uuid.uuid4().hex, "added": added}, TOP_UP_TIMEOUT * 2)
+        return added
+
+    def finished():
+        done = cache.get(done_key)
+        return done["added"] if done and done["id"] != seen else None
+
+    return bank_flight.do(f"{video_id}:{language}", run, check=finished)
@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import math
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain, zip_longest
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import metrics
+from .answer_cache import normalize_question
+from .llm import llm_registry, MCQ_MODEL
+from .llm_limiter import LLMOverloaded, llm_limiter
+from .retrieval import tokenize
+from .transcript_index import get_transcript_index
+from .utils import agenerate_mcqs_from_transcript, generate_mcqs_from_transcript, parse_mcq_output
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SECONDS = getattr(settings, 'MCQ_CHUNK_SECONDS', 600)
+MAX_CHUNKS = getattr(settings, 'MCQ_MAX_CHUNKS', 8)
+# Transcripts spanning less than this go out as a single prompt
+CHUNKED_MIN_SECONDS = getattr(settings, 'MCQ_CHUNKED_MIN_SECONDS', 1200)
+# Chunk calls one request keeps in flight (also capped by the MCQ model's
+# concurrency budget), so a single long video cannot fill the limiter's queue
+PARALLEL_CHUNKS = getattr(settings, 'MCQ_PARALLEL_CHUNKS', 4)
+# Token-set Jaccard similarity above which two questions count as the same
+DUPLICATE_SIMILARITY = getattr(settings, 'MCQ_DUPLICATE_SIMILARITY', 0.6)
+
+QUESTION_COUNT = 10
+# Same split as build_mcq_prompt: 3 expert, 4 advanced, 3 intermediate
+DIFFICULTY_MIX = (("Expert", 3), ("Advanced", 4), ("Intermediate", 3))
+# Candidates asked for across all chunks, so dedupe and balancing have room
+CANDIDATE_FACTOR = 1.6
+
+
+def build_mcq_chunk_prompt(chunk_text, count, start, end):
+    return f"""
+The following is the part of a video lecture transcript from {start // 60} to {end // 60} minutes.
+Create exactly {count} ADVANCED multiple choice questions that test DEEP understanding of what is taught in this part.
+
+Ask only about material covered in this part. Mix difficulties: roughly a third Expert (graduate level),
+a third Advanced (advanced undergraduate) and a third Intermediate (with deep reasoning).
+Make distractors sophisticated and plausible.
+
+Format each question exactly as:
+Question X: [question text]
+A) [option A]
+B) [option B]
+C) [option C]
+D) [option D]
+Correct Answer: [Letter]
+Explanation: [Explanation]
+Difficulty: [Beginner/Intermediate/Advanced/Expert]
+
+Transcript part:
+\"\"\"
+{chunk_text}
+\"\"\"
+
+Generate exactly {count} MCQs now:
+"""
+
+
+def plan_chunks(transcript_obj, chunk_seconds=CHUNK_SECONDS, max_chunks=MAX_CHUNKS,
+                min_seconds=CHUNKED_MIN_SECONDS):
+    """
+    ``[(start, end, text)]`` time-range chunks to generate from, or ``[]`` when
+    the transcript is short enough for one prompt. Every ``chunk_seconds``
+    bucket is covered; past ``max_chunks`` buckets, neighbours are merged into
+    ``max_chunks`` evenly sized chunks, so the number of calls stays bounded
+    however long the video is.
+    """
+    index = get_transcript_index(transcript_obj)
+    starts = index.starts
+    if not starts or starts[-1] - starts[0] < min_seconds:
+        return []
+    buckets = list(index.buckets(chunk_seconds))
+    count = min(len(buckets), max_chunks)
+    groups = [buckets[i * len(buckets) // count:(i + 1) * len(buckets) // count] for i in range(count)]
+    return [
+        (group[0][0], group[-1][0] + chunk_seconds, " ".join(text for _, text in group))
+        for group in groups
+    ]
+
+
+def questions_per_chunk(chunk_count, count=QUESTION_COUNT):
+    return max(3, math.ceil(count * CANDIDATE_FACTOR / chunk_count))
+
+
+def _is_valid(mcq):
+    options = mcq.get("options", {})
+    return bool(mcq.get("question")) and all(options.get(k) for k in "ABCD") and mcq.get("correct_answer")
+
+
+def difficulty_bucket(difficulty):
+    """The DIFFICULTY_MIX bucket a question's difficulty label counts towards."""
+    difficulty = (difficulty or "").capitalize()
+    # Beginner questions are rare here and stand in for the intermediate ones
+    return "Intermediate" if difficulty not in {"Expert", "Advanced"} else difficulty
+
+
+def _difficulty(mcq):
+    return difficulty_bucket(mcq.get("difficulty"))
+
+
+def _interleave(groups):
+    """Round-robin over per-chunk lists, so picks are spread across the video."""
+    return [item for item in chain.from_iterable(zip_longest(*groups)) if item is not None]
+
+
+def dedupe_mcqs(candidates, threshold=DUPLICATE_SIMILARITY):
+    """
+    Drop questions that normalize to the same text or whose word sets overlap
+    by more than ``threshold`` (Jaccard) with an earlier one.
+    ``candidates`` is ``[(chunk_no, mcq)]``; order is kept.
+    """
+    kept, seen_texts, seen_tokens = [], set(), []
+    for chunk_no, mcq in candidates:
+        text = normalize_question(mcq["question"])
+        tokens = set(tokenize(text))
+        duplicate = text in seen_texts or any(
+            tokens and len(tokens & other) / len(tokens | other) > threshold for other in seen_tokens
+        )
+        if duplicate:
+            metrics.incr("mcq.duplicates")
+            continue
+        seen_texts.add(text)
+        seen_tokens.append(tokens)
+        kept.append((chunk_no, mcq))
+    return kept
+
+
+def select_balanced(candidates, count=QUESTION_COUNT, mix=DIFFICULTY_MIX):
+    """
+    ``count`` MCQs from ``[(chunk_no, mcq)]`` following ``mix``, spread across
+    chunks; shortfalls in one difficulty are filled from the others. The result
+    is in video order.
+    """
+    pools = defaultdict(lambda: defaultdict(list))
+    for chunk_no, mcq in candidates:
+        pools[_difficulty(mcq)][chunk_no].append((chunk_no, mcq))
+    ordered = {
+        difficulty: _interleave([by_chunk[c] for c in sorted(by_chunk)])
+        for difficulty, by_chunk in pools.items()
+    }
+
+    selected = []
+    for difficulty, wanted in mix:
+        pool = ordered.get(difficulty, [])
+        selected.extend(pool[:wanted])
+        ordered[difficulty] = pool[wanted:]
+    leftovers = _interleave([ordered.get(difficulty, []) for difficulty, _ in mix])
+    selected.extend(leftovers[:count - len(selected)])
+    selected.sort(key=lambda item: item[0])
+    return [mcq for _, mcq in selected[:count]]
+
+
+def _reduce(chunks, responses):
+    candidates, overloaded, failures = [], None, 0
+    for chunk_no, response in enumerate(responses):
+        if isinstance(response, LLMOverloaded):
+            overloaded = response
+        if isinstance(response, BaseException):
+            failures += 1
+            logger.warning("Failed to generate MCQs for the chunk at %ss", chunks[chunk_no][0], exc_info=response)
+            continue
+        candidates.extend((chunk_no, mcq) for mcq in parse_mcq_output(response) if _is_valid(mcq))
+    metrics.incr("mcq.chunk_failures", failures)
+    if not candidates and overloaded is not None:
+        raise overloaded
+    return select_balanced(dedupe_mcqs(candidates))
+
+
+def _prompts(chunks):
+    count = questions_per_chunk(len(chunks))
+    return [build_mcq_chunk_prompt(text, count, start, end) for start, end, text in chunks]
+
+
+def chunk_parallelism(chunk_count, model=MCQ_MODEL):
+    """How many of a request's chunk calls run at once."""
+    _, _, concurrency = llm_limiter.budget(model)
+    return max(1, min(chunk_count, PARALLEL_CHUNKS, concurrency))
+
+
+def _generate_chunk(prompt):
+    try:
+        return llm_registry.generate(prompt, model=MCQ_MODEL)
+    except Exception as e:
+        return e
+
+
+def generate_mcqs(transcript_obj, progress=None):
+    """
+    10 MCQs for a transcript. Long transcripts are split into time-range
+    chunks, candidates are generated for the chunks in parallel (at most
+    ``chunk_parallelism`` calls at a time, each through the LLM limiter), then
+    deduplicated and balanced by difficulty.
+    ``progress(done, total)`` is called as chunks finish.
+    """
+    chunks = plan_chunks(transcript_obj)
+    if not chunks:
+        return generate_mcqs_from_transcript(transcript_obj.get_text())
+
+    with metrics.timer("mcq.generate.chunked"):
+        responses = [None] * len(chunks)
+        workers = chunk_parallelism(len(chunks))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mcq-chunk") as executor:
+            futures = {executor.submit(_generate_chunk, prompt): i for i, prompt in enumerate(_prompts(chunks))}
+            for done, future in enumerate(as_completed(futures), 1):
+                responses[futures[future]] = future.result()
+                if progress is not None:
+                    progress(done, len(chunks))
+        return _reduce(chunks, responses)
+
+
+async def agenerate_mcqs(transcript_obj):
+    """Async variant of ``generate_mcqs``."""
+    chunks = await sync_to_async(plan_chunks, thread_sensitive=False)(transcript_obj)
+    if not chunks:
+        return await agenerate_mcqs_from_transcript(transcript_obj.get_text())
+
+    semaphore = asyncio.Semaphore(chunk_parallelism(len(chunks)))
+
+    async def generate_chunk(prompt):
+        async with semaphore:
+            return await llm_registry.agenerate(prompt, model=MCQ_MODEL)
+
+    with metrics.timer("mcq.generate.chunked"):
+        responses = await asyncio.gather(
+            *(generate_chunk(prompt) for prompt in _prompts(chunks)),
+            return_exceptions=True,
+        )
+        return _reduce(chunks, responses)
+
@@ -0,0 +1,147 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import metrics
+from .ingestion import backoff_delay, claim_jobs
+from .mcq_bank import draw_mcqs, top_up_bank
+from .mcq_generation import generate_mcqs
+from .models import MCQGenerationJob
+from .utils import get_or_fetch_best_transcript
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'MCQ_JOB_MAX_ATTEMPTS', 3)
+# Running jobs whose worker died are picked up again after this long
+STALE_AFTER_SECONDS = getattr(settings, 'MCQ_JOB_STALE_AFTER_SECONDS', 10 * 60)
+
+ACTIVE_STATUSES = (MCQGenerationJob.STATUS_PENDING, MCQGenerationJob.STATUS_RUNNING)
+
+
+class MCQJobError(Exception):
+    """A failure that retrying will not fix, such as a video without a transcript."""
+
+
+def async_requested(data):
+    """True when the client opted into a background job with ``async=true``."""
+    return str(data.get("async", "")).lower() in ("1", "true", "yes")
+
+
+def mcq_payload(video_id, message, mcqs=(), job=None, status_url=None):
+    """
+    The body of every successful generate-MCQs response, sync or async::
+
+        {"video_id": str, "success": true, "message": str,
+         "mcqs": [MCQModelSerializer data],  # [] while a job is queued
+         "job": null | {"id": int, "status": str, "status_url": str}}
+
+    201 responses carry the MCQs and ``"job": null``. With ``async=true`` a
+    202 carries the job instead; GET ``status_url`` until it is done.
+    """
+    return {
+        "video_id": video_id,
+        "success": True,
+        "message": message,
+        "mcqs": list(mcqs),
+        "job": None if job is None else {"id": job.id, "status": job.status, "status_url": status_url},
+    }
+
+
+def enqueue_mcq_job(session, language=''):
+    """
+    ``(job, created)``: the session's pending or running job for ``language``
+    if there is one, otherwise a newly queued job.
+    """
+    language = language or ''
+    while True:
+        try:
+            with transaction.atomic():
+                job = MCQGenerationJob.objects.create(session=session, language=language)
+        except IntegrityError:
+            job = MCQGenerationJob.objects.filter(
+                session=session, language=language, status__in=ACTIVE_STATUSES
+            ).first()
+            if job is None:
+                continue  # the active job finished in between
+            metrics.incr("mcq_jobs.deduplicated")
+            return job, False
+        metrics.incr("mcq_jobs.enqueued")
+        return job, True
+
+
+def _set_stage(job, stage, progress):
+    job.stage, job.progress = stage, progress
+    MCQGenerationJob.objects.filter(pk=job.pk).update(stage=stage, progress=progress, updated_at=timezone.now())
+
+
+def _generate(job):
+    session = job.session
+    video_id = session.video.youtube_video_id
+
+    _set_stage(job, MCQGenerationJob.STAGE_TRANSCRIPT, 5)
+    transcript_obj, _ = get_or_fetch_best_transcript(video_id, job.language or None)
+    if not transcript_obj or not transcript_obj.get_text():
+        raise MCQJobError("No transcript data found for this video.")
+    # The bank holds questions per transcript, which may be a fallback language
+    language = transcript_obj.language
+
+    with transaction.atomic():
+        mcqs = draw_mcqs(session, language)
+        if mcqs:
+            # Another session already paid for this video's questions
+            job.mcqs.set(mcqs)
+            return
+
+    _set_stage(job, MCQGenerationJob.STAGE_GENERATING, 10)
+    top_up_bank(video_id, language, lambda: generate_mcqs(
+        transcript_obj,
+        progress=lambda done, total: _set_stage(job, MCQGenerationJob.STAGE_GENERATING, 10 + 80 * done // total),
+    ))
+
+    _set_stage(job, MCQGenerationJob.STAGE_SAVING, 90)
+    with transaction.atomic():
+        mcqs = draw_mcqs(session, language, minimum=1)
+        if not mcqs:
+            raise Exception("Parsing Gemini response failed.")
+        job.mcqs.set(mcqs)
+
+
+def run_mcq_job(job):
+    job.attempts += 1
+    try:
+        with metrics.timer("mcq_jobs.run"):
+            _generate(job)
+    except Exception as e:
+        job.last_error = str(e)[:2000]
+        if isinstance(e, MCQJobError) or job.attempts >= MAX_ATTEMPTS:
+            job.status = MCQGenerationJob.STATUS_FAILED
+            metrics.incr("mcq_jobs.failed")
+            logger.error(f"MCQ job {job.pk} for session {job.session_id} failed permanently: {e}")
+        else:
+            job.status = MCQGenerationJob.STATUS_PENDING
+            job.stage, job.progress = MCQGenerationJob.STAGE_QUEUED, 0
+            job.run_after = timezone.now() + timedelta(seconds=backoff_delay(job.attempts))
+            metrics.incr("mcq_jobs.retried")
+            logger.warning(f"MCQ job {job.pk} for session {job.session_id} failed (attempt {job.attempts}): {e}")
+    else:
+        job.status = MCQGenerationJob.STATUS_DONE
+        job.stage, job.progress = MCQGenerationJob.STAGE_DONE, 100
+        job.last_error = ''
+        metrics.incr("mcq_jobs.done")
+
+    job.locked_at = None
+    job.save(update_fields=[
+        'status', 'stage', 'progress', 'attempts', 'run_after', 'locked_at', 'last_error', 'updated_at'
+    ])
+    return job
+
+
+def process_pending_mcq_jobs(limit=1):
+    """Claim and run one batch of due MCQ jobs. Returns the number processed."""
+    jobs = claim_jobs(limit, model=MCQGenerationJob, stale_after=STALE_AFTER_SECONDS)
+    for job in jobs:
+        run_mcq_job(job)
+    return len(jobs)
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+# In-process metrics. Each gunicorn worker keeps its own counters, so the
+# numbers reported by MetricsAPIView describe the worker that served the call.
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = {}
+_providers = {}
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, seconds):
+    """Record one duration sample (in seconds) under ``name``."""
+    with _lock:
+        stats = _timings.get(name)
+        if stats is None:
+            stats = _timings[name] = {"count": 0, "total": 0.0, "max": 0.0}
+        stats["count"] += 1
+        stats["total"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+
+
+@contextmanager
+def timer(name):
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - started)
+
+
+def register_provider(name, func):
+    """Register a callable whose dict result is included in ``snapshot()``."""
+    _providers[name] = func
+
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        timings = {
+            name: {
+                "count": stats["count"],
+                "avg_ms": round(stats["total"] / stats["count"] * 1000, 2) if stats["count"] else 0.0,
+                "max_ms": round(stats["max"] * 1000, 2),
+            }
+            for name, stats in _timings.items()
+        }
+
+    return {
+        "counters": counters,
+        "timings": timings,
+        **{name: func() for name, func in list(_providers.items())},
+    }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 15:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_mcqsubmission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcriptmodel',
+            name='segment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TranscriptSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('start', models.FloatField()),
+                ('duration', models.FloatField(default=0)),
+                ('text', models.TextField()),
+                ('transcript', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='app.transcriptmodel')),
+            ],
+            options={
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['transcript', 'start'], name='app_transcr_transcr_cf033f_idx')],
+                'unique_together': {('transcript', 'position')},
+            },
+        ),
+    ]
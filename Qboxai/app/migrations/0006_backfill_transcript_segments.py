@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_segments(apps, schema_editor):
+    TranscriptModel = apps.get_model('app', 'TranscriptModel')
+    TranscriptSegment = apps.get_model('app', 'TranscriptSegment')
+
+    pending = TranscriptModel.objects.filter(segment_count=0).only('id', 'transcript_data')
+    for transcript in pending.iterator(chunk_size=50):
+        segments = [
+            TranscriptSegment(
+                transcript_id=transcript.id,
+                position=position,
+                start=float(seg.get('start', 0)),
+                duration=float(seg.get('duration', 0)),
+                text=seg.get('text', ''),
+            )
+            for position, seg in enumerate(transcript.transcript_data or [])
+        ]
+        if not segments:
+            continue
+        TranscriptSegment.objects.bulk_create(segments, batch_size=BATCH_SIZE)
+        TranscriptModel.objects.filter(id=transcript.id).update(segment_count=len(segments))
+
+
+def clear_segments(apps, schema_editor):
+    apps.get_model('app', 'TranscriptSegment').objects.all().delete()
+    apps.get_model('app', 'TranscriptModel').objects.update(segment_count=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_transcriptsegment'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_segments, clear_segments),
+    ]
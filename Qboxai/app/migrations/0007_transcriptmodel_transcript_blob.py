@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_backfill_transcript_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcriptmodel',
+            name='transcript_blob',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
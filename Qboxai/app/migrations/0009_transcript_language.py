@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-17 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_ingestionjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transcriptmodel',
+            name='youtube_video_id',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='transcriptmodel',
+            constraint=models.UniqueConstraint(fields=('youtube_video_id', 'language'), name='unique_transcript_language'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+from django.db import migrations
+
+
+# SQLite: an external-content FTS5 table over app_transcriptsegment, kept in
+# step by triggers so bulk_create'd segments are indexed as they are written.
+# A later migration that alters app_transcriptsegment makes SQLite rebuild the
+# table, which silently drops these triggers. Every statement is idempotent,
+# and app.transcript_search.ensure_search_index re-runs them from a
+# post_migrate handler whenever a trigger or the FTS table is missing.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS app_transcriptsegment_fts USING fts5(
+        text, content='app_transcriptsegment', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS app_transcriptsegment_fts_ai AFTER INSERT ON app_transcriptsegment BEGIN
+        INSERT INTO app_transcriptsegment_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS app_transcriptsegment_fts_ad AFTER DELETE ON app_transcriptsegment BEGIN
+        INSERT INTO app_transcriptsegment_fts(app_transcriptsegment_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS app_transcriptsegment_fts_au AFTER UPDATE OF text ON app_transcriptsegment BEGIN
+        INSERT INTO app_transcriptsegment_fts(app_transcriptsegment_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO app_transcriptsegment_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    "INSERT INTO app_transcriptsegment_fts(app_transcriptsegment_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS app_transcriptsegment_fts_au",
+    "DROP TRIGGER IF EXISTS app_transcriptsegment_fts_ad",
+    "DROP TRIGGER IF EXISTS app_transcriptsegment_fts_ai",
+    "DROP TABLE IF EXISTS app_transcriptsegment_fts",
+]
+
+# Postgres: an expression GIN index, maintained by Postgres on every insert.
+# The expression must match the one in app/transcript_search.py.
+POSTGRES_FORWARD = [
+    "CREATE INDEX IF NOT EXISTS app_transcriptsegment_text_fts "
+    "ON app_transcriptsegment USING GIN (to_tsvector('english', text))",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS app_transcriptsegment_text_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FORWARD)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_transcript_language'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-17 16:24
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_transcript_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MCQGenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(blank=True, max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('stage', models.CharField(choices=[('queued', 'Queued'), ('transcript', 'Fetching transcript'), ('generating', 'Generating questions'), ('saving', 'Saving questions'), ('done', 'Done')], default='queued', max_length=20)),
+                ('progress', models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(100)])),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('mcqs', models.ManyToManyField(blank=True, related_name='generation_jobs', to='app.mcqmodel')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mcq_jobs', to='app.sessionmodel')),
+            ],
+            options={
+                'ordering': ['run_after'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='app_mcqgene_status_ffd55d_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('session', 'language'), name='unique_active_mcq_job')],
+            },
+        ),
+    ]
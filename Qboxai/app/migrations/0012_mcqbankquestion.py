@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-17 17:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_mcqgenerationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MCQBankQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('youtube_video_id', models.CharField(max_length=20)),
+                ('language', models.CharField(blank=True, help_text='Language of the transcript the questions were generated from.', max_length=10)),
+                ('question_text', models.TextField()),
+                ('option_a', models.CharField(max_length=255)),
+                ('option_b', models.CharField(max_length=255)),
+                ('option_c', models.CharField(max_length=255)),
+                ('option_d', models.CharField(max_length=255)),
+                ('correct_option', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C'), ('D', 'D')], max_length=1)),
+                ('explanation', models.TextField(blank=True, null=True)),
+                ('difficulty', models.CharField(default='Intermediate', max_length=50)),
+                ('question_type', models.CharField(default='MCQ', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['youtube_video_id', 'language', 'difficulty'], name='app_mcqbank_youtube_0b2932_idx'),
+                    models.Index(fields=['youtube_video_id', 'language', 'question_type'], name='app_mcqbank_youtube_e07969_idx'),
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name='mcqmodel',
+            name='bank_question',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='session_copies', to='app.mcqbankquestion'),
+        ),
+    ]
@@ -4,17 +4,61 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.core.validators import FileExtensionValidator
 
+from .compact_transcript import CompactTranscript
+
 
 class TranscriptModel(models.Model):
-    youtube_video_id = models.CharField(max_length=20, unique=True, db_index=True)
+    youtube_video_id = models.CharField(max_length=20, db_index=True)
     language = models.CharField(max_length=10, default='en')
     transcript_data = models.JSONField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     transcript_text = models.TextField(blank=True, null=True)
+    segment_count = models.PositiveIntegerField(default=0)
+    # Compressed CompactTranscript; when set, transcript_data and transcript_text may be left empty
+    transcript_blob = models.BinaryField(null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['youtube_video_id', 'language'], name='unique_transcript_language'),
+        ]
 
     def __str__(self):
-        return f"Transcript for video ID {self.youtube_video_id}"
+        return f"Transcript for video ID {self.youtube_video_id} ({self.language})"
+
+    def get_compact(self):
+        if self.transcript_blob:
+            return CompactTranscript.from_bytes(self.transcript_blob)
+        return CompactTranscript.from_segments(self.transcript_data)
+
+    def get_text(self):
+        """The full transcript text, whichever column holds it."""
+        if not self.transcript_text and self.transcript_blob:
+            return self.get_compact().full_text
+        return self.transcript_text or ''
+
+    def get_segments(self):
+        """Segments in the ``[{'text', 'start', 'duration'}]`` JSON shape, whichever column holds them."""
+        if self.transcript_blob:
+            return self.get_compact().to_segments()
+        return self.transcript_data or []
+
+
+class TranscriptSegment(models.Model):
+    """One row per transcript segment so time windows can be read with an indexed range query."""
+    transcript = models.ForeignKey(TranscriptModel, on_delete=models.CASCADE, related_name='segments')
+    position = models.PositiveIntegerField()
+    start = models.FloatField()
+    duration = models.FloatField(default=0)
+    text = models.TextField()
+
+    class Meta:
+        ordering = ['start']
+        unique_together = ('transcript', 'position')
+        indexes = [models.Index(fields=['transcript', 'start'])]
+
+    def __str__(self):
+        return f"{self.transcript.youtube_video_id} @ {self.start}s"
 
 
 
@@ -110,8 +154,40 @@ class BookmarkModel(models.Model):
     def __str__(self):
         return f"Bookmark at {self.time_stamp}s for session {self.session.id}"
 
+class MCQBankQuestion(models.Model):
+    """Per-video pool of generated MCQs that sessions draw from (see app/mcq_bank.py)."""
+    youtube_video_id = models.CharField(max_length=20)
+    # Language of the transcript the questions came from, which may be a fallback from the requested one
+    language = models.CharField(
+        max_length=10, blank=True, help_text="Language of the transcript the questions were generated from."
+    )
+    question_text = models.TextField()
+    option_a = models.CharField(max_length=255)
+    option_b = models.CharField(max_length=255)
+    option_c = models.CharField(max_length=255)
+    option_d = models.CharField(max_length=255)
+    correct_option = models.CharField(max_length=1, choices=[('A','A'), ('B','B'), ('C','C'), ('D','D')])
+    explanation = models.TextField(null=True, blank=True)
+    difficulty = models.CharField(max_length=50, default='Intermediate')
+    question_type = models.CharField(max_length=50, default='MCQ')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['youtube_video_id', 'language', 'difficulty']),
+            models.Index(fields=['youtube_video_id', 'language', 'question_type']),
+        ]
+
+    def __str__(self):
+        return f"{self.youtube_video_id}: {self.question_text[:50]}"
+
+
 class MCQModel(models.Model):
     session = models.ForeignKey(SessionModel, on_delete=models.CASCADE, related_name='mcqs')
+    # The bank question this session's copy was drawn from
+    bank_question = models.ForeignKey(
+        MCQBankQuestion, on_delete=models.SET_NULL, null=True, blank=True, related_name='session_copies'
+    )
     question_text = models.TextField()
     option_a = models.CharField(max_length=255)
     option_b = models.CharField(max_length=255)
@@ -153,3 +229,98 @@ class MCQSubmission(models.Model):
 
 
 
+class IngestionJob(models.Model):
+    """DB-backed queue entry for background transcript/metadata fetches (see app/ingestion.py)."""
+    KIND_TRANSCRIPT = 'transcript'
+    KIND_METADATA = 'metadata'
+    KIND_CHOICES = [(KIND_TRANSCRIPT, 'Transcript'), (KIND_METADATA, 'Metadata')]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    youtube_video_id = models.CharField(max_length=20, db_index=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['youtube_video_id', 'kind'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_ingestion_job',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job for {self.youtube_video_id} ({self.status})"
+
+
+class MCQGenerationJob(models.Model):
+    """Background MCQ generation for a session (see app/mcq_jobs.py); clients poll it for progress."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    STAGE_QUEUED = 'queued'
+    STAGE_TRANSCRIPT = 'transcript'
+    STAGE_GENERATING = 'generating'
+    STAGE_SAVING = 'saving'
+    STAGE_DONE = 'done'
+    STAGE_CHOICES = [
+        (STAGE_QUEUED, 'Queued'),
+        (STAGE_TRANSCRIPT, 'Fetching transcript'),
+        (STAGE_GENERATING, 'Generating questions'),
+        (STAGE_SAVING, 'Saving questions'),
+        (STAGE_DONE, 'Done'),
+    ]
+
+    session = models.ForeignKey(SessionModel, on_delete=models.CASCADE, related_name='mcq_jobs')
+    # Language of the transcript the view resolved (and the bank it draws from); blank picks the best available one
+    language = models.CharField(max_length=10, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default=STAGE_QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0, validators=[MaxValueValidator(100)])
+    mcqs = models.ManyToManyField(MCQModel, blank=True, related_name='generation_jobs')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session', 'language'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_mcq_job',
+            )
+        ]
+
+    def __str__(self):
+        return f"MCQ job for session {self.session_id} ({self.status})"
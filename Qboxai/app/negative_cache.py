@@ -0,0 +1,154 @@
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+from .cache import TwoTierCache
+
+logger = logging.getLogger(__name__)
+
+REASON_NO_TRANSCRIPT = "no_transcript"
+REASON_CAPTIONS_DISABLED = "captions_disabled"
+REASON_VIDEO_UNAVAILABLE = "video_unavailable"
+REASON_PROVIDER_ERROR = "provider_error"
+
+# What is missing. A transcript miss is per language; "transcripts" and
+# "video" cover every language (and, for "video", the title as well).
+KIND_VIDEO = "video"
+KIND_TRANSCRIPTS = "transcripts"
+KIND_TITLE = "title"
+
+
+def transcript_kind(language):
+    return f"transcript:{language}"
+
+
+NEGATIVE_TTL = getattr(settings, 'NEGATIVE_CACHE_TTL', 60 * 60)
+# Provider errors may be transient, so they are retried much sooner
+NEGATIVE_ERROR_TTL = getattr(settings, 'NEGATIVE_CACHE_ERROR_TTL', 5 * 60)
+REASON_TTLS = {REASON_PROVIDER_ERROR: NEGATIVE_ERROR_TTL}
+
+# Other workers' local copies (and the clear-all generation) are re-read
+# from the shared cache at least this often, so clears propagate within it
+LOCAL_TTL = 60
+
+# set() read-modify-writes a video's entry under a lock in the shared cache
+SET_LOCK_TIMEOUT = 5
+SET_LOCK_WAIT = 1.0
+
+
+class NegativeCache:
+    """
+    Remembers that a video has no transcript / no reachable metadata, with a
+    reason code and a TTL shorter than the positive caches.
+
+    One entry per video holds ``{kind: (reason, expires_at)}`` so a video can
+    be cleared with a single delete. ``set()`` updates it under a per-video
+    lock taken with ``cache.add`` and re-reads the shared copy first, so
+    workers recording different kinds at once do not drop each other's.
+    ``clear_all()`` bumps a generation number in the shared cache instead of
+    scanning keys.
+    """
+
+    def __init__(self, name="negative", max_entries=8192, alias='default'):
+        self.alias = alias
+        self._generation_key = f"{name}:generation"
+        self._generation = (0, 0.0)  # (value, read_at)
+        self._cache = TwoTierCache(
+            name,
+            max_entries=max_entries,
+            ttl=max([NEGATIVE_TTL] + list(REASON_TTLS.values())),
+            local_ttl=LOCAL_TTL,
+            alias=alias,
+        )
+
+    def _current_generation(self):
+        value, read_at = self._generation
+        if time.monotonic() - read_at > LOCAL_TTL:
+            try:
+                value = caches[self.alias].get(self._generation_key, 0)
+            except Exception as e:
+                logger.warning(f"Negative cache generation read failed: {e}")
+            self._generation = (value, time.monotonic())
+        return value
+
+    def _key(self, video_id):
+        return f"{self._current_generation()}:{video_id}"
+
+    def _entries(self, video_id, fresh=False):
+        now = time.time()
+        key = self._key(video_id)
+        entries = (self._cache.get_shared(key) if fresh else self._cache.get(key)) or {}
+        return {kind: entry for kind, entry in entries.items() if entry[1] > now}
+
+    @contextmanager
+    def _locked(self, video_id):
+        """Hold the video's write lock; after SET_LOCK_WAIT the write goes ahead without it."""
+        backend = caches[self.alias]
+        lock_key = f"{self._cache.name}:lock:{video_id}"
+        token = uuid.uuid4().hex
+        acquired = False
+        deadline = time.monotonic() + SET_LOCK_WAIT
+        try:
+            acquired = backend.add(lock_key, token, timeout=SET_LOCK_TIMEOUT)
+            while not acquired and time.monotonic() < deadline:
+                time.sleep(0.01)
+                acquired = backend.add(lock_key, token, timeout=SET_LOCK_TIMEOUT)
+            if not acquired:
+                logger.warning(f"Negative cache lock for {video_id} busy; writing without it")
+        except Exception as e:
+            logger.warning(f"Negative cache lock unavailable for {video_id}: {e}")
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    if backend.get(lock_key) == token:
+                        backend.delete(lock_key)
+                except Exception as e:
+                    logger.warning(f"Failed to release negative cache lock for {video_id}: {e}")
+
+    def get(self, video_id, *kinds):
+        """Reason code for the first of ``kinds`` recorded as missing for the video, else None."""
+        entries = self._entries(video_id)
+        for kind in kinds:
+            if kind in entries:
+                metrics.incr(f"negative_cache.{kind.split(':')[0]}.hits")
+                return entries[kind][0]
+        return None
+
+    def set(self, video_id, kind, reason, ttl=None):
+        ttl = ttl or REASON_TTLS.get(reason, NEGATIVE_TTL)
+        with self._locked(video_id):
+            entries = self._entries(video_id, fresh=True)
+            entries[kind] = (reason, time.time() + ttl)
+            longest = max(expires_at for _, expires_at in entries.values()) - time.time()
+            self._cache.set(self._key(video_id), entries, ttl=max(1, int(longest)))
+        metrics.incr(f"negative_cache.{kind.split(':')[0]}.{reason}")
+        logger.info(f"Negative cache: {video_id} {kind} -> {reason} for {ttl}s")
+
+    def entries(self, video_id):
+        """``{kind: (reason, seconds_left)}`` for the video."""
+        now = time.time()
+        return {kind: (reason, int(expires_at - now)) for kind, (reason, expires_at) in self._entries(video_id).items()}
+
+    def clear(self, video_id):
+        self._cache.delete(self._key(video_id))
+
+    def clear_all(self):
+        backend = caches[self.alias]
+        try:
+            backend.incr(self._generation_key)
+        except ValueError:
+            backend.set(self._generation_key, 1, timeout=None)
+        self._generation = (0, 0.0)
+        self._cache.clear_local()
+
+
+negative_cache = NegativeCache(
+    max_entries=getattr(settings, 'NEGATIVE_CACHE_MAX_ENTRIES', 8192),
+)
@@ -0,0 +1,207 @@
+"""
+Request handling shared by the ask-question and clip views in views.py and
+their async counterparts in async_views.py.
+
+Everything here is synchronous. The sync views call it directly; the async
+views call it through ``sync_to_async`` and only await the network calls
+(title lookup, transcript fetch, LLM) themselves, so both return the same
+payloads and fail the same way.
+"""
+import io
+from contextlib import contextmanager
+
+from PIL import Image
+from rest_framework import status
+
+from .answer_cache import answer_cache
+from .llm_limiter import LLMOverloaded
+from .models import ImageModel, QAModel, SessionModel, VideoModel
+from .retrieval import estimate_tokens, format_related_chunks, related_chunks
+from .transcript_index import transcript_around
+from .utils import check_question_limit, extract_youtube_video_id, get_transcript_languages_cached
+
+NO_TRANSCRIPT = "Transcript not available."
+WINDOW_SECONDS = 60
+FREE_CLIPS_TOTAL = 30
+FREE_CLIPS_PER_VIDEO = 5
+
+
+class RequestRejected(Exception):
+    """Ends a request early; the view returns ``payload`` with ``status_code``."""
+
+    def __init__(self, status_code, message, **extra):
+        super().__init__(message)
+        self.status_code = status_code
+        self.payload = {"success": False, "message": message, **extra}
+
+
+def validated(serializer, message):
+    if not serializer.is_valid():
+        raise RequestRejected(status.HTTP_400_BAD_REQUEST, message, errors=serializer.errors)
+    return serializer.validated_data
+
+
+def require_video_id(url):
+    video_id = extract_youtube_video_id(url)
+    if not video_id:
+        raise RequestRejected(status.HTTP_400_BAD_REQUEST, "Invalid YouTube URL.")
+    return video_id
+
+
+def require_title(video_title, message="Could not retrieve video title."):
+    if not video_title:
+        raise RequestRejected(status.HTTP_400_BAD_REQUEST, message)
+    return video_title
+
+
+def open_session(user, video_id, video_title, video_url):
+    """``(session, created)`` for the user's video, registering the video on first use."""
+    video, _ = VideoModel.objects.get_or_create(
+        user=user,
+        youtube_video_id=video_id,
+        defaults={'video_title': video_title, 'video_url': video_url}
+    )
+    return SessionModel.objects.get_or_create(user=user, video=video)
+
+
+@contextmanager
+def llm_failures(prefix):
+    """Report LLM errors as a 500 ``"<prefix>: <error>"``; busy-limiter errors pass through as 503s."""
+    try:
+        yield
+    except (LLMOverloaded, RequestRejected):
+        raise
+    except Exception as e:
+        raise RequestRejected(status.HTTP_500_INTERNAL_SERVER_ERROR, f"{prefix}: {str(e)}")
+
+
+def require_answer(answer):
+    if not answer:
+        raise RequestRejected(status.HTTP_500_INTERNAL_SERVER_ERROR, "Gemini API did not return a valid response.")
+    return answer
+
+
+# Ask question
+
+def check_ask_limit(user, session):
+    limit_exceeded, limit_message = check_question_limit(user, session)
+    if limit_exceeded:
+        raise RequestRejected(status.HTTP_403_FORBIDDEN, limit_message, is_premium=bool(user.is_premium))
+
+
+def build_ask_prompt(transcript_obj, question, time_stamp, video_id, video_title, video_url):
+    """
+    ``(prompt, transcript_segment)``: the ±60s transcript window plus the best
+    matching chunks elsewhere in the video, or a title-only prompt when the
+    video has no transcript.
+    """
+    if transcript_obj is None:
+        get_transcript_languages_cached(video_id)
+        prompt = (
+            f"You are a helpful assistant. The user has a question about a YouTube video, but no transcript is available. "
+            f"Based on the video title and context, do your best to help them.\n\n"
+            f"Video Title: {video_title}\n"
+            f"Video URL: {video_url}\n"
+            f"Timestamp (seconds): {time_stamp}\n"
+            f"User's Question: {question}\n\n"
+            f"Answer:"
+        )
+        return prompt, NO_TRANSCRIPT
+
+    transcript_segment = " ".join(
+        entry['text'] for entry in transcript_around(transcript_obj, time_stamp, WINDOW_SECONDS)
+    )
+    if not transcript_segment.strip():
+        raise RequestRejected(status.HTTP_400_BAD_REQUEST, "No transcript data found near the timestamp.")
+
+    # 🔍 Plus the chunks elsewhere in the video that best match the question, within the token budget
+    related = related_chunks(
+        transcript_obj, question,
+        (max(0, time_stamp - WINDOW_SECONDS), time_stamp + WINDOW_SECONDS),
+        estimate_tokens(transcript_segment),
+    )
+    prompt = (
+        f"You are a helpful assistant. Based only on the following segment of a YouTube video transcript, "
+        f"which is from around timestamp {time_stamp} seconds (and any other relevant parts listed after it), "
+        f"answer the user's question.\n\n"
+        f"Transcript Segment:\n{transcript_segment}\n\n"
+        f"{format_related_chunks(related)}"
+        f"Question: {question}\nAnswer:"
+    )
+    return prompt, transcript_segment
+
+
+class AskAnswer:
+    """Answer-cache lookup and QAModel persistence for one ask-question request."""
+
+    def __init__(self, session, question, time_stamp, video_id, transcript_language, use_cache):
+        self.session = session
+        self.question = question
+        self.time_stamp = time_stamp
+        self.use_cache = use_cache
+        self.cache_key = answer_cache.key(video_id, transcript_language, time_stamp, question)
+        self.cached = False
+
+    def lookup(self):
+        """The cached answer to reuse, or None."""
+        answer = answer_cache.get(self.cache_key) if self.use_cache else None
+        self.cached = answer is not None
+        return answer
+
+    def save(self, answer, generation_seconds=None):
+        """Store a QAModel row (and a freshly generated answer in the cache); returns its payload."""
+        if self.use_cache and not self.cached and generation_seconds is not None:
+            answer_cache.set(self.cache_key, answer, generation_seconds)
+        qa = QAModel.objects.create(
+            session=self.session, question=self.question, answer=answer, time_stamp=self.time_stamp
+        )
+        return {'id': qa.id, 'question': qa.question, 'answer': qa.answer, 'cached': self.cached}
+
+
+# Clips
+
+def check_clip_limit(user, session):
+    if user.is_premium:
+        return
+    if ImageModel.objects.filter(session__user=user).count() >= FREE_CLIPS_TOTAL:
+        raise RequestRejected(
+            status.HTTP_403_FORBIDDEN,
+            "You have reached the total limit of 30 image uploads. Upgrade to premium to continue.",
+            limit_type="total", is_premium=False,
+        )
+    if ImageModel.objects.filter(session=session).count() >= FREE_CLIPS_PER_VIDEO:
+        raise RequestRejected(
+            status.HTTP_403_FORBIDDEN,
+            "You can only upload 5 images per YouTube video. Please choose another video or upgrade to premium.",
+            limit_type="session", is_premium=False,
+        )
+
+
+def clip_jpeg(uploaded_file):
+    """The clip as JPEG bytes for Gemini; the upload is rewound so it can still be saved."""
+    image = Image.open(uploaded_file).convert("RGB")  # Remove alpha channel
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    uploaded_file.seek(0)
+    return buffer.getvalue()
+
+
+def clip_contents(question, jpeg_bytes):
+    return [question, {"mime_type": 'image/jpeg', "data": jpeg_bytes}]
+
+
+def save_clip(request, session, session_status, image, question, answer, time_stamp):
+    """Store the ImageModel row and return its payload."""
+    clip = ImageModel.objects.create(
+        image=image, question=question, answer=answer, time_stamp=time_stamp, session=session
+    )
+    return {
+        'id': clip.id,
+        'question': clip.question,
+        'answer': clip.answer,
+        'session_id': session.id,
+        'session_status': session_status,
+        'time_stamp': time_stamp,
+        'created_at': clip.created_at,
+        'image_url': request.build_absolute_uri(clip.image.url)
+    }
@@ -0,0 +1,166 @@
+import re
+
+import numpy as np
+from django.conf import settings
+
+from .cache import TwoTierCache
+from .transcript_index import get_transcript_index
+
+CHUNK_SECONDS = getattr(settings, 'RETRIEVAL_CHUNK_SECONDS', 30)
+TOP_K = getattr(settings, 'RETRIEVAL_TOP_K', 4)
+# Rough token budget for the transcript part of the ask prompt (window + retrieved chunks)
+CONTEXT_TOKEN_BUDGET = getattr(settings, 'RETRIEVAL_CONTEXT_TOKEN_BUDGET', 1500)
+
+_token_re = re.compile(r'\w+', re.UNICODE)
+
+STOPWORDS = frozenset("""
+a an and are as at be but by do does did for from has have he her his how i if in into is it its
+me my no not of on or our she so than that the their them then there these they this to too us
+was we were what when where which who why will with you your about can just like um uh yeah okay
+""".split())
+
+
+def tokenize(text):
+    return [token for token in _token_re.findall(text.casefold()) if token not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    """Cheap LLM token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of text chunks, built with NumPy.
+
+    Postings are stored term-major: ``term_ptr[t]:term_ptr[t + 1]`` slices
+    ``doc_ids`` / ``weights`` for term ``t``, where ``weights`` already hold the
+    full BM25 term score for that document. A query is then one vectorized
+    scatter-add per query term.
+    """
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.size = len(texts)
+        vocabulary = {}
+        term_ids, doc_ids = [], []
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[doc] = len(tokens)
+            for token in tokens:
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+            doc_ids.extend([doc] * len(tokens))
+        self.vocabulary = vocabulary
+
+        if not term_ids:
+            self.term_ptr = np.zeros(1, dtype=np.int64)
+            self.doc_ids = np.zeros(0, dtype=np.int32)
+            self.weights = np.zeros(0, dtype=np.float32)
+            return
+
+        # One entry per (term, doc) pair with its term frequency, sorted by term then doc
+        keys = np.asarray(term_ids, dtype=np.int64) * self.size + np.asarray(doc_ids, dtype=np.int64)
+        pairs, tf = np.unique(keys, return_counts=True)
+        pair_terms = pairs // self.size
+        pair_docs = (pairs % self.size).astype(np.int32)
+
+        df = np.bincount(pair_terms, minlength=len(vocabulary))
+        idf = np.log1p((self.size - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_length = lengths.mean() or 1.0
+        norm = k1 * (1 - b + b * lengths[pair_docs] / avg_length)
+        self.weights = (idf[pair_terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        self.doc_ids = pair_docs
+        self.term_ptr = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+
+    def scores(self, query):
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            lo, hi = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            # doc ids are unique within a term's postings, so a plain fancy-index add is safe
+            scores[self.doc_ids[lo:hi]] += self.weights[lo:hi]
+        return scores
+
+    def top(self, query, k):
+        """``[(chunk_index, score)]`` for the ``k`` best chunks with a positive score, best first."""
+        scores = self.scores(query)
+        k = min(k, self.size)
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best if scores[i] > 0]
+
+
+class ChunkIndex:
+    """A transcript cut into ``chunk_seconds`` chunks, with a BM25 index over them."""
+
+    __slots__ = ('starts', 'texts', 'bm25')
+
+    def __init__(self, chunks):
+        self.starts = [start for start, _ in chunks]
+        self.texts = [text for _, text in chunks]
+        self.bm25 = BM25Index(self.texts)
+
+    def search(self, query, k, exclude=None):
+        """
+        ``[(start, text, score)]`` for the best ``k`` chunks, skipping chunks
+        that overlap ``exclude`` (a ``(start, end)`` range already in the prompt).
+        """
+        results = []
+        # Over-fetch by the number of chunks the excluded range can cover
+        skipped = int((exclude[1] - exclude[0]) // CHUNK_SECONDS) + 2 if exclude else 0
+        for i, score in self.bm25.top(query, k + skipped):
+            if exclude and exclude[0] <= self.starts[i] + CHUNK_SECONDS and self.starts[i] <= exclude[1]:
+                continue
+            results.append((self.starts[i], self.texts[i], score))
+            if len(results) == k:
+                break
+        return results
+
+
+# Local-only, like transcript_index_cache: rebuilt cheaply from the cached TranscriptIndex
+chunk_index_cache = TwoTierCache(
+    "retrieval_index",
+    max_entries=getattr(settings, 'RETRIEVAL_INDEX_CACHE_MAX_ENTRIES', 64),
+    ttl=getattr(settings, 'TRANSCRIPT_CACHE_TTL', 60 * 60 * 24),
+    shared=False,
+)
+
+
+def get_chunk_index(transcript_obj, chunk_seconds=CHUNK_SECONDS):
+    key = f"{transcript_obj.youtube_video_id}:{transcript_obj.language}:{transcript_obj.updated_at.timestamp()}:{chunk_seconds}"
+    return chunk_index_cache.get_or_set(
+        key, lambda: ChunkIndex(list(get_transcript_index(transcript_obj).buckets(chunk_seconds)))
+    )
+
+
+def related_chunks(transcript_obj, question, window, used_tokens=0, k=TOP_K, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Chunks of the transcript most relevant to ``question`` outside ``window``
+    (``(start, end)`` seconds), best first, as ``[(start, text)]``, stopping
+    before the prompt's transcript context would exceed ``budget`` tokens.
+    """
+    if k <= 0 or used_tokens >= budget:
+        return []
+    chunks = []
+    for start, text, _ in get_chunk_index(transcript_obj).search(question, k, exclude=window):
+        cost = estimate_tokens(text)
+        if used_tokens + cost > budget:
+            break
+        chunks.append((start, text))
+        used_tokens += cost
+    return chunks
+
+
+def format_related_chunks(chunks):
+    """Prompt section listing retrieved chunks in video order, or "" when there are none."""
+    if not chunks:
+        return ""
+    lines = [
+        f"[{int(start) // 60:02d}:{int(start) % 60:02d}] {text}"
+        for start, text in sorted(chunks)
+    ]
+    return "Other relevant parts of the transcript:\n" + "\n".join(lines) + "\n\n"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import CourseModel, VideoModel, SessionModel, NotesModel, ImageModel, QAModel, BookmarkModel
 from django.core.validators import FileExtensionValidator
+from django.conf import settings
 from rest_framework.exceptions import ValidationError
 from rest_framework import serializers
 import re
@@ -59,6 +60,11 @@ class YoutubeSerializer(serializers.Serializer):
     question = serializers.CharField()
     # time_stamp = serializers.FloatField()
     time_stamp = TimestampField()
+    language = serializers.CharField(max_length=10, required=False)
+    # False skips the shared answer cache: the LLM is always asked and the answer is not stored
+    use_cache = serializers.BooleanField(required=False, default=True)
+    # True answers as Server-Sent Events, token by token
+    stream = serializers.BooleanField(required=False, default=False)
 class CreateNoteSerializer(serializers.Serializer):
     youtube_video_url = serializers.URLField()
     notes = serializers.CharField()
@@ -70,6 +76,7 @@ class ImageUploadSerializer(serializers.Serializer):
     question = serializers.CharField(required=False, allow_blank=True)
     time_stamp = TimestampField()
     image = serializers.ImageField()
+    stream = serializers.BooleanField(required=False, default=False)
 
     def validate_image(self, value):
         """Validate image file"""
@@ -164,6 +171,34 @@ class SessionModelSerializer(serializers.ModelSerializer):
 
 class YoutubeTranscriptSerializer(serializers.Serializer):
     youtube_video_url = serializers.URLField()
+    language = serializers.CharField(max_length=10, required=False)
+
+
+class TranscriptBucketSerializer(serializers.Serializer):
+    """Validates the ``?bucket=`` chapter size (in minutes) for the transcript views."""
+    bucket = serializers.IntegerField(min_value=1, max_value=60, required=False)
+
+
+class TranscriptRangeSerializer(serializers.Serializer):
+    """Query parameters for reading a slice of a stored transcript."""
+    start = serializers.FloatField(min_value=0, required=False)
+    end = serializers.FloatField(min_value=0, required=False)
+    cursor = serializers.IntegerField(min_value=0, required=False, default=0)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=getattr(settings, 'TRANSCRIPT_RANGE_MAX_LIMIT', 1000), required=False, default=200
+    )
+    language = serializers.CharField(max_length=10, required=False)
+    stream = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if data.get('start') is not None and data.get('end') is not None and data['end'] < data['start']:
+            raise serializers.ValidationError("end must not be before start.")
+        return data
+
+
+class TranscriptSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=2, max_length=200)
+    limit = serializers.IntegerField(min_value=1, max_value=200, required=False, default=50)
 
 
 class NotesModelSerializer(serializers.ModelSerializer):
@@ -194,6 +229,8 @@ class VideoCourseUpdateSerializer(serializers.ModelSerializer):
 from .models import TranscriptModel
 
 class TranscriptSerializer(serializers.ModelSerializer):
+    transcript_text = serializers.CharField(source='get_text', read_only=True)
+
     class Meta:
         model = TranscriptModel
         fields = ['id', 'youtube_video_id', 'language', 'created_at', 'updated_at', 'transcript_text']
@@ -203,4 +240,22 @@ from .models import MCQModel
 class MCQModelSerializer(serializers.ModelSerializer):
     class Meta:
         model = MCQModel
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+from .models import MCQGenerationJob
+
+class MCQGenerationJobSerializer(serializers.ModelSerializer):
+    video_id = serializers.CharField(source='session.video.youtube_video_id', read_only=True)
+    mcqs = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MCQGenerationJob
+        fields = ['id', 'session', 'video_id', 'language', 'status', 'stage', 'progress', 'attempts',
+                  'last_error', 'created_at', 'updated_at', 'mcqs']
+
+    def get_mcqs(self, obj):
+        # Only finished jobs have questions
+        if obj.status != MCQGenerationJob.STATUS_DONE:
+            return []
+        return MCQModelSerializer(obj.mcqs.order_by('id'), many=True).data
@@ -0,0 +1,105 @@
+import logging
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into a single execution.
+
+    Inside a process, the first caller for a key runs ``func`` and every other
+    thread waits for and receives the same result (or exception). Across
+    workers, the leader also takes a lock in the shared cache; leaders in
+    other workers then poll ``check()`` instead of repeating the work, and
+    only run ``func`` themselves if the lock owner gives up without a result.
+    """
+
+    def __init__(self, name, lock_timeout=60, wait_timeout=30, poll_interval=0.25, alias='default'):
+        self.name = name
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.alias = alias
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, check=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_with_shared_lock(key, func, check)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _lock_key(self, key):
+        return f"singleflight:{self.name}:{key}"
+
+    def _run_with_shared_lock(self, key, func, check):
+        backend = caches[self.alias]
+        lock_key = self._lock_key(key)
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = backend.add(lock_key, token, timeout=self.lock_timeout)
+        except Exception as e:
+            logger.warning(f"Single-flight lock unavailable for {lock_key}: {e}")
+            return func()
+
+        if not acquired and check is not None:
+            metrics.incr(f"singleflight.{self.name}.remote_waits")
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                result = check()
+                if result is not None:
+                    return result
+                if backend.get(lock_key) is None:
+                    break
+            else:
+                logger.warning(f"Timed out waiting on {lock_key}; fetching locally.")
+
+            result = check()
+            if result is not None:
+                return result
+
+        metrics.incr(f"singleflight.{self.name}.executions")
+        try:
+            return func()
+        finally:
+            if acquired:
+                try:
+                    if backend.get(lock_key) == token:
+                        backend.delete(lock_key)
+                except Exception as e:
+                    logger.warning(f"Failed to release single-flight lock {lock_key}: {e}")
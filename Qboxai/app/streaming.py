@@ -0,0 +1,138 @@
+import json
+import re
+import time
+import zlib
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import metrics
+
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def accepts_gzip(request):
+    return bool(_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Gzip a sequence of byte chunks, sync-flushing after each one so the client
+    can decode every chunk as it arrives (Django's compress_sequence only emits
+    what the compressor happens to have buffered).
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def ndjson_chunks(records, batch_size=200):
+    """Encode records as newline-delimited JSON, ``batch_size`` lines per chunk."""
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        if len(lines) >= batch_size:
+            yield ("\n".join(lines) + "\n").encode('utf-8')
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def ndjson_response(request, records, batch_size=200):
+    """StreamingHttpResponse of NDJSON records, gzip-encoded when the client accepts it."""
+    chunks = ndjson_chunks(records, batch_size=batch_size)
+    compress = accepts_gzip(request)
+    response = StreamingHttpResponse(
+        gzip_chunks(chunks) if compress else chunks,
+        content_type='application/x-ndjson',
+    )
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    # Keep reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def sse_event(event, data):
+    """One Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n".encode('utf-8')
+
+
+def sse_response(events):
+    """
+    ``text/event-stream`` response for an iterator (or async iterator) of
+    already-encoded ``sse_event`` frames. Never compressed: gzip would hold
+    tokens back until its buffer fills.
+    """
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def sse_error(error):
+    """``error`` frame for a failed completion; busy-limiter errors say when to retry."""
+    wait = getattr(error, 'wait', None)
+    if wait:
+        return sse_event("error", {"message": str(error), "retry_after": wait})
+    return sse_event("error", {"message": f"Gemini API failed: {str(error)}"})
+
+
+def sse_completion(tokens, started, metric, on_complete, meta=None):
+    """
+    SSE frames for a streamed LLM completion: an optional ``meta`` frame, one
+    ``token`` frame per text piece as it arrives, then ``done`` with whatever
+    ``on_complete(answer)`` returns (it persists the answer), or ``error``.
+    Time to the first token and total time since ``started`` are recorded
+    separately as ``<metric>.first_token`` and ``<metric>.total``.
+    """
+    if meta is not None:
+        yield sse_event("meta", meta)
+    pieces = []
+    try:
+        for text in tokens:
+            if not pieces:
+                metrics.observe(f"{metric}.first_token", time.monotonic() - started)
+            pieces.append(text)
+            yield sse_event("token", {"text": text})
+    except Exception as e:
+        metrics.incr(f"{metric}.errors")
+        yield sse_error(e)
+        return
+
+    answer = "".join(pieces).strip()
+    if not answer:
+        yield sse_event("error", {"message": "Gemini API did not return a valid response."})
+        return
+    payload = on_complete(answer)
+    metrics.observe(f"{metric}.total", time.monotonic() - started)
+    yield sse_event("done", payload)
+
+
+async def asse_completion(tokens, started, metric, on_complete, meta=None):
+    """``sse_completion`` for async token iterators and an async ``on_complete``."""
+    if meta is not None:
+        yield sse_event("meta", meta)
+    pieces = []
+    try:
+        async for text in tokens:
+            if not pieces:
+                metrics.observe(f"{metric}.first_token", time.monotonic() - started)
+            pieces.append(text)
+            yield sse_event("token", {"text": text})
+    except Exception as e:
+        metrics.incr(f"{metric}.errors")
+        yield sse_error(e)
+        return
+
+    answer = "".join(pieces).strip()
+    if not answer:
+        yield sse_event("error", {"message": "Gemini API did not return a valid response."})
+        return
+    payload = await on_complete(answer)
+    metrics.observe(f"{metric}.total", time.monotonic() - started)
+    yield sse_event("done", payload)
@@ -1,3 +1,1706 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib
+import io
+import json
+import math
+import os
+import pickle
+import random
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import nullcontext
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import http_client, ingestion, mcq_bank, mcq_generation, mcq_jobs, metrics, qa_flow, retrieval, transcript_search, youtube_metadata, ytdlp_pool, ytdlp_worker
+from .management.commands import import_transcripts
+from .answer_cache import AnswerCache
+from .cache import TwoTierCache
+from .compact_transcript import CompactTranscript
+from .llm import LLMRegistry
+from .llm_limiter import LLMLimiter, LLMOverloaded
+from .negative_cache import NegativeCache
+from .models import ImageModel, IngestionJob, MCQBankQuestion, MCQGenerationJob, QAModel, SessionModel, TranscriptModel, TranscriptSegment, VideoModel
+from .singleflight import SingleFlight
+from .serializers import TranscriptSerializer
+from .streaming import asse_completion, gzip_chunks, ndjson_chunks, sse_completion
+from .transcript_providers import CircuitBreaker, ProviderChain, RapidAPIProvider, TranscriptProvider
+from .transcript_index import (
+    TranscriptIndex, format_buckets, get_transcript_buckets, iter_transcript_range, transcript_slice, transcript_window,
+)
+from .utils import (
+    create_transcript, generate_mcqs_from_transcript, get_or_fetch_best_transcript, parse_mcq_output,
+    transcript_cache_key,
+)
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = TwoTierCache("test", max_entries=2, ttl=60)
+
+    def test_local_tier_evicts_least_recently_used(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+
+        self.cache.clear_local()
+        self.assertEqual(self.cache.stats()["size"], 0)
+        # Evicted locally but still in the shared tier
+        self.assertEqual(self.cache.get("b"), 2)
+        self.assertEqual(self.cache.stats()["shared_hits"], 1)
+
+    def test_eviction_is_counted(self):
+        for key in "abc":
+            self.cache.set(key, key)
+        stats = self.cache.stats()
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_shared_hit_is_promoted_to_local_tier(self):
+        cache.set("test:k", "v")
+        self.assertEqual(self.cache.get("k"), "v")
+        self.assertEqual(self.cache.get("k"), "v")
+        stats = self.cache.stats()
+        self.assertEqual((stats["shared_hits"], stats["local_hits"]), (1, 1))
+
+    def test_expired_local_entry_is_a_miss(self):
+        local_only = TwoTierCache("test_local", ttl=60, shared=False)
+        with mock.patch("app.cache.time.monotonic", return_value=1000.0):
+            local_only.set("k", "v")
+        with mock.patch("app.cache.time.monotonic", return_value=1061.0):
+            self.assertIsNone(local_only.get("k"))
+        self.assertEqual(local_only.stats()["expirations"], 1)
+
+    def test_none_is_never_stored(self):
+        self.cache.set("k", None)
+        self.assertEqual(self.cache.stats()["sets"], 0)
+        self.assertEqual(self.cache.get_or_set("k", lambda: "loaded"), "loaded")
+        self.assertEqual(self.cache.get("k"), "loaded")
+
+    def test_backend_errors_fall_back_to_a_miss(self):
+        with mock.patch.object(self.cache, "_backend", side_effect=RuntimeError("down")):
+            self.assertIsNone(self.cache.get("missing"))
+        self.assertEqual(self.cache.stats()["backend_errors"], 1)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.flight = SingleFlight("test", poll_interval=0.01, wait_timeout=1)
+
+    def test_concurrent_calls_share_one_execution(self):
+        started, release = threading.Event(), threading.Event()
+        calls, results = [], []
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait(1)
+            return "value"
+
+        leader = threading.Thread(target=lambda: results.append(self.flight.do("k", func)))
+        leader.start()
+        started.wait(1)
+        followers = [threading.Thread(target=lambda: results.append(self.flight.do("k", func))) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        while metrics.snapshot()["counters"].get("singleflight.test.coalesced", 0) < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(1)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["value"] * 4)
+
+    def test_leader_error_is_raised_and_lock_released(self):
+        with self.assertRaises(ValueError):
+            self.flight.do("k", mock.Mock(side_effect=ValueError("boom")))
+        self.assertIsNone(cache.get(self.flight._lock_key("k")))
+        self.assertEqual(self.flight.do("k", lambda: "retried"), "retried")
+
+    def test_waits_for_another_workers_result(self):
+        cache.add(self.flight._lock_key("k"), "other-worker", 60)
+        func = mock.Mock(return_value="local")
+        check = mock.Mock(side_effect=[None, "remote"])
+
+        self.assertEqual(self.flight.do("k", func, check=check), "remote")
+        func.assert_not_called()
+
+    def test_runs_locally_when_other_worker_gives_up(self):
+        cache.add(self.flight._lock_key("k"), "other-worker", 60)
+
+        def check():
+            cache.delete(self.flight._lock_key("k"))
+            return None
+
+        self.assertEqual(self.flight.do("k", lambda: "local", check=check), "local")
+
+
+def _sample_segments(count=300, seed=7):
+    rng = random.Random(seed)
+    segments = [
+        {'text': f"line {i}", 'start': round(rng.uniform(0, 3600), 2), 'duration': round(rng.uniform(1, 6), 2)}
+        for i in range(count)
+    ]
+    # Some players emit several segments at the same offset
+    segments += [{'text': "dup a", 'start': 600.0, 'duration': 1.0}, {'text': "dup b", 'start': 600.0, 'duration': 1.0}]
+    return segments
+
+
+class NegativeCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_workers_setting_different_kinds_keep_both(self):
+        # Two workers, each with its own local tier
+        first, second = NegativeCache("test-negative"), NegativeCache("test-negative")
+        second.set("vid00000060", "transcript:fr", "no_transcript")  # second now holds a local copy
+        first.set("vid00000060", "transcript:en", "no_transcript")
+        second.set("vid00000060", "title", "provider_error")
+
+        third = NegativeCache("test-negative")
+        self.assertEqual(third.get("vid00000060", "transcript:en"), "no_transcript")
+        self.assertEqual(third.get("vid00000060", "title"), "provider_error")
+
+    def test_set_waits_for_the_lock(self):
+        negative = NegativeCache("test-negative")
+        cache.add("test-negative:lock:vid00000061", "other", timeout=5)
+        threading.Timer(0.05, cache.delete, ["test-negative:lock:vid00000061"]).start()
+        negative.set("vid00000061", "title", "provider_error")
+        self.assertEqual(negative.get("vid00000061", "title"), "provider_error")
+        self.assertIsNone(cache.get("test-negative:lock:vid00000061"))
+
+    def test_set_goes_ahead_when_the_lock_is_stuck(self):
+        negative = NegativeCache("test-negative")
+        cache.add("test-negative:lock:vid00000062", "other", timeout=5)
+        with mock.patch("app.negative_cache.SET_LOCK_WAIT", 0.02):
+            negative.set("vid00000062", "title", "provider_error")
+        self.assertEqual(negative.get("vid00000062", "title"), "provider_error")
+        self.assertEqual(cache.get("test-negative:lock:vid00000062"), "other")
+
+    def test_clear_drops_every_kind(self):
+        negative = NegativeCache("test-negative")
+        negative.set("vid00000063", "title", "provider_error")
+        negative.set("vid00000063", "transcript:es", "no_transcript")
+        negative.clear("vid00000063")
+        self.assertEqual(negative.entries("vid00000063"), {})
+
+
+class TranscriptIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.segments = _sample_segments()
+        self.ordered = sorted(self.segments, key=lambda seg: seg['start'])
+        self.index = TranscriptIndex(self.segments)
+
+    def test_window_matches_linear_scan(self):
+        for start, end in [(0, 60), (540, 660), (600, 600), (3590, 4000), (-10, 5), (1200, 1100)]:
+            expected = [seg for seg in self.ordered if start <= seg['start'] <= end]
+            self.assertEqual(self.index.window(start, end), expected, (start, end))
+            self.assertEqual(self.index.text(start, end), " ".join(seg['text'] for seg in expected))
+
+    def test_around_clamps_at_zero(self):
+        expected = [seg for seg in self.ordered if 0 <= seg['start'] <= 70]
+        self.assertEqual(self.index.around(10, 60), expected)
+
+    def test_buckets_match_linear_grouping(self):
+        for minutes in (1, 5, 10):
+            size = minutes * 60
+            grouped = {}
+            for seg in self.ordered:
+                grouped.setdefault(int(seg['start'] // size) * size, []).append(seg['text'])
+            expected = [(start, " ".join(texts)) for start, texts in grouped.items()]
+            self.assertEqual(list(self.index.buckets(size)), expected)
+
+    def test_empty_transcript(self):
+        index = TranscriptIndex([])
+        self.assertEqual(index.window(0, 100), [])
+        self.assertEqual(list(index.buckets(60)), [])
+
+
+def _transcript_data(segments):
+    return {"segments": segments, "full_text": " ".join(seg['text'] for seg in segments)}
+
+
+class TranscriptSegmentTableTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.segments = _sample_segments(120)
+
+    def test_create_transcript_stores_one_row_per_segment(self):
+        transcript_obj = create_transcript("vid00000001", _transcript_data(self.segments), "en")
+        self.assertEqual(transcript_obj.segment_count, len(self.segments))
+        self.assertEqual(TranscriptSegment.objects.filter(transcript=transcript_obj).count(), len(self.segments))
+
+    def test_sql_window_matches_in_memory_window(self):
+        transcript_obj = create_transcript("vid00000001", _transcript_data(self.segments), "en")
+        index = TranscriptIndex(self.segments)
+        for start, end in [(0, 60), (540, 660), (3000, 3600)]:
+            rows = transcript_window(transcript_obj, start, end)
+            self.assertEqual(
+                sorted((row['start'], row['text']) for row in rows),
+                sorted((seg['start'], seg['text']) for seg in index.window(start, end)),
+            )
+
+    def test_window_falls_back_to_index_without_segment_rows(self):
+        transcript_obj = TranscriptModel.objects.create(
+            youtube_video_id="vid00000002", language="en", transcript_data=self.segments,
+        )
+        self.assertEqual(transcript_window(transcript_obj, 0, 600), TranscriptIndex(self.segments).window(0, 600))
+
+    @override_settings(TRANSCRIPT_COMPACT_STORAGE=True)
+    def test_compact_storage_keeps_the_text_only_in_the_blob(self):
+        data = _transcript_data(self.segments)
+        create_transcript("vid00000004", data, "en")
+        transcript_obj = TranscriptModel.objects.get(youtube_video_id="vid00000004")
+        self.assertEqual((transcript_obj.transcript_data, transcript_obj.transcript_text), ([], ''))
+        self.assertEqual(transcript_obj.get_text(), data["full_text"])
+        self.assertEqual(TranscriptSerializer(transcript_obj).data["transcript_text"], data["full_text"])
+
+    def test_backfill_migration_fills_missing_segments(self):
+        migration = importlib.import_module("app.migrations.0006_backfill_transcript_segments")
+        transcript_obj = TranscriptModel.objects.create(
+            youtube_video_id="vid00000003", language="en", transcript_data=self.segments,
+        )
+        migration.backfill_segments(apps, None)
+
+        transcript_obj.refresh_from_db()
+        self.assertEqual(transcript_obj.segment_count, len(self.segments))
+        self.assertEqual(
+            list(transcript_obj.segments.order_by('position').values_list('text', flat=True)),
+            [seg['text'] for seg in self.segments],
+        )
+
+
+class TranscriptLanguageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.data = _transcript_data(_sample_segments(10))
+
+    def test_one_row_per_language(self):
+        english = create_transcript("vid00000050", self.data, "en")
+        spanish = create_transcript("vid00000050", self.data, "es")
+        self.assertNotEqual(english.pk, spanish.pk)
+        self.assertEqual(create_transcript("vid00000050", self.data, "es").pk, spanish.pk)
+        self.assertEqual(create_transcript("vid00000050", self.data).language, "en")
+
+    def test_cache_keys_are_per_language(self):
+        self.assertNotEqual(transcript_cache_key("vid00000050", "en"), transcript_cache_key("vid00000050", "es"))
+        self.assertEqual(transcript_cache_key("vid00000050"), transcript_cache_key("vid00000050", "en"))
+
+    @mock.patch("app.utils.get_transcript_with_cache")
+    @mock.patch("app.utils.available_transcript_language_codes", return_value=["es"])
+    def test_stored_language_is_served_without_fetching(self, available, fetch):
+        spanish = create_transcript("vid00000051", self.data, "es")
+        self.assertEqual(get_or_fetch_best_transcript("vid00000051", "es"), (spanish, "database"))
+        # English is not listed for the video, so the stored Spanish one is used instead
+        self.assertEqual(get_or_fetch_best_transcript("vid00000051", "en"), (spanish, "database"))
+        fetch.assert_not_called()
+
+    @mock.patch("app.utils.available_transcript_language_codes", return_value=["de", "fr"])
+    def test_listed_languages_are_fetched_in_order(self, available):
+        with mock.patch("app.utils.get_transcript_with_cache", side_effect=[None, self.data]) as fetch:
+            transcript_obj, source = get_or_fetch_best_transcript("vid00000052", "en")
+        self.assertEqual([c.args for c in fetch.call_args_list], [("vid00000052", "de"), ("vid00000052", "fr")])
+        self.assertEqual((transcript_obj.language, source), ("fr", "fetched"))
+
+    @mock.patch("app.utils.available_transcript_language_codes", return_value=[])
+    def test_requested_language_is_fetched_when_list_is_unknown(self, available):
+        with mock.patch("app.utils.get_transcript_with_cache", return_value=self.data) as fetch:
+            transcript_obj, _ = get_or_fetch_best_transcript("vid00000053", "es")
+        fetch.assert_called_once_with("vid00000053", "es")
+        self.assertEqual(transcript_obj.language, "es")
+
+
+class CompactTranscriptTests(SimpleTestCase):
+    segments = [
+        {'text': "Hello", 'start': 0.0, 'duration': 1.5},
+        {'text': "", 'start': 1.5, 'duration': 0.0},
+        {'text': "naïve café — ünïcödé 🎓", 'start': 2.25, 'duration': 3.0},
+    ]
+
+    def test_segments_round_trip(self):
+        compact = CompactTranscript.from_segments(self.segments)
+        self.assertEqual(len(compact), 3)
+        self.assertEqual(compact.to_segments(), self.segments)
+        self.assertEqual(compact.full_text, "Hello  naïve café — ünïcödé 🎓")
+
+    def test_bytes_round_trip(self):
+        blob = CompactTranscript.from_segments(self.segments).to_bytes()
+        self.assertEqual(CompactTranscript.from_bytes(blob).to_segments(), self.segments)
+
+    def test_uses_zstd_when_installed(self):
+        from . import compact_transcript
+        if compact_transcript.zstandard is None:
+            self.skipTest("zstandard is not installed")
+        self.assertEqual(CompactTranscript.from_segments(self.segments).to_bytes()[4:5], b'z')
+
+    def test_zlib_blob_round_trip(self):
+        with mock.patch("app.compact_transcript.zstandard", None):
+            blob = CompactTranscript.from_segments(self.segments).to_bytes()
+        self.assertEqual(blob[4:5], b'l')
+        self.assertEqual(CompactTranscript.from_bytes(blob).to_segments(), self.segments)
+
+    def test_pickles_as_blob(self):
+        restored = pickle.loads(pickle.dumps(CompactTranscript.from_segments(self.segments)))
+        self.assertEqual(restored.to_segments(), self.segments)
+
+    def test_rejects_foreign_blob(self):
+        with self.assertRaises(ValueError):
+            CompactTranscript.from_bytes(b"not a transcript")
+
+    def test_empty_transcript(self):
+        blob = CompactTranscript.from_segments([]).to_bytes()
+        self.assertEqual(CompactTranscript.from_bytes(blob).to_segments(), [])
+
+
+class TranscriptBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.segments = [
+            {'text': "intro", 'start': 5.0, 'duration': 2.0},
+            {'text': "still intro", 'start': 290.0, 'duration': 2.0},
+            {'text': "chapter two", 'start': 301.0, 'duration': 2.0},
+            {'text': "late", 'start': 1250.0, 'duration': 2.0},
+        ]
+
+    def test_format_buckets_skips_empty_buckets(self):
+        self.assertEqual(format_buckets(TranscriptIndex(self.segments), 5), {
+            "0m - 5m": "intro still intro",
+            "5m - 10m": "chapter two",
+            "20m - 25m": "late",
+        })
+
+    def test_default_sizes_are_warmed_at_ingest(self):
+        transcript_obj = create_transcript("vid00000010", _transcript_data(self.segments), "en")
+        with mock.patch("app.transcript_index.format_buckets") as format_mock:
+            buckets = get_transcript_buckets(transcript_obj, 5)
+        format_mock.assert_not_called()
+        self.assertEqual(buckets["5m - 10m"], "chapter two")
+
+    def test_other_sizes_are_computed_once(self):
+        transcript_obj = create_transcript("vid00000011", _transcript_data(self.segments), "en")
+        with mock.patch("app.transcript_index.format_buckets", wraps=format_buckets) as format_mock:
+            first = get_transcript_buckets(transcript_obj, 15)
+            second = get_transcript_buckets(transcript_obj, 15)
+        self.assertEqual(format_mock.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first, {"0m - 15m": "intro still intro chapter two", "15m - 30m": "late"})
+
+
+class IngestionQueueTests(TestCase):
+    def setUp(self):
+        self.job = IngestionJob.objects.create(youtube_video_id="vid00000020", kind=IngestionJob.KIND_TRANSCRIPT)
+
+    def test_claim_marks_jobs_running_once(self):
+        claimed = ingestion.claim_jobs()
+        self.assertEqual([job.pk for job in claimed], [self.job.pk])
+        self.assertEqual(claimed[0].status, IngestionJob.STATUS_RUNNING)
+        self.assertEqual(ingestion.claim_jobs(), [])
+
+    def test_claim_skips_job_taken_after_it_was_read(self):
+        stale_read = IngestionJob.objects.get(pk=self.job.pk)
+        ingestion.claim_jobs()
+        self.assertFalse(ingestion._claim(IngestionJob, stale_read, timezone.now()))
+
+    def test_only_one_of_two_workers_reclaims_a_stale_job(self):
+        IngestionJob.objects.filter(pk=self.job.pk).update(
+            status=IngestionJob.STATUS_RUNNING, locked_at=timezone.now() - timedelta(hours=1)
+        )
+        first_read = IngestionJob.objects.get(pk=self.job.pk)
+        second_read = IngestionJob.objects.get(pk=self.job.pk)
+        now = timezone.now()
+        self.assertEqual([ingestion._claim(IngestionJob, job, now) for job in (first_read, second_read)], [True, False])
+
+    def test_future_and_freshly_locked_jobs_are_not_claimed(self):
+        IngestionJob.objects.filter(pk=self.job.pk).update(run_after=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(ingestion.claim_jobs(), [])
+        IngestionJob.objects.filter(pk=self.job.pk).update(
+            status=IngestionJob.STATUS_RUNNING, locked_at=timezone.now(), run_after=timezone.now()
+        )
+        self.assertEqual(ingestion.claim_jobs(), [])
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = ingestion.claim_jobs()[0]
+        runner = mock.Mock(side_effect=ingestion.IngestionError("no transcript"))
+        with mock.patch.dict(ingestion.JOB_RUNNERS, {IngestionJob.KIND_TRANSCRIPT: runner}), \
+                mock.patch.object(ingestion, "backoff_delay", return_value=45) as delay:
+            before = timezone.now()
+            ingestion.run_job(job)
+
+        job.refresh_from_db()
+        delay.assert_called_once_with(1)
+        self.assertEqual((job.status, job.attempts, job.locked_at), (IngestionJob.STATUS_PENDING, 1, None))
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=45))
+        self.assertEqual(job.last_error, "no transcript")
+        self.assertEqual(ingestion.claim_jobs(), [])
+
+    def test_job_fails_permanently_after_max_attempts(self):
+        IngestionJob.objects.filter(pk=self.job.pk).update(attempts=ingestion.MAX_ATTEMPTS - 1)
+        job = ingestion.claim_jobs()[0]
+        runner = mock.Mock(side_effect=ingestion.IngestionError("still nothing"))
+        with mock.patch.dict(ingestion.JOB_RUNNERS, {IngestionJob.KIND_TRANSCRIPT: runner}):
+            ingestion.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.STATUS_FAILED)
+
+    def test_successful_job_is_done(self):
+        job = ingestion.claim_jobs()[0]
+        with mock.patch.dict(ingestion.JOB_RUNNERS, {IngestionJob.KIND_TRANSCRIPT: mock.Mock()}):
+            ingestion.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), (IngestionJob.STATUS_DONE, ''))
+
+    def test_backoff_delay_grows_exponentially(self):
+        with mock.patch("app.ingestion.random.uniform", side_effect=lambda lo, hi: hi):
+            delays = [ingestion.backoff_delay(attempt) for attempt in (1, 2, 3)]
+        self.assertEqual(delays, [ingestion.BACKOFF_SECONDS * factor for factor in (1, 2, 4)])
+
+    def test_enqueue_skips_active_duplicates(self):
+        self.assertEqual(ingestion.enqueue_ingestion("vid00000020"), [IngestionJob.KIND_METADATA])
+        self.assertEqual(ingestion.enqueue_ingestion("vid00000020"), [])
+
+
+def _http_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return response
+
+
+@mock.patch("app.http_client.time.sleep")
+class PooledHttpClientTests(SimpleTestCase):
+    def test_session_is_shared_per_host(self, sleep):
+        self.assertIs(http_client.get_session("api.example.com"), http_client.get_session("api.example.com"))
+        self.assertIsNot(http_client.get_session("api.example.com"), http_client.get_session("other.example.com"))
+
+    def test_default_timeout_is_applied(self, sleep):
+        session = http_client.get_session("timeouts.example.com")
+        with mock.patch.object(session, "request", return_value=_http_response(200)) as send:
+            http_client.get("https://timeouts.example.com/x")
+        self.assertEqual(send.call_args.kwargs["timeout"], (http_client.CONNECT_TIMEOUT, http_client.READ_TIMEOUT))
+
+    def test_get_is_retried_on_503_honouring_retry_after(self, sleep):
+        session = http_client.get_session("retry.example.com")
+        responses = [_http_response(503, {"Retry-After": "3"}), _http_response(200)]
+        with mock.patch.object(session, "request", side_effect=responses) as send:
+            response = http_client.get("https://retry.example.com/x")
+        self.assertEqual((response.status_code, send.call_count), (200, 2))
+        sleep.assert_called_once_with(3)
+
+    def test_post_is_not_retried(self, sleep):
+        session = http_client.get_session("post.example.com")
+        with mock.patch.object(session, "request", return_value=_http_response(503)) as send:
+            self.assertEqual(http_client.post("https://post.example.com/x").status_code, 503)
+        self.assertEqual(send.call_count, 1)
+
+    def test_connection_errors_raise_after_last_retry(self, sleep):
+        session = http_client.get_session("down.example.com")
+        with mock.patch.object(session, "request", side_effect=requests.ConnectionError("refused")) as send:
+            with self.assertRaises(requests.ConnectionError):
+                http_client.get("https://down.example.com/x")
+        self.assertEqual(send.call_count, http_client.MAX_RETRIES + 1)
+
+
+VIDEO_URL = "https://www.youtube.com/watch?v=vid00000030"
+
+
+def _user(email="learner@example.com"):
+    return get_user_model().objects.create_user(username=email.split("@")[0], email=email, password="pw")
+
+
+class AskQuestionViewTests(TestCase):
+    """The sync and async ask-question views share qa_flow and must answer alike."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = _user()
+        self.client_sync = APIClient()
+        self.client_sync.force_authenticate(self.user)
+        self.bearer = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        patches = [
+            mock.patch("app.views.get_video_title_with_cache", return_value="A video"),
+            mock.patch("app.async_views.aget_video_title_with_cache", mock.AsyncMock(return_value="A video")),
+            mock.patch("app.views.get_or_fetch_best_transcript", return_value=(None, None)),
+            mock.patch("app.async_views.aget_or_fetch_best_transcript", mock.AsyncMock(return_value=(None, None))),
+            mock.patch("app.qa_flow.get_transcript_languages_cached"),
+            mock.patch("app.qa_flow.answer_cache", AnswerCache("test-answers")),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def ask(self, asynchronous, **data):
+        body = {"youtube_video_url": VIDEO_URL, "question": "Why?", "time_stamp": 30, **data}
+        if asynchronous:
+            response = self.client.post(
+                "/app/async/ask-question/", body, content_type="application/json", HTTP_AUTHORIZATION=self.bearer
+            )
+        else:
+            response = self.client_sync.post("/app/ask-question/", body, format="json")
+        return response.status_code, response.json()
+
+    def test_both_views_answer_alike(self):
+        with mock.patch("app.views.generate_ai_response", return_value="Because."), \
+                mock.patch("app.async_views.agenerate_ai_response", mock.AsyncMock(return_value="Because.")):
+            results = [self.ask(asynchronous) for asynchronous in (False, True)]
+
+        for status_code, body in results:
+            self.assertEqual(status_code, 201)
+            self.assertEqual(body["data"]["answer"], "Because.")
+            self.assertEqual(body["data"]["transcript_segment"], qa_flow.NO_TRANSCRIPT)
+        # The answer cache is shared, so the second view reuses the first one's answer
+        self.assertEqual([body["data"]["cached"] for _, body in results], [False, True])
+        self.assertEqual(set(results[0][1]["data"]), set(results[1][1]["data"]))
+        self.assertEqual(QAModel.objects.filter(session__user=self.user).count(), 2)
+
+    def test_rejections_have_the_same_shape(self):
+        for asynchronous in (False, True):
+            self.assertEqual(
+                self.ask(asynchronous, youtube_video_url="https://example.com/watch"),
+                (400, {"success": False, "message": "Invalid YouTube URL."}),
+            )
+
+    def test_question_limit_is_enforced_by_both_views(self):
+        session, _ = qa_flow.open_session(self.user, "vid00000030", "A video", VIDEO_URL)
+        QAModel.objects.bulk_create(
+            QAModel(session=session, question="q", answer="a", time_stamp=1) for _ in range(5)
+        )
+        for asynchronous in (False, True):
+            status_code, body = self.ask(asynchronous)
+            self.assertEqual(status_code, 403)
+            self.assertEqual((body["success"], body["is_premium"]), (False, False))
+
+    def test_llm_errors_become_500s(self):
+        with mock.patch("app.views.generate_ai_response", side_effect=RuntimeError("boom")), \
+                mock.patch("app.async_views.agenerate_ai_response", mock.AsyncMock(side_effect=RuntimeError("boom"))):
+            for asynchronous in (False, True):
+                self.assertEqual(
+                    self.ask(asynchronous), (500, {"success": False, "message": "Gemini API failed: boom"})
+                )
+
+
+    def test_repeated_question_is_answered_from_the_cache(self):
+        with mock.patch("app.views.generate_ai_response", return_value="Because.") as generate:
+            first = self.ask(False, question="Why is the sky blue?")
+            second = self.ask(False, question="  why is the SKY blue ", time_stamp=40)
+            bypass = self.ask(False, question="Why is the sky blue?", use_cache=False)
+
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual([body["data"]["cached"] for _, body in (first, second, bypass)], [False, True, False])
+        self.assertEqual(second[1]["data"]["answer"], "Because.")
+        # Cache hits are still recorded against the user's session
+        self.assertEqual(QAModel.objects.filter(session__user=self.user).count(), 3)
+
+    def test_cached_answer_is_streamed_without_the_llm(self):
+        with mock.patch("app.views.generate_ai_response", return_value="Because."):
+            self.ask(False)
+        with mock.patch("app.views.stream_ai_response") as stream:
+            response = self.client_sync.post("/app/ask-question/", {
+                "youtube_video_url": VIDEO_URL, "question": "Why?", "time_stamp": 30, "stream": True,
+            }, format="json")
+            body = b"".join(response.streaming_content).decode()
+        stream.assert_not_called()
+        self.assertIn('"cached": true', body)
+        self.assertIn("event: done", body)
+
+
+class ClipLimitTests(TestCase):
+    def setUp(self):
+        self.user = _user()
+        self.session, _ = qa_flow.open_session(self.user, "vid00000031", "A video", VIDEO_URL)
+
+    def add_clips(self, session, count):
+        ImageModel.objects.bulk_create(
+            ImageModel(session=session, image="clips/x.jpg", question="q", answer="a", time_stamp=1)
+            for _ in range(count)
+        )
+
+    def test_per_video_limit(self):
+        self.add_clips(self.session, qa_flow.FREE_CLIPS_PER_VIDEO)
+        with self.assertRaises(qa_flow.RequestRejected) as rejected:
+            qa_flow.check_clip_limit(self.user, self.session)
+        self.assertEqual(rejected.exception.status_code, 403)
+        self.assertEqual(rejected.exception.payload["limit_type"], "session")
+
+    def test_total_limit(self):
+        other, _ = qa_flow.open_session(self.user, "vid00000032", "Other video", VIDEO_URL)
+        self.add_clips(other, qa_flow.FREE_CLIPS_TOTAL)
+        with self.assertRaises(qa_flow.RequestRejected) as rejected:
+            qa_flow.check_clip_limit(self.user, self.session)
+        self.assertEqual(rejected.exception.payload["limit_type"], "total")
+
+    def test_under_the_limit(self):
+        self.add_clips(self.session, qa_flow.FREE_CLIPS_PER_VIDEO - 1)
+        self.assertIsNone(qa_flow.check_clip_limit(self.user, self.session))
+
+
+class ImportTranscriptsTests(TestCase):
+    def setUp(self):
+        self.segments = _sample_segments(20)
+        self.command = import_transcripts.Command(stdout=io.StringIO())
+        self.command.language = "en"
+        self.command.segment_table = True
+
+    def test_imports_listed_ids_and_skips_stored_ones(self):
+        create_transcript("vid00000040", _transcript_data(self.segments), "en")
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("vid00000040\nhttps://www.youtube.com/watch?v=vid00000041\n# comment\nnot a url\n")
+        self.addCleanup(os.unlink, f.name)
+
+        out = io.StringIO()
+        fetcher = "fetch_transcript_with_super_data_api"
+        with mock.patch.object(import_transcripts, fetcher, return_value=self.segments) as fetch:
+            call_command(
+                "import_transcripts", f.name, "--skip-titles", "--workers", "1", stdout=out, stderr=io.StringIO()
+            )
+
+        fetch.assert_called_once_with("vid00000041", "en")
+        transcript_obj = TranscriptModel.objects.get(youtube_video_id="vid00000041")
+        self.assertEqual(transcript_obj.segment_count, len(self.segments))
+        self.assertEqual(TranscriptSegment.objects.filter(transcript=transcript_obj).count(), len(self.segments))
+        self.assertIn("Imported 1 transcript(s)", out.getvalue())
+
+    def test_rows_stored_meanwhile_are_reported_not_touched(self):
+        # Stored by a request between the command's existence check and its flush
+        other = TranscriptModel.objects.create(youtube_video_id="vid00000042", language="en", transcript_data=[])
+        pending = {"vid00000042": (self.segments, None), "vid00000043": (self.segments, None)}
+
+        self.assertEqual(self.command.flush(pending), (1, 1))
+        other.refresh_from_db()
+        self.assertEqual(other.segment_count, 0)
+        self.assertFalse(TranscriptSegment.objects.filter(transcript=other).exists())
+        self.assertEqual(TranscriptModel.objects.get(youtube_video_id="vid00000043").segment_count, len(self.segments))
+
+
+class FakeProvider(TranscriptProvider):
+    def __init__(self, name, result, delay=0.0):
+        super().__init__()
+        self.name = name
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    def _fetch(self, video_id, language):
+        self.calls += 1
+        time.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+TRANSCRIPT = [{'text': "hi", 'start': 0.0, 'duration': 1.0}]
+
+
+class ProviderChainTests(SimpleTestCase):
+    def test_falls_through_to_the_next_provider(self):
+        broken = FakeProvider("broken", RuntimeError("down"))
+        working = FakeProvider("working", (TRANSCRIPT, None))
+        chain = ProviderChain([broken, working], hedge_after=5)
+        self.assertEqual(chain.fetch("vid00000070"), (TRANSCRIPT, None))
+        self.assertEqual((broken.calls, working.calls), (1, 1))
+
+    def test_final_reason_stops_the_chain(self):
+        first = FakeProvider("first", (None, "captions_disabled"))
+        second = FakeProvider("second", (TRANSCRIPT, None))
+        self.assertEqual(ProviderChain([first, second]).fetch("vid00000071"), (None, "captions_disabled"))
+        self.assertEqual(second.calls, 0)
+
+    def test_definitive_reason_outranks_provider_errors(self):
+        chain = ProviderChain([
+            FakeProvider("a", (None, "provider_error")),
+            FakeProvider("b", (None, "no_transcript")),
+        ])
+        self.assertEqual(chain.fetch("vid00000072"), (None, "no_transcript"))
+
+    def test_slow_provider_is_hedged(self):
+        slow = FakeProvider("slow", (TRANSCRIPT, None), delay=0.5)
+        fast = FakeProvider("fast", ([{'text': "fast", 'start': 0.0, 'duration': 1.0}], None))
+        segments, _ = ProviderChain([slow, fast], hedge_after=0.05).fetch("vid00000073")
+        self.assertEqual(segments[0]['text'], "fast")
+
+    def test_async_fetch_matches(self):
+        chain = ProviderChain([
+            FakeProvider("broken", (None, "provider_error")),
+            FakeProvider("ok", (TRANSCRIPT, None)),
+        ])
+        self.assertEqual(asyncio.run(chain.afetch("vid00000074")), (TRANSCRIPT, None))
+
+    def test_open_breaker_is_skipped_and_unhealthy_providers_go_last(self):
+        flaky = FakeProvider("flaky", RuntimeError("down"))
+        steady = FakeProvider("steady", (TRANSCRIPT, None))
+        for _ in range(flaky.breaker.threshold):
+            flaky.fetch("vid00000075")
+        chain = ProviderChain([flaky, steady])
+        self.assertEqual([p.name for p in chain.ordered()], ["steady", "flaky"])
+
+        flaky.calls = 0
+        self.assertEqual(ProviderChain([flaky]).fetch("vid00000075"), (None, "provider_error"))
+        self.assertEqual(flaky.calls, 0)
+
+    def test_rapidapi_offsets_are_milliseconds(self):
+        response = _http_response(200)
+        response._content = b'{"content": [{"text": "hi", "offset": 1500, "duration": 2000}]}'
+        self.assertEqual(
+            RapidAPIProvider()._parse("vid00000076", response),
+            ([{'text': "hi", 'start': 1.5, 'duration': 2.0}], None),
+        )
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_threshold_failures(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        breaker.record(False)
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_half_open_lets_one_trial_through(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0)
+        breaker.record(False)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual([breaker.allow(), breaker.allow()], [True, False])
+
+        breaker.record(True)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=0)
+        for _ in range(3):
+            breaker.record(False)
+        breaker.allow()
+        breaker.cooldown = 60
+        breaker.record(False)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+class TranscriptRangeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.segments = sorted(_sample_segments(120), key=lambda seg: seg['start'])
+        self.with_rows = create_transcript("vid00000080", _transcript_data(self.segments), "en")
+        with override_settings(TRANSCRIPT_SEGMENT_TABLE=False):
+            self.without_rows = create_transcript("vid00000081", _transcript_data(self.segments), "en")
+        self.api = APIClient()
+        self.api.force_authenticate(_user())
+
+    def expected(self, start, end):
+        return [seg for seg in self.segments if start <= seg['start'] <= end]
+
+    def pages(self, transcript_obj, start, end, limit):
+        segments, cursor = [], 0
+        while cursor is not None:
+            page, cursor = transcript_slice(transcript_obj, start, end, cursor, limit)
+            self.assertLessEqual(len(page), limit)
+            segments.extend(page)
+        return segments
+
+    def test_pages_match_a_linear_scan_with_and_without_segment_rows(self):
+        self.assertEqual(self.without_rows.segment_count, 0)
+        for transcript_obj in (self.with_rows, self.without_rows):
+            for start, end in ((0, 3600), (600, 600), (100.5, 900), (5000, 6000)):
+                self.assertEqual(self.pages(transcript_obj, start, end, 7), self.expected(start, end))
+                self.assertEqual(list(iter_transcript_range(transcript_obj, start, end)), self.expected(start, end))
+
+    def test_paged_endpoint(self):
+        response = self.api.get("/app/transcripts/vid00000080/segments/", {"start": 100, "end": 900, "limit": 5})
+        body = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body["segments"], self.expected(100, 900)[:5])
+        self.assertIsNotNone(body["next_cursor"])
+
+        response = self.api.get("/app/transcripts/vid00000080/segments/", {"start": 900, "end": 100})
+        self.assertEqual(response.status_code, 400)
+
+    def test_streamed_endpoint_is_gzipped_ndjson(self):
+        response = self.api.get(
+            "/app/transcripts/vid00000081/segments/", {"start": 100, "end": 900, "stream": "1"},
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode().splitlines()
+        header, *segments = [json.loads(line) for line in lines]
+        self.assertEqual((header["video_id"], header["language"]), ("vid00000081", "en"))
+        self.assertEqual(segments, self.expected(100, 900))
+
+
+class TranscriptSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner, self.viewer = _user("owner@example.com"), _user("viewer@example.com")
+        video = VideoModel.objects.create(
+            user=self.owner, youtube_video_id="vid00000090", video_title="Photosynthesis", video_url=VIDEO_URL
+        )
+        SessionModel.objects.create(user=self.viewer, video=video)
+        create_transcript("vid00000090", _transcript_data([
+            {'text': "plants turn sunlight into sugar", 'start': 12.0, 'duration': 3.0},
+            {'text': "the chloroplast holds chlorophyll", 'start': 20.0, 'duration': 3.0},
+        ]), "en")
+        self.api = APIClient()
+
+    def search(self, user, q):
+        self.api.force_authenticate(user)
+        return self.api.get("/app/transcripts/search/", {"q": q}).json()
+
+    def test_titles_come_from_other_users_videos(self):
+        body = self.search(self.viewer, "sunlight")
+        self.assertEqual([r["video_title"] for r in body["results"]], ["Photosynthesis"])
+        self.assertEqual(body["results"][0]["matches"][0]["start"], 12.0)
+
+    def test_only_the_users_videos_are_searched(self):
+        self.assertEqual(self.search(_user("stranger@example.com"), "sunlight")["results"], [])
+
+    def test_dropped_triggers_are_recreated(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER app_transcriptsegment_fts_ai")
+        self.assertTrue(transcript_search.ensure_search_index())
+        self.assertFalse(transcript_search.ensure_search_index())
+
+        create_transcript("vid00000091", _transcript_data([{'text': "mitochondria", 'start': 1.0, 'duration': 1.0}]))
+        VideoModel.objects.create(
+            user=self.viewer, youtube_video_id="vid00000091", video_title="Cells", video_url=VIDEO_URL
+        )
+        self.assertEqual([r["video_id"] for r in self.search(self.viewer, "mitochondria")["results"]], ["vid00000091"])
+
+
+def _videos_list_service(returned_ids):
+    """A stub videos() resource answering with items for the requested ids that are in ``returned_ids``."""
+    def list_(part, id, fields, maxResults):
+        items = [
+            {'id': video_id, 'snippet': {'title': f"Title {video_id}"}, 'contentDetails': {'duration': "PT1M5S"}}
+            for video_id in id.split(",") if video_id in returned_ids
+        ]
+        return mock.Mock(execute=mock.Mock(return_value={'items': items}))
+
+    service = mock.Mock()
+    service.videos.return_value.list.side_effect = list_
+    return service
+
+
+class YouTubeMetadataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_duration(self):
+        self.assertEqual(youtube_metadata.parse_duration("PT1H2M3S"), 3723)
+        self.assertEqual(youtube_metadata.parse_duration("P1DT1S"), 86401)
+        for value in ("P0D", "", None, "1:02"):
+            self.assertIsNone(youtube_metadata.parse_duration(value))
+
+    def test_ids_are_fetched_fifty_per_call(self):
+        ids = [f"vid{i:08d}" for i in range(1000, 1120)]
+        client = youtube_metadata.YouTubeMetadataClient("key")
+        service = _videos_list_service(set(ids))
+        with mock.patch.object(client, "_service", return_value=service):
+            found = client.fetch(ids)
+        self.assertEqual(service.videos.return_value.list.call_count, 3)
+        self.assertEqual(found[ids[-1]], {"title": f"Title {ids[-1]}", "duration_seconds": 65})
+
+    def test_lookups_are_cached_and_missing_ids_negative_cached(self):
+        service = _videos_list_service({"vid00001200"})
+        with mock.patch.object(youtube_metadata.youtube_metadata_client, "_service", return_value=service):
+            first = youtube_metadata.get_video_metadata(["vid00001200", "vid00001201", "vid00001200"], "key")
+            second = youtube_metadata.get_video_metadata(["vid00001200", "vid00001201"], "key")
+
+        self.assertEqual(first, second)
+        self.assertEqual(list(first), ["vid00001200"])
+        self.assertEqual(service.videos.return_value.list.call_count, 1)
+        self.assertEqual(service.videos.return_value.list.call_args.kwargs["id"], "vid00001200,vid00001201")
+        self.assertEqual(youtube_metadata.video_title_cache.get("vid00001200"), "Title vid00001200")
+        self.assertEqual(youtube_metadata.negative_cache.get("vid00001201", "video"), "video_unavailable")
+
+    def test_apply_fills_blank_fields_only(self):
+        user = _user()
+        blank = VideoModel.objects.create(
+            user=user, youtube_video_id="vid00001210", video_title="", video_url=VIDEO_URL
+        )
+        named = VideoModel.objects.create(
+            user=user, youtube_video_id="vid00001211", video_title="Mine", video_url=VIDEO_URL
+        )
+        metadata = {
+            "vid00001210": {"title": "Fetched", "duration_seconds": 90},
+            "vid00001211": {"title": "Fetched too", "duration_seconds": 30},
+        }
+        self.assertEqual(youtube_metadata.apply_video_metadata(metadata), 2)
+        blank.refresh_from_db()
+        named.refresh_from_db()
+        self.assertEqual((blank.video_title, blank.duration_seconds), ("Fetched", 90))
+        self.assertEqual((named.video_title, named.duration_seconds), ("Mine", 30))
+        self.assertEqual(youtube_metadata.apply_video_metadata(metadata), 0)
+
+
+class FakeDownloadError(Exception):
+    def __init__(self, msg, exc_info=None):
+        super().__init__(msg)
+        self.exc_info = exc_info
+
+
+def _fake_yt_dlp(extract):
+    """A stand-in yt_dlp module whose YoutubeDL wraps ``Exception``s the way yt-dlp does."""
+    class YoutubeDL:
+        def __init__(self, opts):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def extract_info(self, url, download):
+            try:
+                return extract(url)
+            except Exception as e:
+                raise FakeDownloadError(f"ERROR: {e}", sys.exc_info()) from None
+
+    return mock.Mock(YoutubeDL=YoutubeDL)
+
+
+class YtDlpWorkerTests(SimpleTestCase):
+    def run_worker(self, extract):
+        with mock.patch.dict(sys.modules, {"yt_dlp": _fake_yt_dlp(extract)}):
+            return ytdlp_worker.extract_info("vid00001300", 0, 1)
+
+    def test_alarm_is_not_swallowed_by_yt_dlp(self):
+        def extract(url):
+            ytdlp_worker._on_alarm(None, None)
+
+        self.assertTrue(issubclass(ytdlp_worker.ExtractionTimeout, BaseException))
+        self.assertFalse(issubclass(ytdlp_worker.ExtractionTimeout, Exception))
+        self.assertTrue(self.run_worker(extract)["timeout"])
+
+    def test_wrapped_timeout_is_still_a_timeout(self):
+        timeout = ytdlp_worker.ExtractionTimeout()
+        wrapped = FakeDownloadError("ERROR: timed out", (type(timeout), timeout, None))
+
+        def extract(url):
+            raise wrapped
+
+        result = self.run_worker(extract)
+        self.assertEqual((result["timeout"], result["unavailable"]), (True, False))
+
+    def test_errors_are_classified(self):
+        def extract(url):
+            raise ValueError("Private video")
+
+        result = self.run_worker(extract)
+        self.assertEqual((result["unavailable"], result.get("timeout")), (True, None))
+
+    def test_info_is_trimmed(self):
+        info = {
+            'id': "vid00001300", 'title': "T", 'duration': 61, 'formats': ["big"],
+            'subtitles': {'en': [{'ext': 'vtt', 'url': "u"}, {'ext': 'srv3', 'url': "x"}]},
+        }
+        self.assertEqual(self.run_worker(lambda url: info), {
+            'id': "vid00001300", 'title': "T", 'duration': 61,
+            'subtitles': {'en': [{'ext': 'vtt', 'url': "u"}]}, 'automatic_captions': {},
+        })
+
+
+class YtDlpPoolTests(SimpleTestCase):
+    def test_async_cache_read_stays_off_the_event_loop(self):
+        info = {'id': "vid00001300"}
+        reads = []
+
+        def get(video_id):
+            reads.append(threading.get_ident())
+            return info
+
+        async def extract():
+            return threading.get_ident(), await ytdlp_pool.YtDlpPool().aextract_or_reason("vid00001300")
+
+        with mock.patch.object(ytdlp_pool.ytdlp_info_cache, "get", side_effect=get):
+            loop_thread, result = asyncio.run(extract())
+        self.assertEqual(result, (info, None))
+        self.assertNotEqual(reads, [loop_thread])
+        self.assertEqual(len(reads), 1)
+
+
+class AnswerCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.answers = AnswerCache("test-answer-cache", bucket_seconds=30)
+
+    def test_key_ignores_case_spacing_and_punctuation(self):
+        self.assertEqual(
+            self.answers.key("vid00001400", "en", 10, "What is a cell?"),
+            self.answers.key("vid00001400", "en", 10, "  what IS a  cell "),
+        )
+
+    def test_key_separates_videos_languages_and_buckets(self):
+        key = self.answers.key("vid00001400", "en", 10, "q")
+        self.assertEqual(key, self.answers.key("vid00001400", "en", 29, "q"))
+        for other in (
+            self.answers.key("vid00001401", "en", 10, "q"),
+            self.answers.key("vid00001400", "es", 10, "q"),
+            self.answers.key("vid00001400", None, 10, "q"),
+            self.answers.key("vid00001400", "en", 30, "q"),
+        ):
+            self.assertNotEqual(key, other)
+
+    def test_hits_report_saved_latency(self):
+        key = self.answers.key("vid00001400", "en", 10, "q")
+        self.assertIsNone(self.answers.get(key))
+        self.answers.set(key, "a", 2.5)
+        self.assertEqual(self.answers.get(key), "a")
+        self.assertEqual(self.answers.stats(), {"hits": 1, "misses": 1, "saved_seconds": 2.5, "hit_ratio": 0.5})
+
+    def test_disabled_cache_stores_nothing(self):
+        answers = AnswerCache("test-answer-cache-off", enabled=False)
+        key = answers.key("vid00001400", "en", 10, "q")
+        answers.set(key, "a", 1.0)
+        self.assertIsNone(answers.get(key))
+
+
+def _reference_bm25(texts, query, k1=1.5, b=0.75):
+    """Textbook BM25, one document at a time."""
+    docs = [retrieval.tokenize(text) for text in texts]
+    avg_length = sum(map(len, docs)) / len(docs) or 1.0
+    scores = []
+    for doc in docs:
+        score = 0.0
+        for term in set(retrieval.tokenize(query)):
+            df = sum(term in other for other in docs)
+            tf = doc.count(term)
+            if not tf:
+                continue
+            idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avg_length))
+        scores.append(score)
+    return scores
+
+
+class RetrievalTests(TestCase):
+    TEXTS = [
+        "the mitochondria is the powerhouse of the cell",
+        "photosynthesis happens in the chloroplast of plant cells",
+        "cell division cell cycle mitosis",
+        "um yeah okay so",
+        "",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_scores_match_a_reference_implementation(self):
+        index = retrieval.BM25Index(self.TEXTS)
+        for query in ("cell", "mitochondria powerhouse", "plant cell cycle", "nothing matches", "the"):
+            for got, expected in zip(index.scores(query), _reference_bm25(self.TEXTS, query)):
+                self.assertAlmostEqual(float(got), expected, places=4)
+
+    def test_top_returns_best_positive_matches_first(self):
+        index = retrieval.BM25Index(self.TEXTS)
+        # No stemming: "cells" in the chloroplast chunk does not match "cell"
+        self.assertEqual([doc for doc, _ in index.top("cell mitosis", 10)], [2, 0])
+        self.assertEqual(index.top("zebra", 3), [])
+        self.assertEqual(retrieval.BM25Index([]).top("cell", 3), [])
+
+    def test_related_chunks_skip_the_window_and_respect_the_budget(self):
+        segments = [
+            {'text': f"chunk {i} " + ("enzyme catalysis" if i in (1, 5, 9) else "filler words"),
+             'start': i * 30.0, 'duration': 30.0}
+            for i in range(12)
+        ]
+        transcript_obj = create_transcript("vid00001500", _transcript_data(segments), "en")
+
+        chunks = retrieval.related_chunks(transcript_obj, "what is enzyme catalysis?", (120, 180))
+        self.assertEqual(sorted(start for start, _ in chunks), [30.0, 270.0])
+
+        cost = retrieval.estimate_tokens(chunks[0][1])
+        self.assertEqual(len(retrieval.related_chunks(transcript_obj, "enzyme", (120, 180), budget=cost)), 1)
+        self.assertEqual(retrieval.related_chunks(transcript_obj, "enzyme", (120, 180), used_tokens=10 ** 6), [])
+
+    def test_format_lists_chunks_in_video_order(self):
+        self.assertEqual(retrieval.format_related_chunks([]), "")
+        self.assertEqual(
+            retrieval.format_related_chunks([(125.0, "later"), (5.0, "early")]),
+            "Other relevant parts of the transcript:\n[00:05] early\n[02:05] later\n\n",
+        )
+
+
+def _sse_frames(chunks):
+    """``[(event, data)]`` from encoded SSE frames."""
+    frames = []
+    for chunk in chunks:
+        event, data = chunk.decode().strip().split("\n")
+        frames.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return frames
+
+
+def _failing_tokens(error):
+    yield "partial"
+    raise error
+
+
+class StreamingTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_completion_frames(self):
+        saved = []
+        frames = _sse_frames(sse_completion(
+            ["Hel", "lo "], time.monotonic(), "test.stream",
+            lambda answer: saved.append(answer) or {"answer": answer}, meta={"cached": False},
+        ))
+        self.assertEqual(frames, [
+            ("meta", {"cached": False}),
+            ("token", {"text": "Hel"}),
+            ("token", {"text": "lo "}),
+            ("done", {"answer": "Hello"}),
+        ])
+        self.assertEqual(saved, ["Hello"])
+        timings = metrics.snapshot()["timings"]
+        self.assertEqual((timings["test.stream.first_token"]["count"], timings["test.stream.total"]["count"]), (1, 1))
+
+    def test_failure_mid_stream_ends_with_error_and_saves_nothing(self):
+        on_complete = mock.Mock()
+        frames = _sse_frames(sse_completion(_failing_tokens(RuntimeError("boom")), 0, "test.stream", on_complete))
+        self.assertEqual(frames[-1], ("error", {"message": "Gemini API failed: boom"}))
+        on_complete.assert_not_called()
+        self.assertEqual(metrics.snapshot()["counters"]["test.stream.errors"], 1)
+
+    def test_busy_limiter_error_says_when_to_retry(self):
+        frames = _sse_frames(sse_completion(_failing_tokens(LLMOverloaded(2.2)), 0, "test.stream", mock.Mock()))
+        self.assertEqual(frames[-1][1]["retry_after"], 3)
+
+    def test_empty_answer_is_an_error(self):
+        on_complete = mock.Mock()
+        frames = _sse_frames(sse_completion([" ", ""], 0, "test.stream", on_complete))
+        self.assertEqual(frames[-1][0], "error")
+        on_complete.assert_not_called()
+
+    def test_async_completion_matches(self):
+        async def tokens():
+            for text in ("Hel", "lo"):
+                yield text
+
+        async def on_complete(answer):
+            return {"answer": answer}
+
+        async def collect():
+            return [frame async for frame in asse_completion(tokens(), time.monotonic(), "test.astream", on_complete)]
+
+        self.assertEqual(_sse_frames(asyncio.run(collect()))[-1], ("done", {"answer": "Hello"}))
+
+    def test_gzip_chunks_decode_as_they_arrive(self):
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        received = [decompressor.decompress(chunk) for chunk in gzip_chunks([b"first\n", b"second\n"])]
+        self.assertEqual(received[:2], [b"first\n", b"second\n"])
+        self.assertEqual(gzip.decompress(b"".join(gzip_chunks([b"a", b"b"]))), b"ab")
+
+    def test_ndjson_batches(self):
+        chunks = list(ndjson_chunks([{"i": i} for i in range(5)], batch_size=2))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b"".join(chunks).decode().splitlines()[-1], '{"i":4}')
+
+
+class _NoLimiter:
+    def slot(self, model):
+        return nullcontext()
+
+    def aslot(self, model):
+        return nullcontext()
+
+
+def _llm_response(text, usage=None):
+    return mock.Mock(text=text, usage_metadata=usage)
+
+
+class LLMRegistryTests(SimpleTestCase):
+    def setUp(self):
+        patches = [mock.patch("app.llm.genai.configure"), mock.patch("app.llm.genai.GenerativeModel")]
+        self.configure, self.model_class = [patch.start() for patch in patches]
+        for patch in patches:
+            self.addCleanup(patch.stop)
+        self.registry = LLMRegistry(default_model="test-model", api_key="key", limiter=_NoLimiter())
+
+    def test_configures_once_and_reuses_model_handles(self):
+        first = self.registry.model(generation_config={"temperature": 0})
+        self.assertIs(self.registry.model(generation_config={"temperature": 0}), first)
+        self.registry.model("other-model")
+        self.configure.assert_called_once_with(api_key="key")
+        self.assertEqual(self.model_class.call_count, 2)
+
+    def test_generate_records_usage_and_calls_hooks(self):
+        usage = mock.Mock(prompt_token_count=10, candidates_token_count=3)
+        self.model_class.return_value.generate_content.return_value = _llm_response(" answer ", usage)
+        records = []
+        self.registry.add_hook(records.append)
+
+        self.assertEqual(self.registry.generate("prompt"), "answer")
+        self.assertEqual(
+            (records[0]["model"], records[0]["prompt_tokens"], records[0]["output_tokens"], records[0]["error"]),
+            ("test-model", 10, 3, None),
+        )
+        self.assertEqual(self.registry.stats()["models"]["test-model"]["calls"], 1)
+
+    def test_errors_are_counted_and_raised(self):
+        self.model_class.return_value.generate_content.side_effect = RuntimeError("quota")
+        with self.assertRaises(RuntimeError):
+            self.registry.generate("prompt")
+        self.assertEqual(self.registry.stats()["models"]["test-model"]["errors"], 1)
+
+    def test_stream_yields_text_pieces(self):
+        self.model_class.return_value.generate_content.return_value = [
+            _llm_response("Hel"), _llm_response(""), _llm_response("lo"),
+        ]
+        self.assertEqual(list(self.registry.stream("prompt")), ["Hel", "lo"])
+
+    def test_async_handles_are_per_event_loop(self):
+        self.model_class.side_effect = lambda *args, **kwargs: mock.Mock()
+
+        async def handles():
+            return self.registry.amodel(), self.registry.amodel()
+
+        first, again = asyncio.run(handles())
+        self.assertIs(first, again)
+        self.assertIsNot(asyncio.run(handles())[0], first)
+
+
+MCQ_OUTPUT = """
+Question 1: What does a cell need?
+A) Water
+B) Energy
+C) Light
+D) Nothing
+Correct Answer: B
+Explanation: Cells run on energy.
+Difficulty: Advanced
+
+Question 2: Broken question without options
+"""
+
+
+class MCQGenerationTests(SimpleTestCase):
+    def test_parse_mcq_output(self):
+        first = parse_mcq_output(MCQ_OUTPUT)[0]
+        self.assertEqual(first["question"], "What does a cell need?")
+        self.assertEqual(first["options"]["B"], "Energy")
+        self.assertEqual((first["correct_answer"], first["difficulty"]), ("B", "Advanced"))
+
+    def test_generation_errors_are_logged_not_printed(self):
+        with mock.patch("app.utils.llm_registry.generate", side_effect=RuntimeError("quota")), \
+                self.assertLogs("app.utils", level="ERROR") as logs:
+            self.assertEqual(generate_mcqs_from_transcript("text"), [])
+        self.assertIn("Failed to generate MCQs", logs.output[0])
+
+    def test_chunk_failures_are_logged_alike(self):
+        chunks = [(0, 600, "first"), (600, 1200, "second")]
+        with self.assertLogs("app.mcq_generation", level="WARNING") as logs:
+            mcqs = mcq_generation._reduce(chunks, [RuntimeError("quota"), MCQ_OUTPUT])
+        self.assertTrue(mcqs)
+        self.assertIn("Failed to generate MCQs for the chunk at 0s", logs.output[0])
+        self.assertIn("RuntimeError: quota", logs.output[0])
+
+    def test_busy_limiter_is_not_swallowed(self):
+        with mock.patch("app.utils.llm_registry.generate", side_effect=LLMOverloaded(5)):
+            with self.assertRaises(LLMOverloaded):
+                generate_mcqs_from_transcript("text")
+
+
+class LLMLimiterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.limiter = LLMLimiter(rpm=600, burst=10, concurrency=2, max_queue=4, max_wait=1, poll_interval=0.01)
+
+    def test_acquire_times_out_with_retry_after(self):
+        leases = [self.limiter.acquire("m") for _ in range(2)]
+        with self.assertRaises(LLMOverloaded) as overloaded:
+            self.limiter.acquire("m", timeout=0.05)
+        self.assertEqual(overloaded.exception.status_code, 503)
+        self.assertEqual(overloaded.exception.wait, 1)
+        self.assertEqual(self.limiter.stats()["m"]["timeouts"], 1)
+
+        self.limiter.release(leases[0])
+        self.limiter.release(self.limiter.acquire("m", timeout=0.05))
+
+    def test_view_answers_503_with_retry_after(self):
+        user = _user()
+        api = APIClient()
+        api.force_authenticate(user)
+        with mock.patch("app.views.get_video_title_with_cache", side_effect=LLMOverloaded(4.2)):
+            response = api.post("/app/ask-question/", {
+                "youtube_video_url": VIDEO_URL, "question": "Why?", "time_stamp": 1,
+            }, format="json")
+        self.assertEqual((response.status_code, response["Retry-After"]), (503, "5"))
+
+    def test_rate_window_limits_bursts(self):
+        limiter = LLMLimiter(rpm=60, burst=2, concurrency=8, max_wait=0)
+        for _ in range(2):
+            limiter.release(limiter.acquire("rate-model"))
+        lease, wait = limiter._try("rate-model")
+        self.assertIsNone(lease)
+        self.assertGreater(wait, 0)
+
+    def test_full_queue_is_rejected_at_once(self):
+        self.limiter._waiting["m"] = self.limiter.max_queue
+        started = time.monotonic()
+        with self.assertRaises(LLMOverloaded):
+            self.limiter.acquire("m")
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(self.limiter.stats()["m"]["rejected"], 1)
+
+    def test_full_model_costs_one_read_per_poll(self):
+        leases = [self.limiter.acquire("m") for _ in range(2)]
+        with mock.patch.object(cache, "add", wraps=cache.add) as add:
+            self.assertIsNone(self.limiter._try("m")[0])
+        add.assert_not_called()
+        for lease in leases:
+            self.limiter.release(lease)
+
+    def test_release_never_frees_another_holders_slot(self):
+        lease = self.limiter.acquire("m")
+        cache.set(lease.key, 12345)  # our lease expired and someone else took the slot
+        self.limiter.release(lease)
+        self.assertEqual(cache.get(lease.key), 12345)
+
+    def test_redis_release_is_compare_and_delete(self):
+        backend = mock.Mock()
+        backend.client.make_key.side_effect = lambda key: f":1:{key}"
+        self.limiter._release_shared(backend, "slot-key", 42)
+        script, numkeys, key, token = backend.client.get_client.return_value.eval.call_args.args
+        self.assertIn("del", script)
+        self.assertEqual((numkeys, key, token), (1, ":1:slot-key", 42))
+        backend.delete.assert_not_called()
+
+    def test_held_slots_are_renewed_and_lost_ones_dropped(self):
+        kept, lost = self.limiter.acquire("m"), self.limiter.acquire("m")
+        cache.delete(lost.key)
+        with mock.patch.object(cache, "touch", wraps=cache.touch) as touch:
+            self.limiter.renew_held()
+        touch.assert_called_once_with(kept.key, self.limiter.slot_lease)
+        self.assertEqual(self.limiter._held, {kept})
+        self.assertEqual(self.limiter.stats()["m"]["lost_leases"], 1)
+
+        self.limiter.release(kept)
+        self.assertEqual(self.limiter._held, set())
+
+    def test_async_acquire_keeps_cache_calls_off_the_event_loop(self):
+        threads = []
+        original = self.limiter._try
+
+        def tracking_try(model):
+            threads.append(threading.current_thread())
+            return original(model)
+
+        async def acquire_and_release():
+            async with self.limiter.aslot("m"):
+                return threading.current_thread()
+
+        with mock.patch.object(self.limiter, "_try", side_effect=tracking_try):
+            loop_thread = asyncio.run(acquire_and_release())
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+
+
+def _mcq_block(number, question, difficulty):
+    return (
+        f"Question {number}: {question}\nA) one\nB) two\nC) three\nD) four\n"
+        f"Correct Answer: A\nExplanation: because\nDifficulty: {difficulty}\n"
+    )
+
+
+class _ConcurrencyProbe:
+    """Fake LLM call that records how many calls overlap."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = self.peak = self.calls = 0
+
+    def __call__(self, prompt, model=None):
+        with self.lock:
+            self.calls += 1
+            number = self.calls
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+        return "".join(
+            _mcq_block(i, f"How does topic{number}n{i} shape idea{number}n{i}?", difficulty)
+            for i, difficulty in enumerate(("Expert", "Advanced", "Intermediate"), 1)
+        )
+
+    async def agenerate(self, prompt, model=None):
+        with self.lock:
+            self.calls += 1
+            number = self.calls
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+        return _mcq_block(1, f"Async topic {number}", "Advanced")
+
+
+class MCQChunkingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        segments = [{'text': f"lecture minute {i}", 'start': i * 60.0, 'duration': 60.0} for i in range(120)]
+        self.transcript_obj = create_transcript("vid00001600", _transcript_data(segments), "en")
+
+    def test_long_transcripts_get_bounded_chunks(self):
+        chunks = mcq_generation.plan_chunks(self.transcript_obj)
+        self.assertEqual(len(chunks), mcq_generation.MAX_CHUNKS)
+        # Twelve 10-minute buckets merged into eight chunks, with nothing left out
+        self.assertEqual((chunks[0][0], chunks[-1][1]), (0, 7200))
+        self.assertEqual([end for _, end, _ in chunks[:-1]], [start for start, _, _ in chunks[1:]])
+        words = " ".join(text for _, _, text in chunks).split()
+        self.assertEqual(sorted(int(word) for word in words if word.isdigit()), list(range(120)))
+        short_segments = [{'text': "x", 'start': 0.0, 'duration': 1.0}, {'text': "y", 'start': 300.0, 'duration': 1.0}]
+        short = create_transcript("vid00001602", _transcript_data(short_segments), "en")
+        self.assertEqual(mcq_generation.plan_chunks(short), [])
+
+    def test_fan_out_is_capped_by_the_concurrency_budget(self):
+        probe = _ConcurrencyProbe()
+        with mock.patch.object(mcq_generation.llm_registry, "generate", side_effect=probe), \
+                mock.patch.object(mcq_generation, "PARALLEL_CHUNKS", 8), \
+                mock.patch.object(mcq_generation.llm_limiter, "concurrency_limits", {mcq_generation.MCQ_MODEL: 3}):
+            mcqs = mcq_generation.generate_mcqs(self.transcript_obj)
+        self.assertEqual(probe.calls, mcq_generation.MAX_CHUNKS)
+        self.assertLessEqual(probe.peak, 3)
+        self.assertEqual(len(mcqs), mcq_generation.QUESTION_COUNT)
+
+    def test_async_fan_out_is_capped(self):
+        probe = _ConcurrencyProbe()
+        with mock.patch.object(mcq_generation.llm_registry, "agenerate", side_effect=probe.agenerate), \
+                mock.patch.object(mcq_generation, "PARALLEL_CHUNKS", 2):
+            asyncio.run(mcq_generation.agenerate_mcqs(self.transcript_obj))
+        self.assertEqual((probe.calls, probe.peak), (mcq_generation.MAX_CHUNKS, 2))
+
+    def test_overloaded_is_raised_when_every_chunk_fails(self):
+        with mock.patch.object(mcq_generation.llm_registry, "generate", side_effect=LLMOverloaded(3)):
+            with self.assertRaises(LLMOverloaded):
+                mcq_generation.generate_mcqs(self.transcript_obj)
+
+    def test_near_duplicates_are_dropped(self):
+        def mcq(question):
+            return {"question": question, "difficulty": "Advanced"}
+
+        kept = mcq_generation.dedupe_mcqs([
+            (0, mcq("What does the mitochondria produce in the cell?")),
+            (1, mcq("what does the Mitochondria produce in the cell")),
+            (1, mcq("What does the mitochondria produce in the cell today?")),
+            (2, mcq("Why do plants need sunlight?")),
+        ])
+        self.assertEqual([chunk for chunk, _ in kept], [0, 2])
+
+    def test_selection_follows_the_difficulty_mix(self):
+        candidates = [
+            (chunk, {"question": f"q{chunk}{difficulty}{i}", "difficulty": difficulty})
+            for chunk in range(4) for difficulty in ("Expert", "Advanced", "Intermediate") for i in range(2)
+        ]
+        selected = mcq_generation.select_balanced(candidates)
+        counts = {d: sum(m["difficulty"] == d for m in selected) for d in ("Expert", "Advanced", "Intermediate")}
+        self.assertEqual(counts, {"Expert": 3, "Advanced": 4, "Intermediate": 3})
+        self.assertEqual(len({m["question"][1] for m in selected}), 4)
+
+
+def _generated_mcqs(count=10, prefix="Concept"):
+    difficulties = ("Expert", "Advanced", "Intermediate")
+    return [
+        {
+            "question": f"How does {prefix.lower()}{i}x relate to outcome{i}y?",
+            "options": {"A": "one", "B": "two", "C": "three", "D": "four"},
+            "correct_answer": "A",
+            "explanation": "because",
+            "difficulty": difficulties[i % 3],
+        }
+        for i in range(count)
+    ]
+
+
+class GenerateMCQsViewTests(TestCase):
+    """Sync 201 by default, a polled job with async=true, one response shape either way."""
+
+    SHAPE = {"video_id", "success", "message", "mcqs", "job"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = _user()
+        self.client_sync = APIClient()
+        self.client_sync.force_authenticate(self.user)
+        self.bearer = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        create_transcript("vid00000030", _transcript_data(_sample_segments(20)), "en")
+        patches = [
+            mock.patch("app.views.get_video_title_with_cache", return_value="A video"),
+            mock.patch("app.async_views.aget_video_title_with_cache", mock.AsyncMock(return_value="A video")),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def generate(self, asynchronous=False, **data):
+        body = {"youtube_url": VIDEO_URL, **data}
+        if asynchronous:
+            response = self.client.post(
+                "/app/async/generate-mcqs/", body, content_type="application/json", HTTP_AUTHORIZATION=self.bearer
+            )
+        else:
+            response = self.client_sync.post("/app/generate-mcqs/", body, format="json")
+        return response.status_code, response.json()
+
+    def test_generates_synchronously_by_default(self):
+        with mock.patch("app.views.generate_mcqs", return_value=_generated_mcqs()) as generate:
+            status_code, body = self.generate()
+
+        self.assertEqual(status_code, 201)
+        self.assertEqual(set(body), self.SHAPE)
+        self.assertIsNone(body["job"])
+        self.assertEqual(len(body["mcqs"]), 10)
+        generate.assert_called_once()
+        self.assertFalse(MCQGenerationJob.objects.exists())
+
+    def test_async_view_returns_the_same_shape(self):
+        with mock.patch("app.async_views.agenerate_mcqs", mock.AsyncMock(return_value=_generated_mcqs())):
+            status_code, body = self.generate(asynchronous=True)
+        self.assertEqual(status_code, 201)
+        self.assertEqual(set(body), self.SHAPE)
+        self.assertEqual((body["job"], len(body["mcqs"])), (None, 10))
+
+        status_code, body = self.generate(asynchronous=True, **{"async": True})
+        self.assertEqual(status_code, 202)
+        self.assertEqual(set(body), self.SHAPE)
+        self.assertEqual(body["job"]["status"], MCQGenerationJob.STATUS_PENDING)
+
+    def test_async_opt_in_queues_one_job_per_session(self):
+        status_code, body = self.generate(**{"async": "true"})
+        self.assertEqual(status_code, 202)
+        self.assertEqual(set(body), self.SHAPE)
+        self.assertEqual(body["mcqs"], [])
+        job = body["job"]
+        self.assertEqual(job["status"], MCQGenerationJob.STATUS_PENDING)
+        self.assertTrue(job["status_url"].endswith(f"/app/mcq-jobs/{job['id']}/"))
+
+        _, again = self.generate(**{"async": "true"})
+        self.assertEqual(again["job"]["id"], job["id"])
+        self.assertEqual(again["message"], "MCQ generation already in progress.")
+
+        pending = self.client_sync.get(job["status_url"]).json()["data"]
+        self.assertEqual((pending["status"], pending["mcqs"]), (MCQGenerationJob.STATUS_PENDING, []))
+
+        with mock.patch("app.mcq_jobs.generate_mcqs", return_value=_generated_mcqs()):
+            self.assertEqual(mcq_jobs.process_pending_mcq_jobs(), 1)
+
+        done = self.client_sync.get(job["status_url"]).json()["data"]
+        self.assertEqual((done["status"], done["progress"]), (MCQGenerationJob.STATUS_DONE, 100))
+        self.assertEqual(len(done["mcqs"]), 10)
+
+    def test_job_status_is_private_to_its_owner(self):
+        _, body = self.generate(**{"async": "true"})
+        other = APIClient()
+        other.force_authenticate(_user("other@example.com"))
+        self.assertEqual(other.get(body["job"]["status_url"]).status_code, 404)
+
+    def test_errors_share_the_failure_shape(self):
+        with mock.patch("app.views.generate_mcqs", side_effect=RuntimeError("boom")):
+            status_code, body = self.generate()
+        self.assertEqual((status_code, body), (500, {"success": False, "message": "Failed to generate MCQs."}))
+
+
+class MCQBankTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = _user()
+        video = VideoModel.objects.create(user=self.user, youtube_video_id="vid00000030", video_title="A video")
+        self.session = SessionModel.objects.create(user=self.user, video=video)
+        flight = SingleFlight("mcq_bank_test", poll_interval=0.01, wait_timeout=2)
+        patch = mock.patch.object(mcq_bank, "bank_flight", flight)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_draws_balanced_unseen_questions(self):
+        self.assertEqual(mcq_bank.add_to_bank("vid00000030", "en", _generated_mcqs(12)), 12)
+        first = mcq_bank.draw_mcqs(self.session, "en")
+        counts = {d: sum(m.difficulty == d for m in first) for d in ("Expert", "Advanced", "Intermediate")}
+        self.assertEqual(counts, {"Expert": 3, "Advanced": 4, "Intermediate": 3})
+
+        # Only two unseen questions are left: not a full set, but enough for minimum=1
+        self.assertEqual(mcq_bank.draw_mcqs(self.session, "en"), [])
+        rest = mcq_bank.draw_mcqs(self.session, "en", minimum=1)
+        self.assertEqual(len(rest), 2)
+        self.assertFalse({m.bank_question_id for m in first} & {m.bank_question_id for m in rest})
+        self.assertEqual(mcq_bank.draw_mcqs(self.session, "de", minimum=1), [])
+
+    def test_bank_skips_questions_it_already_has(self):
+        mcq_bank.add_to_bank("vid00000030", "en", _generated_mcqs(5))
+        self.assertEqual(mcq_bank.add_to_bank("vid00000030", "en", _generated_mcqs(8)), 3)
+
+    def test_waiters_get_a_result_when_the_leader_added_nothing(self):
+        key = mcq_bank.bank_flight._lock_key("vid00000030:en")
+        cache.add(key, "other-worker", timeout=60)
+        # The other worker's generation only produced duplicates
+        finish = threading.Timer(0.05, lambda: cache.set(
+            mcq_bank._top_up_done_key("vid00000030", "en"), {"id": "other-run", "added": 0}
+        ))
+        finish.start()
+        self.addCleanup(finish.cancel)
+
+        generate = mock.Mock(return_value=_generated_mcqs())
+        self.assertEqual(mcq_bank.top_up_bank("vid00000030", "en", generate), 0)
+        generate.assert_not_called()
+
+    def test_an_earlier_top_up_does_not_satisfy_a_new_one(self):
+        done_key = mcq_bank._top_up_done_key("vid00000030", "en")
+        cache.set(done_key, {"id": "earlier-run", "added": 0})
+        self.assertEqual(mcq_bank.top_up_bank("vid00000030", "en", lambda: _generated_mcqs()), 10)
+        self.assertEqual(cache.get(done_key)["added"], 10)
+        self.assertNotEqual(cache.get(done_key)["id"], "earlier-run")
+
+    def test_bank_is_keyed_by_the_transcript_language(self):
+        # The video only has a German transcript, so "en" requests fall back to it
+        create_transcript("vid00000030", _transcript_data(_sample_segments(20)), "de")
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch("app.views.get_video_title_with_cache", return_value="A video"), \
+                mock.patch("app.utils.available_transcript_language_codes", return_value=["de"]), \
+                mock.patch("app.views.generate_mcqs", return_value=_generated_mcqs(20)) as generate:
+            first = client.post("/app/generate-mcqs/", {"youtube_url": VIDEO_URL, "language": "en"}, format="json")
+            second = client.post("/app/generate-mcqs/", {"youtube_url": VIDEO_URL}, format="json")
+
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        generate.assert_called_once()
+        self.assertEqual(set(MCQBankQuestion.objects.values_list("language", flat=True)), {"de"})
+        self.assertEqual(second.json()["message"], "10 MCQs drawn from the question bank.")
+
+    def test_async_view_shares_the_bank_top_up(self):
+        create_transcript("vid00000030", _transcript_data(_sample_segments(20)), "en")
+        mcq_bank.add_to_bank("vid00000030", "en", _generated_mcqs(3))
+        # Another worker is already generating for this video and finishes while the view waits
+        cache.add(mcq_bank.bank_flight._lock_key("vid00000030:en"), "other-worker", timeout=60)
+        finish = threading.Timer(0.05, lambda: cache.set(
+            mcq_bank._top_up_done_key("vid00000030", "en"), {"id": "other-run", "added": 0}
+        ))
+        finish.start()
+        self.addCleanup(finish.cancel)
+
+        bearer = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        with mock.patch("app.async_views.aget_video_title_with_cache", mock.AsyncMock(return_value="A video")), \
+                mock.patch("app.async_views.agenerate_mcqs", mock.AsyncMock(return_value=_generated_mcqs())) as generate:
+            response = self.client.post(
+                "/app/async/generate-mcqs/", {"youtube_url": VIDEO_URL},
+                content_type="application/json", HTTP_AUTHORIZATION=bearer,
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["mcqs"]), 3)
+        generate.assert_not_awaited()
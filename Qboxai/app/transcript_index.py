@@ -0,0 +1,191 @@
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+
+from .cache import TwoTierCache
+from .compact_transcript import CompactTranscript
+from .models import TranscriptSegment
+
+
+class TranscriptIndex:
+    """
+    Sorted start offsets over a transcript's segments for bisect-based window reads.
+
+    Built once per transcript and kept in ``transcript_index_cache`` so the ask
+    and segmenting paths do not rescan (or re-decode) the whole segment list.
+    Segments are held in a CompactTranscript rather than a list of dicts.
+    """
+
+    __slots__ = ('transcript',)
+
+    def __init__(self, segments):
+        if isinstance(segments, CompactTranscript):
+            transcript = segments
+            if not transcript.is_sorted():
+                transcript = CompactTranscript.from_segments(
+                    sorted(transcript.to_segments(), key=lambda seg: seg['start'])
+                )
+        else:
+            transcript = CompactTranscript.from_segments(
+                sorted(segments or [], key=lambda seg: seg['start'])
+            )
+        self.transcript = transcript
+
+    @property
+    def starts(self):
+        return self.transcript.starts
+
+    def __len__(self):
+        return len(self.transcript)
+
+    def _bounds(self, start, end):
+        return bisect_left(self.starts, start), bisect_right(self.starts, end)
+
+    def window(self, start, end):
+        """Segments whose start offset lies in ``[start, end]``."""
+        return self.transcript.segments(*self._bounds(start, end))
+
+    def around(self, t, radius):
+        return self.window(max(0, t - radius), t + radius)
+
+    def text(self, start, end):
+        return " ".join(self.transcript.texts(*self._bounds(start, end)))
+
+    def buckets(self, size):
+        """Yield ``(bucket_start, text)`` for each non-empty ``size``-second bucket, in order."""
+        starts = self.starts
+        if not starts:
+            return
+
+        bucket_start = int(starts[0] // size) * size
+        lo = 0
+        total = len(starts)
+        while lo < total:
+            hi = bisect_left(starts, bucket_start + size, lo)
+            if hi > lo:
+                yield bucket_start, " ".join(self.transcript.texts(lo, hi))
+                lo = hi
+            if lo < total:
+                bucket_start = int(starts[lo] // size) * size
+
+
+# Local-only: indexes are derived data and cheap to rebuild from the transcript row.
+transcript_index_cache = TwoTierCache(
+    "transcript_index",
+    max_entries=getattr(settings, 'TRANSCRIPT_INDEX_CACHE_MAX_ENTRIES', 64),
+    ttl=getattr(settings, 'TRANSCRIPT_CACHE_TTL', 60 * 60 * 24),
+    shared=False,
+)
+
+
+def get_transcript_index(transcript_obj):
+    """Return the cached TranscriptIndex for a TranscriptModel row, building it on first use."""
+    key = f"{transcript_obj.youtube_video_id}:{transcript_obj.language}:{transcript_obj.updated_at.timestamp()}"
+    return transcript_index_cache.get_or_set(key, lambda: TranscriptIndex(transcript_obj.get_compact()))
+
+
+def transcript_window(transcript_obj, start, end):
+    """
+    Segments starting in ``[start, end]``. Uses an indexed range query on
+    TranscriptSegment when the rows exist, so only the window is read;
+    otherwise falls back to the cached in-memory index.
+    """
+    if transcript_obj.segment_count:
+        return list(
+            TranscriptSegment.objects
+            .filter(transcript_id=transcript_obj.pk, start__gte=start, start__lte=end)
+            .order_by('start')
+            .values('text', 'start', 'duration')
+        )
+    return get_transcript_index(transcript_obj).window(start, end)
+
+
+def transcript_around(transcript_obj, t, radius):
+    return transcript_window(transcript_obj, max(0, t - radius), t + radius)
+
+
+def _segment_range_queryset(transcript_obj, start, end, cursor):
+    queryset = TranscriptSegment.objects.filter(transcript_id=transcript_obj.pk, position__gte=cursor)
+    if start is not None:
+        queryset = queryset.filter(start__gte=start)
+    if end is not None:
+        queryset = queryset.filter(start__lte=end)
+    return queryset.order_by('position')
+
+
+def _index_range(index, start, end, cursor):
+    lo = bisect_left(index.starts, start) if start is not None else 0
+    hi = bisect_right(index.starts, end) if end is not None else len(index)
+    return max(lo, cursor), hi
+
+
+def transcript_slice(transcript_obj, start=None, end=None, cursor=0, limit=200):
+    """
+    Up to ``limit`` segments starting in ``[start, end]`` from segment position
+    ``cursor`` on, plus the cursor for the next page (None on the last page).
+    """
+    if transcript_obj.segment_count:
+        rows = list(
+            _segment_range_queryset(transcript_obj, start, end, cursor)
+            .values('position', 'text', 'start', 'duration')[:limit + 1]
+        )
+        next_cursor = rows[limit]['position'] if len(rows) > limit else None
+        return [
+            {'text': row['text'], 'start': row['start'], 'duration': row['duration']}
+            for row in rows[:limit]
+        ], next_cursor
+
+    index = get_transcript_index(transcript_obj)
+    lo, hi = _index_range(index, start, end, cursor)
+    stop = min(hi, lo + limit)
+    return index.transcript.segments(lo, stop), (stop if stop < hi else None)
+
+
+def iter_transcript_range(transcript_obj, start=None, end=None, cursor=0, chunk_size=500):
+    """Yield every segment in the range without materialising it, for streamed responses."""
+    if transcript_obj.segment_count:
+        rows = (
+            _segment_range_queryset(transcript_obj, start, end, cursor)
+            .values_list('text', 'start', 'duration')
+            .iterator(chunk_size=chunk_size)
+        )
+        for text, seg_start, duration in rows:
+            yield {'text': text, 'start': seg_start, 'duration': duration}
+        return
+
+    index = get_transcript_index(transcript_obj)
+    lo, hi = _index_range(index, start, end, cursor)
+    for i in range(lo, hi):
+        yield index.transcript.segment(i)
+
+
+# Chapter views precomputed at ingest; other sizes are built on first request
+DEFAULT_BUCKET_MINUTES = (1, 5, 10)
+
+transcript_bucket_cache = TwoTierCache(
+    "transcript_buckets",
+    max_entries=getattr(settings, 'TRANSCRIPT_BUCKET_CACHE_MAX_ENTRIES', 256),
+    ttl=getattr(settings, 'TRANSCRIPT_CACHE_TTL', 60 * 60 * 24),
+)
+
+
+def format_buckets(index, minutes):
+    """``{"0m - 5m": text, ...}`` for the non-empty ``minutes``-long buckets of a transcript."""
+    segment_duration = minutes * 60
+    return {
+        f"{start // 60}m - {(start + segment_duration) // 60}m": text
+        for start, text in index.buckets(segment_duration)
+    }
+
+
+def get_transcript_buckets(transcript_obj, minutes):
+    """Bucketed transcript text, served from the cache after the first computation."""
+    key = f"{transcript_obj.youtube_video_id}:{transcript_obj.language}:{transcript_obj.updated_at.timestamp()}:{minutes}"
+    return transcript_bucket_cache.get_or_set(
+        key, lambda: format_buckets(get_transcript_index(transcript_obj), minutes)
+    )
+
+
+def warm_transcript_buckets(transcript_obj, sizes=DEFAULT_BUCKET_MINUTES):
+    for minutes in sizes:
+        get_transcript_buckets(transcript_obj, minutes)
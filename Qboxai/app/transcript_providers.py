@@ -0,0 +1,395 @@
+import asyncio
+import io
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import webvtt
+from django.conf import settings
+from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
+
+from . import http_client, metrics
+from .negative_cache import (
+    REASON_NO_TRANSCRIPT, REASON_CAPTIONS_DISABLED, REASON_VIDEO_UNAVAILABLE, REASON_PROVIDER_ERROR,
+)
+from .ytdlp_pool import ytdlp_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANGUAGE = getattr(settings, 'TRANSCRIPT_DEFAULT_LANGUAGE', 'en')
+PROVIDER_ORDER = getattr(settings, 'TRANSCRIPT_PROVIDERS', ['rapidapi', 'youtube_transcript_api', 'ytdlp'])
+# Start the next provider when the current one has not answered within this many seconds
+HEDGE_AFTER = getattr(settings, 'TRANSCRIPT_HEDGE_AFTER', 3.0)
+# Give up on the whole chain after this long, so a degraded provider cannot stall requests
+FETCH_DEADLINE = getattr(settings, 'TRANSCRIPT_FETCH_DEADLINE', 25.0)
+BREAKER_THRESHOLD = getattr(settings, 'TRANSCRIPT_BREAKER_THRESHOLD', 5)
+BREAKER_COOLDOWN = getattr(settings, 'TRANSCRIPT_BREAKER_COOLDOWN', 30.0)
+# Providers whose health score drops below this are tried after the healthy ones
+UNHEALTHY_BELOW = 0.5
+
+# A definitive "this video has no transcript" outranks a provider error when
+# reporting why the chain came back empty
+REASON_PRIORITY = [REASON_VIDEO_UNAVAILABLE, REASON_CAPTIONS_DISABLED, REASON_NO_TRANSCRIPT, REASON_PROVIDER_ERROR]
+# These hold for every provider, so the rest of the chain is not tried
+FINAL_REASONS = {REASON_VIDEO_UNAVAILABLE, REASON_CAPTIONS_DISABLED}
+
+
+def convert_to_seconds(hms_str):
+    """Convert HH:MM:SS.mmm to seconds (float)."""
+    h, m, s = hms_str.split(":")
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def segment(text, start, duration):
+    """The one segment shape every provider returns."""
+    return {'text': text, 'start': float(start), 'duration': float(duration)}
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive provider errors and stays open for
+    ``cooldown`` seconds; then one trial call is let through (half-open) and
+    its outcome closes or re-opens the breaker. State is per process.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            self.trial_running = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class TranscriptProvider:
+    """
+    Base class for transcript sources. ``fetch`` returns ``(segments, None)``
+    or ``(None, reason)``; subclasses implement ``_fetch`` and may override
+    ``_afetch`` with a native async version.
+    """
+
+    name = None
+    # Latency (s) at which the health score halves
+    latency_budget = 5.0
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.success_rate = 1.0
+        self.latency = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self, video_id, language):
+        raise NotImplementedError
+
+    async def _afetch(self, video_id, language):
+        return await asyncio.to_thread(self._fetch, video_id, language)
+
+    def health(self):
+        """0..1: recent success rate, discounted by recent latency."""
+        return round(self.success_rate * self.latency_budget / (self.latency_budget + self.latency), 4)
+
+    def _record(self, started, segments, reason):
+        elapsed = time.monotonic() - started
+        # A definitive "no transcript" is a healthy answer; only provider errors count against it
+        ok = segments is not None or reason != REASON_PROVIDER_ERROR
+        self.breaker.record(ok)
+        with self._lock:
+            self.success_rate = 0.8 * self.success_rate + 0.2 * (1.0 if ok else 0.0)
+            self.latency = 0.8 * self.latency + 0.2 * elapsed
+        metrics.observe(f"transcript_provider.{self.name}", elapsed)
+        metrics.incr(f"transcript_provider.{self.name}.{'ok' if segments else reason}")
+
+    def fetch(self, video_id, language=None):
+        started = time.monotonic()
+        try:
+            segments, reason = self._fetch(video_id, language or DEFAULT_LANGUAGE)
+        except Exception as e:
+            logger.warning(f"Transcript provider {self.name} failed for {video_id}: {e}")
+            segments, reason = None, REASON_PROVIDER_ERROR
+        self._record(started, segments, reason)
+        return segments, reason
+
+    async def afetch(self, video_id, language=None):
+        started = time.monotonic()
+        try:
+            segments, reason = await self._afetch(video_id, language or DEFAULT_LANGUAGE)
+        except Exception as e:
+            logger.warning(f"Transcript provider {self.name} failed for {video_id}: {e}")
+            segments, reason = None, REASON_PROVIDER_ERROR
+        self._record(started, segments, reason)
+        return segments, reason
+
+
+SUPADATA_TRANSCRIPT_URL = "https://youtube-transcripts.p.rapidapi.com/youtube/transcript"
+
+
+class RapidAPIProvider(TranscriptProvider):
+    """Supadata transcripts via RapidAPI."""
+
+    name = "rapidapi"
+    latency_budget = 3.0
+
+    def _request_kwargs(self, video_id, language):
+        return {
+            "headers": {
+                "x-rapidapi-host": "youtube-transcripts.p.rapidapi.com",
+                "x-rapidapi-key": settings.RAPIDAPI_KEY,
+                "User-Agent": "Mozilla/5.0"
+            },
+            "params": {
+                "url": f"https://www.youtube.com/watch?v={video_id}",
+                "lang": language,
+            },
+        }
+
+    def _parse(self, video_id, response):
+        if response.status_code != 200:
+            logger.warning(f"Supadata API error for {video_id}: {response.status_code} - {response.text}")
+            return None, REASON_NO_TRANSCRIPT if response.status_code == 404 else REASON_PROVIDER_ERROR
+
+        data = response.json()
+        if "content" not in data or not data["content"]:
+            logger.warning(f"No transcript content returned for {video_id}. Full response: {data}")
+            return None, REASON_NO_TRANSCRIPT
+
+        return [
+            # Supadata offsets and durations are in milliseconds
+            segment(seg['text'], seg['offset'] / 1000, seg['duration'] / 1000)
+            for seg in data['content']
+        ], None
+
+    def _fetch(self, video_id, language):
+        response = http_client.get(SUPADATA_TRANSCRIPT_URL, **self._request_kwargs(video_id, language))
+        return self._parse(video_id, response)
+
+    async def _afetch(self, video_id, language):
+        response = await http_client.aget(SUPADATA_TRANSCRIPT_URL, **self._request_kwargs(video_id, language))
+        return self._parse(video_id, response)
+
+
+class YouTubeTranscriptApiProvider(TranscriptProvider):
+    """Captions read straight from YouTube with youtube_transcript_api."""
+
+    name = "youtube_transcript_api"
+
+    def _fetch(self, video_id, language):
+        try:
+            entries = YouTubeTranscriptApi.get_transcript(video_id, languages=[language])
+        except NoTranscriptFound:
+            return None, REASON_NO_TRANSCRIPT
+        except TranscriptsDisabled:
+            return None, REASON_CAPTIONS_DISABLED
+        except VideoUnavailable:
+            return None, REASON_VIDEO_UNAVAILABLE
+        segments = [segment(e['text'], e['start'], e.get('duration', 0)) for e in entries if e.get('text')]
+        return (segments, None) if segments else (None, REASON_NO_TRANSCRIPT)
+
+
+class YtDlpProvider(TranscriptProvider):
+    """yt-dlp lists the caption tracks; the WebVTT track is downloaded and parsed with webvtt."""
+
+    name = "ytdlp"
+    latency_budget = 10.0
+
+    def _vtt_url(self, info, language):
+        for tracks in (info.get('subtitles') or {}, info.get('automatic_captions') or {}):
+            for fmt in tracks.get(language, []):
+                if fmt.get('ext') == 'vtt':
+                    return fmt['url']
+        return None
+
+    def _fetch(self, video_id, language):
+        # Extraction runs on the yt-dlp process pool; the chain's deadline bounds the wait
+        info, reason = ytdlp_pool.extract_or_reason(video_id, timeout=FETCH_DEADLINE)
+        if not info:
+            return None, reason
+
+        url = self._vtt_url(info, language)
+        if not url:
+            return None, REASON_NO_TRANSCRIPT
+
+        response = http_client.get(url)
+        if response.status_code != 200:
+            return None, REASON_PROVIDER_ERROR
+
+        segments = []
+        previous = None
+        for caption in webvtt.read_buffer(io.StringIO(response.text)):
+            # Auto-generated tracks repeat the previous line as a rolling caption
+            text = caption.text.strip().split("\n")[-1].strip()
+            if not text or text == previous:
+                continue
+            start = convert_to_seconds(caption.start)
+            segments.append(segment(text, start, convert_to_seconds(caption.end) - start))
+            previous = text
+        return (segments, None) if segments else (None, REASON_NO_TRANSCRIPT)
+
+
+class ProviderChain:
+    """
+    Tries transcript providers in order of health, skipping those whose
+    breaker is open. If the current provider has not answered within
+    ``hedge_after`` seconds the next one is started alongside it, and the
+    first transcript to arrive wins. The whole chain gives up after
+    ``deadline`` seconds.
+    """
+
+    def __init__(self, providers, hedge_after=HEDGE_AFTER, deadline=FETCH_DEADLINE, max_workers=16):
+        self.providers = list(providers)
+        self.hedge_after = hedge_after
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcript-provider")
+        metrics.register_provider("transcript_providers", self.health)
+
+    def health(self):
+        return {
+            provider.name: {
+                "health": provider.health(),
+                "breaker": provider.breaker.state,
+                "latency": round(provider.latency, 3),
+            }
+            for provider in self.providers
+        }
+
+    def ordered(self):
+        """Configured order, with unhealthy providers moved behind the healthy ones."""
+        return sorted(self.providers, key=lambda p: p.health() < UNHEALTHY_BELOW)
+
+    def _candidates(self):
+        for provider in self.ordered():
+            if provider.breaker.allow():
+                yield provider
+            else:
+                metrics.incr(f"transcript_provider.{provider.name}.skipped_open")
+
+    @staticmethod
+    def _best_reason(reasons):
+        for reason in REASON_PRIORITY:
+            if reason in reasons:
+                return reason
+        return REASON_PROVIDER_ERROR
+
+    def fetch(self, video_id, language=None):
+        """``(segments, None)`` from the first provider with a transcript, else ``(None, reason)``."""
+        deadline = time.monotonic() + self.deadline
+        candidates = self._candidates()
+        running, reasons = {}, []
+
+        while True:
+            if not running:
+                provider = next(candidates, None)
+                if provider is None:
+                    break
+                running[self._executor.submit(provider.fetch, video_id, language)] = provider
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                metrics.incr("transcript_provider.deadline_exceeded")
+                logger.warning(f"Transcript providers missed the {self.deadline}s deadline for {video_id}")
+                break
+            done, _ = wait(running, timeout=min(self.hedge_after, remaining), return_when=FIRST_COMPLETED)
+
+            if not done:
+                provider = next(candidates, None)
+                if provider is not None:
+                    metrics.incr(f"transcript_provider.{provider.name}.hedged")
+                    running[self._executor.submit(provider.fetch, video_id, language)] = provider
+                continue
+
+            for future in done:
+                running.pop(future)
+                segments, reason = future.result()
+                if segments or reason in FINAL_REASONS:
+                    return segments, reason
+                reasons.append(reason)
+
+        return None, self._best_reason(reasons)
+
+    async def afetch(self, video_id, language=None):
+        """Async variant of ``fetch``."""
+        deadline = time.monotonic() + self.deadline
+        candidates = self._candidates()
+        running, reasons = {}, []
+
+        try:
+            while True:
+                if not running:
+                    provider = next(candidates, None)
+                    if provider is None:
+                        break
+                    running[asyncio.ensure_future(provider.afetch(video_id, language))] = provider
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.incr("transcript_provider.deadline_exceeded")
+                    logger.warning(f"Transcript providers missed the {self.deadline}s deadline for {video_id}")
+                    break
+                done, _ = await asyncio.wait(
+                    running, timeout=min(self.hedge_after, remaining), return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    provider = next(candidates, None)
+                    if provider is not None:
+                        metrics.incr(f"transcript_provider.{provider.name}.hedged")
+                        running[asyncio.ensure_future(provider.afetch(video_id, language))] = provider
+                    continue
+
+                for task in done:
+                    running.pop(task)
+                    segments, reason = task.result()
+                    if segments or reason in FINAL_REASONS:
+                        return segments, reason
+                    reasons.append(reason)
+        finally:
+            for task in running:
+                task.cancel()
+
+        return None, self._best_reason(reasons)
+
+
+PROVIDERS = {
+    provider.name: provider
+    for provider in (RapidAPIProvider(), YouTubeTranscriptApiProvider(), YtDlpProvider())
+}
+
+
+transcript_chain = ProviderChain(PROVIDERS[name] for name in PROVIDER_ORDER if name in PROVIDERS)
+
+
+def register_provider(provider):
+    """Add a TranscriptProvider instance to the end of the chain (e.g. from an AppConfig.ready)."""
+    PROVIDERS[provider.name] = provider
+    transcript_chain.providers.append(provider)
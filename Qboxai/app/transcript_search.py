@@ -0,0 +1,178 @@
+import logging
+import re
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+
+from . import metrics
+from .models import SessionModel, TranscriptModel, TranscriptSegment, VideoModel
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_TABLE = TranscriptSegment._meta.db_table
+TRANSCRIPT_TABLE = TranscriptModel._meta.db_table
+VIDEO_TABLE = VideoModel._meta.db_table
+SESSION_TABLE = SessionModel._meta.db_table
+FTS_TABLE = f"{SEGMENT_TABLE}_fts"
+
+# Must match the expression index created in migrations/0010_transcript_search.py
+POSTGRES_CONFIG = 'english'
+
+SNIPPET_WORDS = getattr(settings, 'TRANSCRIPT_SEARCH_SNIPPET_WORDS', 12)
+
+SQLITE_TRIGGERS = [f"{FTS_TABLE}_ai", f"{FTS_TABLE}_ad", f"{FTS_TABLE}_au"]
+
+_word_re = re.compile(r'\w+', re.UNICODE)
+
+
+def _fts5_query(text):
+    """User text as an FTS5 query: every word must match, FTS5 operators are not interpreted."""
+    words = _word_re.findall(text)
+    return " ".join(f'"{word}"' for word in words)
+
+
+def _user_video_ids_sql():
+    """Subquery (one ``%s`` for the user id, twice) for the videos a user added or has a session on."""
+    return (
+        f"SELECT youtube_video_id FROM {VIDEO_TABLE} WHERE user_id = %s "
+        f"UNION SELECT v.youtube_video_id FROM {SESSION_TABLE} ss "
+        f"JOIN {VIDEO_TABLE} v ON v.id = ss.video_id WHERE ss.user_id = %s"
+    )
+
+
+def _search_sqlite(query, user_id, limit):
+    fts_query = _fts5_query(query)
+    if not fts_query:
+        return []
+    sql = (
+        f"SELECT t.youtube_video_id, t.language, s.start, s.duration, "
+        f"snippet({FTS_TABLE}, 0, '<mark>', '</mark>', '…', %s), bm25({FTS_TABLE}) AS score "
+        f"FROM {FTS_TABLE} "
+        f"JOIN {SEGMENT_TABLE} s ON s.id = {FTS_TABLE}.rowid "
+        f"JOIN {TRANSCRIPT_TABLE} t ON t.id = s.transcript_id "
+        f"WHERE {FTS_TABLE} MATCH %s AND t.youtube_video_id IN ({_user_video_ids_sql()}) "
+        f"ORDER BY score LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [SNIPPET_WORDS, fts_query, user_id, user_id, limit])
+        # bm25() is lower-is-better; flip it so every backend returns higher-is-better
+        return [(video_id, language, start, duration, snippet, -score)
+                for video_id, language, start, duration, snippet, score in cursor.fetchall()]
+
+
+def _search_postgres(query, user_id, limit):
+    sql = (
+        f"SELECT t.youtube_video_id, t.language, s.start, s.duration, "
+        f"ts_headline(%s::regconfig, s.text, q, %s), "
+        f"ts_rank(to_tsvector('{POSTGRES_CONFIG}', s.text), q) AS score "
+        f"FROM {SEGMENT_TABLE} s "
+        f"JOIN {TRANSCRIPT_TABLE} t ON t.id = s.transcript_id, "
+        f"websearch_to_tsquery(%s::regconfig, %s) q "
+        f"WHERE to_tsvector('{POSTGRES_CONFIG}', s.text) @@ q "
+        f"AND t.youtube_video_id IN ({_user_video_ids_sql()}) "
+        f"ORDER BY score DESC LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        headline_options = f"StartSel=<mark>, StopSel=</mark>, MaxWords={SNIPPET_WORDS}, MinWords=3"
+        cursor.execute(sql, [POSTGRES_CONFIG, headline_options, POSTGRES_CONFIG, query, user_id, user_id, limit])
+        return cursor.fetchall()
+
+
+def _search_fallback(query, user_id, limit):
+    """Unindexed substring match for other databases; results are unranked."""
+    owned = (
+        Q(transcript__youtube_video_id__in=VideoModel.objects.filter(user_id=user_id).values('youtube_video_id'))
+        | Q(transcript__youtube_video_id__in=SessionModel.objects.filter(user_id=user_id).values('video__youtube_video_id'))
+    )
+    rows = (
+        TranscriptSegment.objects
+        .filter(owned, text__icontains=query)
+        .values_list('transcript__youtube_video_id', 'transcript__language', 'start', 'duration', 'text')
+        .order_by('transcript_id', 'start')[:limit]
+    )
+    return [(*row, 0.0) for row in rows]
+
+
+def ensure_search_index(using='default'):
+    """
+    Re-create the full-text index objects from migration 0010 if any are
+    missing. SQLite drops the FTS triggers whenever a later migration rebuilds
+    the segment table, so this runs after every ``migrate`` (see apps.py); the
+    FTS table is rebuilt from the segment rows when something was re-created.
+    Returns True when anything had to be re-created.
+    """
+    search_migration = import_module('app.migrations.0010_transcript_search')
+    conn = connections[using]
+    if conn.vendor == 'sqlite':
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)", [FTS_TABLE, *SQLITE_TRIGGERS]
+            )
+            present = {name for (name,) in cursor.fetchall()}
+        if present >= {FTS_TABLE, *SQLITE_TRIGGERS}:
+            return False
+        statements = search_migration.SQLITE_FORWARD
+    elif conn.vendor == 'postgresql':
+        # CREATE INDEX IF NOT EXISTS is a no-op when the index is there
+        statements = search_migration.POSTGRES_FORWARD
+    else:
+        return False
+
+    with conn.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+    if conn.vendor == 'sqlite':
+        logger.warning(f"Re-created the transcript search triggers on {using}; FTS table rebuilt.")
+        metrics.incr("transcript_search.index_recreated")
+        return True
+    return False
+
+
+def ensure_search_index_after_migrate(sender, using='default', **kwargs):
+    """post_migrate receiver; skipped until migration 0010 has been applied."""
+    if not MigrationRecorder(connections[using]).migration_qs.filter(
+        app='app', name='0010_transcript_search'
+    ).exists():
+        return
+    ensure_search_index(using)
+
+
+def search_transcripts(query, user, limit=50):
+    """
+    Ranked segment matches for ``query`` across the transcripts of the user's
+    videos, grouped per video (best video first)::
+
+        [{"video_id", "language", "score", "matches": [{"start", "duration", "snippet", "score"}]}]
+
+    Only transcripts with TranscriptSegment rows are searchable.
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+
+    vendor = connection.vendor
+    search = {'sqlite': _search_sqlite, 'postgresql': _search_postgres}.get(vendor, _search_fallback)
+    with metrics.timer(f"transcript_search.{vendor}"):
+        try:
+            rows = search(query, user.pk, limit)
+        except Exception as e:
+            # e.g. the FTS table was dropped by a table rebuild; see rebuild_transcript_search
+            logger.error(f"Transcript search failed on {vendor}, falling back to a substring match: {e}")
+            metrics.incr("transcript_search.errors")
+            rows = _search_fallback(query, user.pk, limit)
+
+    results = {}
+    for video_id, language, start, duration, snippet, score in rows:
+        key = (video_id, language)
+        if key not in results:
+            results[key] = {"video_id": video_id, "language": language, "score": score, "matches": []}
+        results[key]["matches"].append({
+            "start": start,
+            "duration": duration,
+            "snippet": snippet,
+            "score": score,
+        })
+    return list(results.values())
@@ -5,7 +5,10 @@ from .views import (CourseAPIView, AskQuestionAPIView, UserQaWatchedSessionsView
                     AllUsersWatchedSessionsView, ClipTabAPIView, UserClipWatchedSessionsView,
                     CreateNotesAPIView,  GetNotesAPIView, CombinedDataAPIView, CreateSessionAPIView,
                     VideoCourseUpdateView, YoutubeVideoCourseUpdateView, UnlinkedVideosAPIView, CourseVideoListView,
-                    CourseVideosAPIView, YoutubeTranscriptView, TranscriptListAPIView, GenerateMCQsAPIView, SubmitMCQAnswersAPIView)
+                    CourseVideosAPIView, YoutubeTranscriptView, TranscriptListAPIView, GenerateMCQsAPIView, SubmitMCQAnswersAPIView,
+                    MetricsAPIView, TranscriptRangeAPIView, TranscriptSearchAPIView, MCQJobStatusAPIView)
+from .async_views import (AsyncAskQuestionAPIView, AsyncClipTabAPIView, AsyncYoutubeTranscriptView,
+                          AsyncGenerateMCQsAPIView)
 
 urlpatterns = [
     path('transcripts/', TranscriptListAPIView.as_view(), name='transcript-list'),
@@ -26,6 +29,8 @@ urlpatterns = [
     path('create-note/', CreateNotesAPIView.as_view(), name='create-note'), #post/get/del
     path('notes/<int:note_id>/', CreateNotesAPIView.as_view(), name='update-note'), #edit
     path('youtube/transcript/', YoutubeTranscriptView.as_view(), name='youtube-transcript'),
+    path('transcripts/search/', TranscriptSearchAPIView.as_view(), name='transcript-search'),
+    path('transcripts/<str:video_id>/segments/', TranscriptRangeAPIView.as_view(), name='transcript-range'),
 
     path('combined-api/', CombinedDataAPIView.as_view(), name='combinedapi'),#get/del
 
@@ -35,7 +40,15 @@ urlpatterns = [
     path('allusers-watched-sessions/', AllUsersWatchedSessionsView.as_view(), name='all-watched-sessions'),#get/
     path('create-session/', CreateSessionAPIView.as_view(), name='create-session'),
     path('generate-mcqs/', GenerateMCQsAPIView.as_view(), name='generate-mcqs'),
+    path('mcq-jobs/<int:job_id>/', MCQJobStatusAPIView.as_view(), name='mcq-job-status'),
     path('submit-answers/', SubmitMCQAnswersAPIView.as_view(), name='submit_mcq_answers'),
+    path('metrics/', MetricsAPIView.as_view(), name='metrics'),
+
+    # Async variants of the hot paths; only useful when served through core.asgi
+    path('async/ask-question/', AsyncAskQuestionAPIView.as_view(), name='async-ask-question'),
+    path('async/cliptab/', AsyncClipTabAPIView.as_view(), name='async-cliptab'),
+    path('async/youtube/transcript/', AsyncYoutubeTranscriptView.as_view(), name='async-youtube-transcript'),
+    path('async/generate-mcqs/', AsyncGenerateMCQsAPIView.as_view(), name='async-generate-mcqs'),
     # path('rapid-transcript/', RapidTranscriptAPIView.as_view(), name='test-rapid-api')
 ]
 
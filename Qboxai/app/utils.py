@@ -1,5 +1,6 @@
 
 from django.core.cache import cache
+import asyncio
 import webvtt
 import requests
 import os
@@ -8,15 +9,27 @@ import logging
 from urllib.parse import urlparse, parse_qs
 from django.conf import settings
 from django.core.cache import cache
-from yt_dlp import YoutubeDL
 from asgiref.sync import sync_to_async
-import google.generativeai as genai
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
-from .models import TranscriptModel, VideoModel, SessionModel, QAModel
-from googleapiclient.discovery import build
+from django.db import transaction
+from django.db.models import Case, When
+from .models import TranscriptModel, TranscriptSegment, VideoModel, SessionModel, QAModel
+from .cache import transcript_cache, video_title_cache, transcript_languages_cache
+from .singleflight import SingleFlight
+from .negative_cache import (
+    negative_cache, transcript_kind, KIND_VIDEO, KIND_TRANSCRIPTS, KIND_TITLE,
+    REASON_CAPTIONS_DISABLED, REASON_VIDEO_UNAVAILABLE, REASON_PROVIDER_ERROR,
+)
+from .compact_transcript import CompactTranscript
+from . import http_client
+from .transcript_providers import PROVIDERS, transcript_chain, convert_to_seconds
+from .transcript_index import warm_transcript_buckets
+from .youtube_metadata import get_video_metadata
+from .ytdlp_pool import ytdlp_pool
 from googleapiclient.errors import HttpError
 from django.core.cache import cache
-genai.configure(api_key=settings.GEMINI_API_KEY)
+from .llm import llm_registry, MCQ_MODEL
+from .llm_limiter import LLMOverloaded
 
 
 # ✅ Setup logging
@@ -24,118 +37,130 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
-genai.configure(api_key=settings.GEMINI_API_KEY)
-
 YOUTUBE_API_KEY = settings.YOUTUBE_API_KEY
 
-video_title_cache = {}
-transcript_cache = {}
-transcript_languages_cache = {}
-# def get_video_title_with_cache(video_id, youtube_api_key=None):
-#     cache_key = f"video_title:{video_id}"
-#     title = cache.get(cache_key)
-#
-#     if title:
-#         return title
-#
-#     # Step 1: Try YouTube API
-#     if youtube_api_key:
-#         title = fetch_video_title_via_api(video_id, youtube_api_key)
-#
-#     # Step 2: Fallback to yt-dlp
-#     if not title:
-#         title = fetch_video_title_via_ytdlp(video_id)
-#
-#     if title:
-#         cache.set(cache_key, title, timeout=60 * 60 * 24)  # cache for 24 hours
-#
-#     return title
-#
-#
-# def get_transcript_with_cache(video_id):
-#     cache_key = f"transcript:{video_id}"
-#     cached = cache.get(cache_key)
-#
-#     if cached:
-#         logger.debug(f"Transcript cache hit for {video_id}")
-#         return cached
-#
-#     try:
-#         transcript = fetch_transcript_with_super_data_api(video_id)
-#         if transcript:
-#             full_text = " ".join([seg['text'] for seg in transcript])
-#             data = {
-#                 "segments": transcript,
-#                 "full_text": full_text
-#             }
-#             cache.set(cache_key, data, timeout=86400)
-#             return data
-#     except Exception as e:
-#         logger.error(f"Transcript fetch error for {video_id}: {e}")
-#
-#     return None
-#
-#
-# def get_transcript_languages_cached(video_id):
-#     cache_key = f"transcript_languages:{video_id}"
-#     languages = cache.get(cache_key)
-#
-#     if languages:
-#         return languages
-#
-#     languages = get_transcript_languages(video_id)
-#
-#     if languages:
-#         cache.set(cache_key, languages, timeout=60 * 60 * 24)
-#
-#     return languages
-
-def get_transcript_with_cache(video_id):
-    if video_id in transcript_cache:
-        return transcript_cache[video_id]
-    transcript = fetch_transcript_with_super_data_api(video_id)
-    if transcript:
-        full_text = " ".join([seg['text'] for seg in transcript])
-        transcript_cache[video_id] = {
-            "segments": transcript,
-            "full_text": full_text
-        }
-        return transcript_cache[video_id]
+DEFAULT_TRANSCRIPT_LANGUAGE = getattr(settings, 'TRANSCRIPT_DEFAULT_LANGUAGE', 'en')
 
-    return None
+transcript_flight = SingleFlight("transcript")
+video_title_flight = SingleFlight("video_title")
+
+
+def transcript_cache_key(video_id, language=None):
+    return f"{video_id}:{language or DEFAULT_TRANSCRIPT_LANGUAGE}"
+
+
+def transcript_negative_reason(video_id, language=None):
+    """Why the video has no transcript in ``language``, if a recent fetch already found out."""
+    return negative_cache.get(
+        video_id, KIND_VIDEO, KIND_TRANSCRIPTS, transcript_kind(language or DEFAULT_TRANSCRIPT_LANGUAGE)
+    )
+
+
+def get_transcript_with_cache(video_id, language=None):
+    key = transcript_cache_key(video_id, language)
+    cached = transcript_cache.get(key)
+    if cached is not None:
+        logger.debug(f"Transcript cache hit for {key}")
+        return cached.as_dict()
+
+    if transcript_negative_reason(video_id, language):
+        logger.debug(f"Transcript negative cache hit for {key}")
+        return None
+
+    return transcript_flight.do(
+        key,
+        lambda: _fetch_transcript_into_cache(video_id, language),
+        check=lambda: _cached_transcript_dict(video_id, language),
+    )
+
+
+def _cached_transcript_dict(video_id, language=None):
+    cached = transcript_cache.get(transcript_cache_key(video_id, language))
+    return cached.as_dict() if cached is not None else None
+
+
+def _fetch_transcript_into_cache(video_id, language=None):
+    # Workers that waited on another worker's failed fetch stop here
+    if transcript_negative_reason(video_id, language):
+        return None
+
+    transcript, reason = fetch_transcript_or_reason(video_id, language)
+    if not transcript:
+        negative_cache.set(video_id, transcript_kind(language or DEFAULT_TRANSCRIPT_LANGUAGE), reason)
+        return None
+
+    # Cached compactly; callers still get the {"segments", "full_text"} dict
+    transcript_cache.set(transcript_cache_key(video_id, language), CompactTranscript.from_segments(transcript))
+    return {
+        "segments": transcript,
+        "full_text": " ".join([seg['text'] for seg in transcript])
+    }
 
 def get_video_title_with_cache(video_id, youtube_api_key=None):
-    if video_id in video_title_cache:
-        return video_title_cache[video_id]
+    title = video_title_cache.get(video_id)
+    if title:
+        return title
+
+    if negative_cache.get(video_id, KIND_VIDEO, KIND_TITLE):
+        logger.debug(f"Video title negative cache hit for {video_id}")
+        return None
+
+    return video_title_flight.do(
+        video_id,
+        lambda: _fetch_video_title_into_cache(video_id, youtube_api_key),
+        check=lambda: video_title_cache.get(video_id),
+    )
+
+
+def _fetch_video_title_into_cache(video_id, youtube_api_key=None):
+    if negative_cache.get(video_id, KIND_VIDEO, KIND_TITLE):
+        return None
 
     title = None
 
     # Step 1: Try YouTube API
     if youtube_api_key:
-        title = fetch_video_title_via_api(video_id, youtube_api_key)
+        title, reason = video_title_via_api_or_reason(video_id, youtube_api_key)
+        if reason == REASON_VIDEO_UNAVAILABLE:
+            # The API's answer is definitive; yt-dlp would fail the same way, only slower
+            negative_cache.set(video_id, KIND_VIDEO, reason)
+            return None
 
     # Step 2: Fallback to yt-dlp if API fails
     if not title:
         title = fetch_video_title_via_ytdlp(video_id)
 
-    # Cache if success
+    # Cache if success; otherwise remember the failure for a short while
     if title:
-        video_title_cache[video_id] = title
+        video_title_cache.set(video_id, title)
+    else:
+        negative_cache.set(video_id, KIND_TITLE, REASON_PROVIDER_ERROR)
 
     return title
 def get_transcript_languages_cached(video_id):
-    if video_id in transcript_languages_cache:
-        print(f"[Local Cache Hit] Transcript languages for {video_id}")
-        return transcript_languages_cache[video_id]
+    languages = transcript_languages_cache.get(video_id)
+    if languages:
+        logger.debug(f"Transcript languages cache hit for {video_id}")
+        return languages
 
-    print(f"[Local Cache Miss] Fetching transcript languages for {video_id}")
+    if negative_cache.get(video_id, KIND_VIDEO, KIND_TRANSCRIPTS):
+        return []
+
+    logger.debug(f"Transcript languages cache miss for {video_id}")
     languages = get_transcript_languages(video_id)
 
     if languages:
-        transcript_languages_cache[video_id] = languages
+        transcript_languages_cache.set(video_id, languages)
 
     return languages
 
+
+def available_transcript_language_codes(video_id):
+    """Language codes YouTube lists for a video, manual captions before auto-generated ones."""
+    languages = get_transcript_languages_cached(video_id) or []
+    ordered = sorted(languages, key=lambda lang: lang.get("is_generated", False))
+    return [lang["language_code"] for lang in ordered]
+
 def extract_youtube_video_id(url):
     parsed_url = urlparse(url)
     hostname = parsed_url.hostname
@@ -164,96 +189,77 @@ def get_transcript_languages(video_id):
             }
             for transcript in transcript_list
         ]
-    except (TranscriptsDisabled, VideoUnavailable, Exception) as e:
+    except TranscriptsDisabled:
+        negative_cache.set(video_id, KIND_TRANSCRIPTS, REASON_CAPTIONS_DISABLED)
+    except VideoUnavailable:
+        negative_cache.set(video_id, KIND_VIDEO, REASON_VIDEO_UNAVAILABLE)
+    except Exception as e:
         logger.warning(f"Failed to list transcripts for video {video_id}: {e}")
-        return []
-
-
-
-def convert_to_seconds(hms_str):
-    """Convert HH:MM:SS.mmm to seconds (float)."""
-    h, m, s = hms_str.split(":")
-    return int(h) * 3600 + int(m) * 60 + float(s)
+    return []
 
 
 
-def fetch_transcript_with_super_data_api(video_id):
+def fetch_transcript_or_reason(video_id, language=None):
     """
-    Fetch transcript using Supadata API via RapidAPI.
-    Falls back to logging warning if no transcript found or on error.
-    Returns list of segments: [{'text': ..., 'start': ..., 'duration': ...}]
+    Fetch a transcript in ``language`` (default English) through the provider chain
+    (RapidAPI, then youtube_transcript_api, then yt-dlp captions; see transcript_providers.py).
+    Returns ``(segments, None)`` with segments as [{'text': ..., 'start': ..., 'duration': ...}],
+    or ``(None, reason)`` with a negative-cache reason code when there is none.
     """
-    api_url = "https://youtube-transcripts.p.rapidapi.com/youtube/transcript"
-    full_video_url = f"https://www.youtube.com/watch?v={video_id}"
+    return transcript_chain.fetch(video_id, language)
 
-    headers = {
-        "x-rapidapi-host": "youtube-transcripts.p.rapidapi.com",
-        "x-rapidapi-key": settings.RAPIDAPI_KEY,
-        "User-Agent": "Mozilla/5.0"
-    }
 
-    try:
-        response = requests.get(api_url, headers=headers, params={"url": full_video_url})
-        if response.status_code != 200:
-            logger.warning(f"Supadata API error for {video_id}: {response.status_code} - {response.text}")
-            return None
-
-        data = response.json()
-        if "content" not in data or not data["content"]:
-            logger.warning(f"No transcript content returned for {video_id}. Full response: {data}")
-            return None
-
-        return [
-            {
-                'text': seg['text'],
-                'start': seg['offset'] / 1000,      # Convert ms to seconds
-                'duration': seg['duration'] / 1000  # Convert ms to seconds
-            }
-            for seg in data['content']
-        ]
+def fetch_transcript_with_super_data_api(video_id, language=None):
+    """RapidAPI (Supadata) only; the segments, or None if no transcript found or on error."""
+    return PROVIDERS['rapidapi'].fetch(video_id, language)[0]
 
-    except Exception as e:
-        logger.warning(f"Exception while fetching transcript for {video_id}: {e}")
-        return None
 
+async def afetch_transcript_or_reason(video_id, language=None):
+    """Async variant of ``fetch_transcript_or_reason`` for the ASGI views."""
+    return await transcript_chain.afetch(video_id, language)
 
 
-def fetch_video_title_via_api(video_id, youtube_api_key):
+def video_title_via_api_or_reason(video_id, youtube_api_key):
+    """``(title, None)``, or ``(None, reason)`` when the YouTube Data API gives no title."""
     try:
-        youtube = build('youtube', 'v3', developerKey=youtube_api_key)
-        response = youtube.videos().list(part="snippet", id=video_id).execute()
-        items = response.get('items', [])
-        if items:
-            return items[0]['snippet']['title']
+        metadata = get_video_metadata([video_id], youtube_api_key).get(video_id)
+        if metadata and metadata["title"]:
+            return metadata["title"], None
+        # The API answers with no items for deleted, private and mistyped ids
+        return None, REASON_VIDEO_UNAVAILABLE
     except HttpError as e:
         logger.warning(f"YouTube API error for video {video_id}: {e}")
     except Exception as e:
         logger.warning(f"Unexpected error in YouTube API for video {video_id}: {e}")
-    return None
+    return None, REASON_PROVIDER_ERROR
+
+
+def fetch_video_title_via_api(video_id, youtube_api_key):
+    return video_title_via_api_or_reason(video_id, youtube_api_key)[0]
 
 def fetch_video_title_via_ytdlp(video_id):
-    url = f"https://www.youtube.com/watch?v={video_id}"
-    COOKIES_FILE = "/home/ubuntu/cookies.txt"  # Path to your cookies
+    """Title from yt-dlp, extracted on the worker process pool; None if it fails or is not done in time."""
+    info = ytdlp_pool.extract(video_id)
+    return info.get('title') if info else None
 
-    try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'skip_download': True,
-            # Optional: use cookies only if required
-            # 'cookiefile': COOKIES_FILE,
-        }
-
-        with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            return info.get('title')
+def _transcript_queryset(video_id, lazy=False, language=None):
+    queryset = TranscriptModel.objects.filter(youtube_video_id=video_id)
+    if language:
+        queryset = queryset.filter(language=language)
+    if lazy:
+        queryset = queryset.defer('transcript_data', 'transcript_text', 'transcript_blob')
+    return queryset
 
-    except Exception as e:
-        logger.error(f"Failed to fetch title for video {video_id}: {e}")
-        return None
 
-def get_transcript_model(video_id):
-    return TranscriptModel.objects.filter(youtube_video_id=video_id).first()
+def get_transcript_model(video_id, lazy=False, language=None):
+    """
+    The stored transcript in ``language``, or in any language (default first) when
+    ``language`` is None. With ``lazy=True`` the payload columns load only when accessed.
+    """
+    queryset = _transcript_queryset(video_id, lazy=lazy, language=language)
+    if language is None:
+        queryset = queryset.order_by(Case(When(language=DEFAULT_TRANSCRIPT_LANGUAGE, then=0), default=1), 'created_at')
+    return queryset.first()
 
 
 def get_or_create_video(user, video_id, title, url):
@@ -268,13 +274,183 @@ def get_or_create_session(user, video):
     return SessionModel.objects.get_or_create(user=user, video=video)
 
 
-def create_transcript(video_id, data):
-    return TranscriptModel.objects.create(
+def transcript_defaults(data):
+    """Column values for a new TranscriptModel row from a ``{"segments", "full_text"}`` dict."""
+    defaults = {
+        'transcript_data': data["segments"],
+        'transcript_text': data.get("full_text", "")
+    }
+    if getattr(settings, 'TRANSCRIPT_COMPACT_STORAGE', False):
+        defaults['transcript_blob'] = CompactTranscript.from_segments(data["segments"]).to_bytes()
+        # The blob's text buffer is the transcript; get_text() reads it from there
+        defaults['transcript_data'] = []
+        defaults['transcript_text'] = ''
+    return defaults
+
+
+def create_transcript(video_id, data, language=None):
+    """Idempotent upsert: concurrent callers for the same video and language all get the one row."""
+    transcript_obj, created = TranscriptModel.objects.get_or_create(
         youtube_video_id=video_id,
-        language='en',
-        transcript_data=data["segments"],
-        transcript_text=data.get("full_text", "")
+        language=language or DEFAULT_TRANSCRIPT_LANGUAGE,
+        defaults=transcript_defaults(data)
+    )
+    if created:
+        if getattr(settings, 'TRANSCRIPT_SEGMENT_TABLE', True):
+            store_transcript_segments(transcript_obj, data["segments"])
+        warm_transcript_buckets(transcript_obj)
+    return transcript_obj
+
+
+def transcript_segment_rows(transcript_obj, segments):
+    return [
+        TranscriptSegment(
+            transcript=transcript_obj,
+            position=position,
+            start=float(seg['start']),
+            duration=float(seg.get('duration', 0)),
+            text=seg['text'],
+        )
+        for position, seg in enumerate(segments)
+    ]
+
+
+def store_transcript_segments(transcript_obj, segments, batch_size=1000):
+    """Bulk-insert the normalized TranscriptSegment rows for a transcript."""
+    rows = transcript_segment_rows(transcript_obj, segments)
+    with transaction.atomic():
+        TranscriptSegment.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+        TranscriptModel.objects.filter(pk=transcript_obj.pk).update(segment_count=len(rows))
+    transcript_obj.segment_count = len(rows)
+
+
+def get_or_fetch_transcript(video_id, lazy=False, language=None):
+    """
+    Return ``(transcript_obj, source)`` for a video in ``language`` (default English),
+    fetching and storing it on a miss. ``source`` is "database" or "fetched";
+    ``transcript_obj`` is None when no transcript could be fetched.
+    """
+    language = language or DEFAULT_TRANSCRIPT_LANGUAGE
+    transcript_obj = get_transcript_model(video_id, lazy=lazy, language=language)
+    if transcript_obj:
+        return transcript_obj, "database"
+
+    transcript_data = get_transcript_with_cache(video_id, language)
+    if not transcript_data or not transcript_data.get("segments"):
+        return None, "fetched"
+
+    return create_transcript(video_id, transcript_data, language), "fetched"
+
+
+def get_or_fetch_best_transcript(video_id, language=None, lazy=False):
+    """
+    Like ``get_or_fetch_transcript`` but falls back to another language when the
+    requested one does not exist: first any stored transcript, then the languages
+    YouTube lists for the video. The requested language is only fetched when the
+    (cached) language list includes it or is unknown, so videos without it do
+    not hit the provider on every request.
+    """
+    language = language or DEFAULT_TRANSCRIPT_LANGUAGE
+    transcript_obj = get_transcript_model(video_id, lazy=lazy, language=language)
+    if transcript_obj:
+        return transcript_obj, "database"
+
+    available = available_transcript_language_codes(video_id)
+    if not available or language in available:
+        transcript_obj, source = get_or_fetch_transcript(video_id, lazy=lazy, language=language)
+        if transcript_obj:
+            return transcript_obj, source
+
+    transcript_obj = get_transcript_model(video_id, lazy=lazy)
+    if transcript_obj:
+        return transcript_obj, "database"
+
+    for code in available:
+        if code == language:
+            continue
+        transcript_obj, source = get_or_fetch_transcript(video_id, lazy=lazy, language=code)
+        if transcript_obj:
+            return transcript_obj, source
+    return None, "fetched"
+
+
+# In-flight async fetches, keyed by (event loop, cache key), so concurrent
+# coroutines in one ASGI worker share a single RapidAPI call
+_async_transcript_fetches = {}
+
+
+async def aget_transcript_with_cache(video_id, language=None):
+    cached = await sync_to_async(_cached_transcript_dict, thread_sensitive=False)(video_id, language)
+    if cached is not None:
+        return cached
+
+    if await sync_to_async(transcript_negative_reason, thread_sensitive=False)(video_id, language):
+        return None
+
+    key = (asyncio.get_running_loop(), transcript_cache_key(video_id, language))
+    task = _async_transcript_fetches.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_afetch_transcript_into_cache(video_id, language))
+        _async_transcript_fetches[key] = task
+        task.add_done_callback(lambda _: _async_transcript_fetches.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _afetch_transcript_into_cache(video_id, language=None):
+    transcript, reason = await afetch_transcript_or_reason(video_id, language)
+    if not transcript:
+        await sync_to_async(negative_cache.set, thread_sensitive=False)(
+            video_id, transcript_kind(language or DEFAULT_TRANSCRIPT_LANGUAGE), reason
+        )
+        return None
+    await sync_to_async(transcript_cache.set, thread_sensitive=False)(
+        transcript_cache_key(video_id, language), CompactTranscript.from_segments(transcript)
     )
+    return {
+        "segments": transcript,
+        "full_text": " ".join([seg['text'] for seg in transcript])
+    }
+
+
+async def aget_or_fetch_transcript(video_id, lazy=False, language=None):
+    """Async variant of ``get_or_fetch_transcript``."""
+    language = language or DEFAULT_TRANSCRIPT_LANGUAGE
+    transcript_obj = await _transcript_queryset(video_id, lazy=lazy, language=language).afirst()
+    if transcript_obj:
+        return transcript_obj, "database"
+
+    transcript_data = await aget_transcript_with_cache(video_id, language)
+    if not transcript_data or not transcript_data.get("segments"):
+        return None, "fetched"
+
+    return await sync_to_async(create_transcript)(video_id, transcript_data, language), "fetched"
+
+
+async def aget_or_fetch_best_transcript(video_id, language=None, lazy=False):
+    """Async variant of ``get_or_fetch_best_transcript``."""
+    language = language or DEFAULT_TRANSCRIPT_LANGUAGE
+    transcript_obj = await _transcript_queryset(video_id, lazy=lazy, language=language).afirst()
+    if transcript_obj:
+        return transcript_obj, "database"
+
+    available = await sync_to_async(available_transcript_language_codes, thread_sensitive=False)(video_id)
+    if not available or language in available:
+        transcript_obj, source = await aget_or_fetch_transcript(video_id, lazy=lazy, language=language)
+        if transcript_obj:
+            return transcript_obj, source
+
+    transcript_obj = await sync_to_async(get_transcript_model)(video_id, lazy=lazy)
+    if transcript_obj:
+        return transcript_obj, "database"
+
+    for code in available:
+        if code == language:
+            continue
+        transcript_obj, source = await aget_or_fetch_transcript(video_id, lazy=lazy, language=code)
+        if transcript_obj:
+            return transcript_obj, source
+    return None, "fetched"
+
 def create_qa(session, question, answer, time_stamp):
     return QAModel.objects.create(
         session=session,
@@ -296,9 +472,20 @@ def check_question_limit(user, session, max_total=30, max_per_video=5):
     return False, None
 
 def generate_ai_response(prompt):
-    model = genai.GenerativeModel('gemini-1.5-pro')
-    response = model.generate_content(prompt)
-    return getattr(response, "text", "").strip()
+    return llm_registry.generate(prompt)
+
+
+async def agenerate_ai_response(prompt):
+    return await llm_registry.agenerate(prompt)
+
+
+def stream_ai_response(contents, model_name=None):
+    """Yield the text of a Gemini completion piece by piece as it is generated."""
+    return llm_registry.stream(contents, model=model_name)
+
+
+def astream_ai_response(contents, model_name=None):
+    return llm_registry.astream(contents, model=model_name)
 
 
 
@@ -309,7 +496,6 @@ import requests
 from collections import defaultdict
 from django.core.cache import cache
 from youtube_transcript_api import YouTubeTranscriptApi
-import google.generativeai as genai
 from django.conf import settings
 
 # Extract YouTube video ID
@@ -356,7 +542,7 @@ def get_transcript_from_youtube(video_id):
     }
 
     try:
-        response = requests.get(api_url, headers=headers, params={"url": full_video_url})
+        response = http_client.get(api_url, headers=headers, params={"url": full_video_url})
 
         if response.status_code != 200:
             logger.warning(f"Supadata API error for {video_id}: {response.status_code} - {response.text}")
@@ -401,15 +587,10 @@ def chunk_transcript_by_minutes(transcript):
 
 # Generate MCQs using Gemini (Google Generative AI)
 import re
-import google.generativeai as genai
 from django.conf import settings
 
-def generate_mcqs_from_transcript(full_transcript_text):
-    """Generate 10 advanced MCQs using Gemini AI and parse them into structured data."""
-    genai.configure(api_key=settings.GEMINI_API_KEY)
-    model = genai.GenerativeModel(model_name="models/gemini-1.5-flash-latest")
-
-    prompt = f"""
+def build_mcq_prompt(full_transcript_text):
+    return f"""
 Based on the following video transcript, create exactly 10 ADVANCED multiple choice questions that test DEEP understanding of the subject matter.
 
 CRITICAL REQUIREMENTS FOR IN-DEPTH QUESTIONS:
@@ -448,12 +629,28 @@ Transcript:
 Generate exactly 10 MCQs now:
 """
 
+
+def generate_mcqs_from_transcript(full_transcript_text):
+    """Generate 10 advanced MCQs using Gemini AI and parse them into structured data."""
     try:
-        response = model.generate_content(prompt)
-        raw_output = response.text.strip()
+        raw_output = llm_registry.generate(build_mcq_prompt(full_transcript_text), model=MCQ_MODEL)
         return parse_mcq_output(raw_output)
-    except Exception as e:
-        print(f"[Gemini ERROR] Failed to generate MCQs: {e}")
+    except LLMOverloaded:
+        raise
+    except Exception:
+        logger.exception("Failed to generate MCQs")
+        return []
+
+
+async def agenerate_mcqs_from_transcript(full_transcript_text):
+    """Async variant of ``generate_mcqs_from_transcript``."""
+    try:
+        raw_output = await llm_registry.agenerate(build_mcq_prompt(full_transcript_text), model=MCQ_MODEL)
+        return parse_mcq_output(raw_output)
+    except LLMOverloaded:
+        raise
+    except Exception:
+        logger.exception("Failed to generate MCQs")
         return []
 
 import re
@@ -487,7 +684,7 @@ def parse_mcq_output(text):
                 "difficulty": difficulty.group(1).strip() if difficulty else "Intermediate"
             })
         except Exception as e:
-            print(f"[Parse ERROR] Skipped malformed question: {e}")
+            logger.warning(f"Skipped malformed MCQ in model output: {e}")
             continue
 
     return mcq_list
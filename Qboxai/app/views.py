@@ -1,18 +1,17 @@
 
-import io
+import itertools
+import re
+import time
 
 
 
-
-from PIL import Image
-
-
-import google.generativeai as genai
-
 from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from django.core.cache import cache
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
 from rest_framework import status, permissions
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -20,7 +19,8 @@ from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView, UpdateAPIView
 
 # from core.pagination import PreserveQueryParamsPagination
-from .models import ImageModel, NotesModel, QAModel, SessionModel, VideoModel, CourseModel, TranscriptModel
+from . import metrics
+from .models import ImageModel, NotesModel, QAModel, SessionModel, VideoModel, CourseModel, TranscriptModel, IngestionJob
 from .serializers import (
     YoutubeSerializer,
     CreateNoteSerializer,
@@ -34,155 +34,95 @@ from .serializers import (
     VideoSerializer,
     CreateSessionSerializer,
     YoutubeTranscriptSerializer,
+    TranscriptBucketSerializer,
+    TranscriptRangeSerializer,
+    TranscriptSearchSerializer,
     TimestampField,
     ScreenshotRequestSerializer,
     MCQModelSerializer,
 )
-from .utils import check_question_limit,extract_youtube_video_id,get_video_title_with_cache,get_transcript_with_cache,get_transcript_languages_cached
+from .utils import extract_youtube_video_id,get_video_title_with_cache,get_transcript_with_cache,get_or_fetch_best_transcript,transcript_negative_reason,stream_ai_response,generate_ai_response
+from .transcript_index import get_transcript_buckets, transcript_slice, iter_transcript_range
+from .streaming import ndjson_response, sse_completion, sse_response
+from .transcript_search import search_transcripts
+from .ingestion import enqueue_ingestion
+from .llm import llm_registry, VISION_MODEL
+from .llm_limiter import LLMOverloaded
+from .mcq_generation import generate_mcqs
+from .qa_flow import (
+    RequestRejected, AskAnswer, build_ask_prompt, check_ask_limit, check_clip_limit, clip_contents, clip_jpeg,
+    llm_failures, open_session, require_answer, require_title, require_video_id, save_clip, validated,
+)
 
 
 
 
-class AskQuestionAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+class RejectionMixin:
+    """Answers a ``RequestRejected`` raised by the shared qa_flow helpers with its payload."""
 
-    def post(self, request):
-        user = request.user
+    def handle_exception(self, exc):
+        if isinstance(exc, RequestRejected):
+            return Response(exc.payload, status=exc.status_code)
+        return super().handle_exception(exc)
 
-        serializer = YoutubeSerializer(data=request.data)
-        if not serializer.is_valid():
-            return Response({
-                "success": False,
-                "message": "Invalid input data.",
-                "errors": serializer.errors
-            }, status=status.HTTP_400_BAD_REQUEST)
 
-        video_url = serializer.validated_data['youtube_video_url']
-        question = serializer.validated_data['question']
-        time_stamp = int(serializer.validated_data['time_stamp'])
-
-        video_id = extract_youtube_video_id(video_url)
-        if not video_id:
-            return Response({
-                "success": False,
-                "message": "Invalid YouTube URL."
-            }, status=status.HTTP_400_BAD_REQUEST)
+class AskQuestionAPIView(RejectionMixin, APIView):
+    permission_classes = [IsAuthenticated]
 
-        video_title = get_video_title_with_cache(video_id, settings.YOUTUBE_API_KEY)
-        if not video_title:
-            return Response({
-                "success": False,
-                "message": "Could not retrieve video title."
-            }, status=status.HTTP_400_BAD_REQUEST)
+    def post(self, request):
+        request_started = time.monotonic()
+        user = request.user
 
-        video, _ = VideoModel.objects.get_or_create(
-            user=user,
-            youtube_video_id=video_id,
-            defaults={'video_title': video_title, 'video_url': video_url}
+        data = validated(YoutubeSerializer(data=request.data), "Invalid input data.")
+        video_url = data['youtube_video_url']
+        question = data['question']
+        time_stamp = int(data['time_stamp'])
+
+        video_id = require_video_id(video_url)
+        video_title = require_title(get_video_title_with_cache(video_id, settings.YOUTUBE_API_KEY))
+        session, _ = open_session(user, video_id, video_title, video_url)
+        check_ask_limit(user, session)
+
+        # Only the ±60s window is read; the full payload stays deferred.
+        # Falls back to another stored/listed language when the requested one is missing.
+        transcript_obj, _ = get_or_fetch_best_transcript(video_id, data.get('language'), lazy=True)
+        prompt, transcript_segment = build_ask_prompt(
+            transcript_obj, question, time_stamp, video_id, video_title, video_url
         )
 
-        session, created = SessionModel.objects.get_or_create(user=user, video=video)
-        session_status = "New session created" if created else "Session resumed"
-        limit_exceeded, limit_message = check_question_limit(user, session)
-        if limit_exceeded:
-            return Response({
-                "success": False,
-                "message": limit_message,
-                "is_premium": bool(user.is_premium)
-            }, status=status.HTTP_403_FORBIDDEN)
-
-        transcript_source = "model"
-        transcript_obj = TranscriptModel.objects.filter(youtube_video_id=video_id).first()
-        full_transcript = transcript_obj.transcript_data if transcript_obj else None
-
-        if not full_transcript:
-            transcript_data = get_transcript_with_cache(video_id)
-            full_transcript = transcript_data.get("segments") if transcript_data else None
-
-            if full_transcript:
-                TranscriptModel.objects.create(
-                    youtube_video_id=video_id,
-                    language='en',
-                    transcript_data=full_transcript,
-                    transcript_text=transcript_data.get("full_text", "")
-                )
-                transcript_source = "fetched"
-
-        available_lang_names = []
-        if full_transcript:
-            start_range = max(0, time_stamp - 60)
-            end_range = time_stamp + 60
-
-            transcript_segment = " ".join([
-                entry['text'] for entry in full_transcript
-                if start_range <= entry['start'] <= end_range
-            ])
-
-            if not transcript_segment.strip():
-                return Response({
-                    "success": False,
-                    "message": "No transcript data found near the timestamp."
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            prompt = (
-                f"You are a helpful assistant. Based only on the following segment of a YouTube video transcript, "
-                f"which is from around timestamp {time_stamp} seconds, answer the user's question.\n\n"
-                f"Transcript Segment:\n{transcript_segment}\n\n"
-                f"Question: {question}\nAnswer:"
-            )
-        else:
-            available_languages = get_transcript_languages_cached(video_id)
-            available_lang_names = [lang["language_name"] for lang in available_languages]
-
-            prompt = (
-                f"You are a helpful assistant. The user has a question about a YouTube video, but no English transcript is available. "
-                f"Based on the video title and context, do your best to help them.\n\n"
-                f"Video Title: {video_title}\n"
-                f"Video URL: {video_url}\n"
-                f"Timestamp (seconds): {time_stamp}\n"
-                f"User's Question: {question}\n\n"
-                f"Answer:"
-            )
-
-        try:
-            model = genai.GenerativeModel('gemini-1.5-pro')
-            response = model.generate_content(prompt)
-            answer = getattr(response, "text", "").strip()
-            if not answer:
-                return Response({
-                    "success": False,
-                    "message": "Gemini API did not return a valid response."
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except Exception as e:
-            return Response({
-                "success": False,
-                "message": f"Gemini API failed: {str(e)}"
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        qa = QAModel.objects.create(
-            session=session,
-            question=question,
-            answer=answer,
-            time_stamp=time_stamp
+        # ♻️ Same question near the same moment of this video: reuse the stored answer
+        ask = AskAnswer(
+            session, question, time_stamp, video_id,
+            transcript_obj.language if transcript_obj else None, data['use_cache'],
         )
+        answer = ask.lookup()
+
+        if data['stream']:
+            # 🌊 Tokens as Server-Sent Events; the QAModel row is saved once the answer is complete
+            llm_started = time.monotonic()
+            return sse_response(sse_completion(
+                [answer] if ask.cached else stream_ai_response(prompt),
+                request_started, "ask.stream",
+                lambda full_answer: ask.save(full_answer, time.monotonic() - llm_started),
+                meta={'transcript_segment': transcript_segment, 'cached': ask.cached},
+            ))
+
+        generation_seconds = None
+        if not ask.cached:
+            started = time.monotonic()
+            with llm_failures("Gemini API failed"):
+                answer = require_answer(generate_ai_response(prompt))
+            generation_seconds = time.monotonic() - started
 
         return Response({
             "success": True,
             "message": "Q&A created successfully.",
             "data": {
-                'id': qa.id,
-                'question': qa.question,
-                'answer': qa.answer,
-                'transcript_segment': transcript_segment if full_transcript else "Transcript not available.",
-                # 'full_transcript': full_transcript if full_transcript else None,
-                # 'session': session.id,
-                # 'session_status': session_status,
-                # 'time_stamp': qa.time_stamp,
-                # 'created_at': qa.created_at,
-                # 'transcript_source': transcript_source,
-                # 'available_transcript_languages': available_lang_names if not full_transcript else []
+                **ask.save(answer, generation_seconds),
+                'transcript_segment': transcript_segment,
             }
         }, status=status.HTTP_201_CREATED)
+
     def get(self, request):
         video_url = request.query_params.get('youtube_video_url')
         if not video_url:
@@ -276,27 +216,16 @@ class AskQuestionAPIView(APIView):
 
 
 
-class ClipTabAPIView(APIView):
+class ClipTabAPIView(RejectionMixin, APIView):
     permission_classes = [IsAuthenticated]
 
-    def convert_png_to_jpeg(self, uploaded_file):
-        """Convert PNG image to JPEG format for Gemini processing."""
-        image = Image.open(uploaded_file).convert("RGB")  # Remove alpha channel
-        buffer = io.BytesIO()
-        image.save(buffer, format='JPEG', quality=85)
-        return buffer.getvalue()
     def post(self, request):
+        request_started = time.monotonic()
         user = request.user
 
-        serializer = ImageUploadSerializer(data=request.data, context={'request': request})
-        if not serializer.is_valid():
-            return Response({
-                "success": False,
-                "errors": serializer.errors,
-                "message": "Invalid data submitted."
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        data = serializer.validated_data
+        data = validated(
+            ImageUploadSerializer(data=request.data, context={'request': request}), "Invalid data submitted."
+        )
         youtube_url = data['youtube_video_url']
         time_stamp = data['time_stamp']
         image = data['image']
@@ -304,90 +233,38 @@ class ClipTabAPIView(APIView):
         answer = ""
 
         # ✅ Extract video info
-        video_id = extract_youtube_video_id(youtube_url)
-        if not video_id:
-            return Response({
-                "success": False,
-                "message": "Invalid YouTube URL."
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        video_title = get_video_title_with_cache(video_id)
-        if not video_title:
-            return Response({
-                "success": False,
-                "message": "Failed to retrieve video title from YouTube."
-            }, status=status.HTTP_400_BAD_REQUEST)
+        video_id = require_video_id(youtube_url)
+        video_title = require_title(
+            get_video_title_with_cache(video_id), "Failed to retrieve video title from YouTube."
+        )
 
         # ✅ Get or create Video and Session
-        video, _ = VideoModel.objects.get_or_create(
-            youtube_video_id=video_id,
-            user=user,
-            defaults={'video_title': video_title, 'video_url': youtube_url}
-        )
-        session, created = SessionModel.objects.get_or_create(user=user, video=video)
+        session, created = open_session(user, video_id, video_title, youtube_url)
         session_status = "New session created" if created else "Session resumed"
 
         # ✅ Rate Limiting Logic for Free Users
-        if not user.is_premium:
-            total_clips = ImageModel.objects.filter(session__user=user).count()
-            session_clips = ImageModel.objects.filter(session=session).count()
+        check_clip_limit(user, session)
 
-            if total_clips >= 30:
-                return Response({
-                    "success": False,
-                    "message": "You have reached the total limit of 30 image uploads. Upgrade to premium to continue.",
-                    "limit_type": "total",
-                    "is_premium": False
-                }, status=status.HTTP_403_FORBIDDEN)
-
-            if session_clips >= 5:
-                return Response({
-                    "success": False,
-                    "message": "You can only upload 5 images per YouTube video. Please choose another video or upgrade to premium.",
-                    "limit_type": "session",
-                    "is_premium": False
-                }, status=status.HTTP_403_FORBIDDEN)
+        if question and data['stream']:
+            # 🌊 Stream the answer; the ImageModel row is saved once it is complete
+            with llm_failures("Gemini image model processing failed"):
+                image_bytes = clip_jpeg(image)
 
+            return sse_response(sse_completion(
+                stream_ai_response(clip_contents(question, image_bytes), model_name=VISION_MODEL),
+                request_started, "cliptab.stream",
+                lambda full_answer: save_clip(request, session, session_status, image, question, full_answer, time_stamp),
+            ))
 
         if question:
-            try:
-                image_bytes = self.convert_png_to_jpeg(image)
-                mime_type = 'image/jpeg'
-
-                model = genai.GenerativeModel(model_name='models/gemini-1.5-flash')
-                response = model.generate_content([
-                    question,
-                    {"mime_type": mime_type, "data": image_bytes}
-                ])
-                answer = response.text.strip()
-            except Exception as e:
-                return Response({
-                    "success": False,
-                    "message": f"Gemini image model processing failed: {str(e)}"
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            with llm_failures("Gemini image model processing failed"):
+                answer = llm_registry.generate(clip_contents(question, clip_jpeg(image)), model=VISION_MODEL)
 
         # ✅ Save clip
-        clip = ImageModel.objects.create(
-            image=image,
-            question=question,
-            answer=answer,
-            time_stamp=time_stamp,
-            session=session
-        )
-
         return Response({
             "success": True,
             "message": "Image clip created successfully.",
-            "data": {
-                'id': clip.id,
-                'question': clip.question,
-                'answer': clip.answer,
-                'session_id': session.id,
-                'session_status': session_status,
-                'time_stamp': time_stamp,
-                'created_at': clip.created_at,
-                'image_url': request.build_absolute_uri(clip.image.url)
-            }
+            "data": save_clip(request, session, session_status, image, question, answer, time_stamp)
         }, status=status.HTTP_201_CREATED)
 
     def get(self, request):
@@ -946,35 +823,9 @@ class VideoAPIView(APIView):
                 session.is_active = True
                 session.save(update_fields=['is_active', 'last_accessed_at'])
 
-            # 🔍 Fetch transcript object if it exists
-            # 🔍 Fetch transcript object if it exists
-            transcript_obj = TranscriptModel.objects.filter(youtube_video_id=video_id).first()
-            transcript_created = False  # ✅ Initialize to avoid UnboundLocalError
-
-            # ✅ Print existing transcript (if found)
-            if transcript_obj:
-                print("✅ Existing transcript found:")
-                print("Transcript Text Preview:", transcript_obj.transcript_text)  # preview first 200 chars
-            else:
-                print("❌ No transcript found. Fetching from API...")
-
-                # 🧠 Get transcript from external source
-                transcript_data = get_transcript_with_cache(video_id)
-                print("Transcript API Response:", transcript_data)
-
-                if transcript_data:
-                    transcript_obj, transcript_created = TranscriptModel.objects.get_or_create(
-                        youtube_video_id=video_id,
-                        defaults={
-                            'language': 'en',
-                            'transcript_data': transcript_data.get("segments", []),
-                            'transcript_text': transcript_data.get("full_text", "")
-                        }
-                    )
-                    print("✅ Transcript created in DB:", transcript_created)
-                    print("Transcript Text:", transcript_data.get("full_text", ""))  # preview
-                else:
-                    print("❌ No transcript available from API.")
+            # 🔍 Transcript is fetched in the background (run_ingestion_worker) so
+            # later ask/transcript requests find a warm TranscriptModel row
+            queued_jobs = enqueue_ingestion(video_id)
 
             return Response({
                 "status": "success",
@@ -991,7 +842,7 @@ class VideoAPIView(APIView):
                     "video_created": video_created,
                     "session_created": session_created,
                     "session_reactivated": not session_created and session.is_active,
-                    "transcript_created": transcript_created
+                    "transcript_queued": IngestionJob.KIND_TRANSCRIPT in queued_jobs
                 }
             }, status=status.HTTP_201_CREATED if video_created else status.HTTP_200_OK)
 
@@ -1340,6 +1191,9 @@ class CreateSessionAPIView(APIView):
             session, created = SessionModel.objects.get_or_create(user=user, video=video)
             session_status = "New session created" if created else "Session resumed"
 
+            # Warm the transcript in the background before the first question
+            enqueue_ingestion(video_id)
+
             return Response({
                 "success": True,
                 "message": session_status,
@@ -1362,6 +1216,15 @@ class CreateSessionAPIView(APIView):
 class YoutubeTranscriptView(APIView):
     permission_classes = [IsAuthenticated]
     def post(self, request):
+        bucket_serializer = TranscriptBucketSerializer(data=request.query_params)
+        if not bucket_serializer.is_valid():
+            return Response({
+                "success": False,
+                "message": "Invalid bucket size.",
+                "errors": bucket_serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        bucket_minutes = bucket_serializer.validated_data.get('bucket', 5)
+
         serializer = YoutubeTranscriptSerializer(data=request.data)
         if serializer.is_valid():
             user = request.user
@@ -1389,47 +1252,21 @@ class YoutubeTranscriptView(APIView):
             session, created = SessionModel.objects.get_or_create(user=user, video=video)
             session_status = "New session created" if created else "Session resumed"
 
-            # 🟨 Try fetching from DB cache (TranscriptModel)
-            transcript_obj = TranscriptModel.objects.filter(youtube_video_id=video_id).first()
-            full_transcript = transcript_obj.transcript_data if transcript_obj else None
-            transcript_source = "database"
-
-            if not full_transcript:
-                # 🟧 Fallback to yt-dlp or YouTube fetch logic
-                transcript_data = get_transcript_with_cache(video_id)
-                full_transcript = transcript_data.get("segments") if transcript_data else None
-                transcript_source = "fetched"
-
-                if full_transcript:
-                    TranscriptModel.objects.create(
-                        youtube_video_id=video_id,
-                        language='en',
-                        transcript_data=full_transcript,
-                        transcript_text=transcript_data.get("full_text", "")
-                    )
-
-            if not full_transcript:
+            # 🟨 Try the DB first, fetching (once per video and language) on a miss
+            transcript_obj, transcript_source = get_or_fetch_best_transcript(
+                video_id, serializer.validated_data.get('language'), lazy=True
+            )
+
+            # ✅ Precomputed chapter buckets (5 minutes unless ?bucket= says otherwise)
+            formatted_segments = get_transcript_buckets(transcript_obj, bucket_minutes) if transcript_obj else None
+
+            if not formatted_segments:
                 return Response({
                     "success": False,
-                    "message": "Transcript not available in English. Try with a video that has English subtitles."
+                    "message": "No transcript available for this video. Try with a video that has subtitles.",
+                    "reason": transcript_negative_reason(video_id, serializer.validated_data.get('language'))
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # ✅ Segmenting the transcript
-            segment_duration = 300  # 5 minutes
-            segmented_transcripts = {}
-
-            for entry in full_transcript:
-                segment_start = int(entry['start'] // segment_duration) * segment_duration
-                if segment_start not in segmented_transcripts:
-                    segmented_transcripts[segment_start] = []
-                segmented_transcripts[segment_start].append(entry['text'])
-
-            formatted_segments = {
-                f"{start // 60}m - {(start + segment_duration) // 60}m":
-                    " ".join(texts)
-                for start, texts in segmented_transcripts.items()
-            }
-
             return Response({
                 "success": True,
                 "message": f"Transcript split successfully from {transcript_source}.",
@@ -1438,6 +1275,7 @@ class YoutubeTranscriptView(APIView):
                 "session_id": session.id,
                 "session_status": session_status,
                 "transcript_segments": formatted_segments,
+                "transcript_language": transcript_obj.language,
                 "transcript_source": transcript_source  # 🆕 Show where it came from
             }, status=status.HTTP_200_OK)
 
@@ -1460,6 +1298,15 @@ class YoutubeTranscriptView(APIView):
                 "message": "Missing 'youtube_video_url' query parameter."
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        bucket_serializer = TranscriptBucketSerializer(data=request.query_params)
+        if not bucket_serializer.is_valid():
+            return Response({
+                "success": False,
+                "message": "Invalid bucket size.",
+                "errors": bucket_serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        bucket_minutes = bucket_serializer.validated_data.get('bucket', 1)
+
         video_id = extract_youtube_video_id(video_url)
         if not video_id:
             return Response({
@@ -1484,47 +1331,21 @@ class YoutubeTranscriptView(APIView):
         session, created = SessionModel.objects.get_or_create(user=user, video=video)
         session_status = "New session created" if created else "Session resumed"
 
-        # 🔁 Check DB first
-        transcript_obj = TranscriptModel.objects.filter(youtube_video_id=video_id).first()
-        full_transcript = transcript_obj.transcript_data if transcript_obj else None
-        transcript_source = "database"
-
-        if not full_transcript:
-            # ⏬ Try fetching from YouTube
-            transcript_data = get_transcript_with_cache(video_id)
-            full_transcript = transcript_data.get("segments") if transcript_data else None
-            transcript_source = "fetched"
-
-            if full_transcript:
-                TranscriptModel.objects.create(
-                    youtube_video_id=video_id,
-                    language='en',
-                    transcript_data=full_transcript,
-                    transcript_text=transcript_data.get("full_text", "")
-                )
+        # 🔁 Check DB first, fetching (once per video and language) on a miss
+        transcript_obj, transcript_source = get_or_fetch_best_transcript(
+            video_id, request.query_params.get('language'), lazy=True
+        )
+
+        # Precomputed chapter buckets (1 minute unless ?bucket= says otherwise)
+        formatted_segments = get_transcript_buckets(transcript_obj, bucket_minutes) if transcript_obj else None
 
-        if not full_transcript:
+        if not formatted_segments:
             return Response({
                 "success": False,
-                "message": "Transcript not available in English. Try with a video that has English subtitles."
+                "message": "No transcript available for this video. Try with a video that has subtitles.",
+                "reason": transcript_negative_reason(video_id, request.query_params.get('language'))
             }, status=status.HTTP_400_BAD_REQUEST)
 
-
-        segment_duration = 60
-        segmented_transcripts = {}
-
-        for entry in full_transcript:
-            segment_start = int(entry['start'] // segment_duration) * segment_duration
-            if segment_start not in segmented_transcripts:
-                segmented_transcripts[segment_start] = []
-            segmented_transcripts[segment_start].append(entry['text'])
-
-        formatted_segments = {
-            f"{start // 60}m - {(start + segment_duration) // 60}m":
-                " ".join(texts)
-            for start, texts in segmented_transcripts.items()
-        }
-
         return Response({
             "success": True,
             "message": f"Transcript split successfully from {transcript_source}.",
@@ -1533,8 +1354,106 @@ class YoutubeTranscriptView(APIView):
             # "session_id": session.id,
             # "session_status": session_status,
             "transcript_segments": formatted_segments,
+            "transcript_language": transcript_obj.language,
             "transcript_source": transcript_source
         }, status=status.HTTP_200_OK)
+
+
+class TranscriptRangeAPIView(APIView):
+    """
+    A slice of a video's transcript: segments starting in ``[start, end]``
+    seconds, paged with ``cursor``/``limit``. With ``?stream=1`` the whole
+    range is streamed as NDJSON (gzip when accepted) so clients can render the
+    first segments before the rest is read.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @method_decorator(gzip_page)
+    def get(self, request, video_id):
+        serializer = TranscriptRangeSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({
+                "success": False,
+                "message": "Invalid range parameters.",
+                "errors": serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+
+        if not re.fullmatch(r'[0-9A-Za-z_-]{11}', video_id):
+            return Response({
+                "success": False,
+                "message": "Invalid YouTube video id."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 🟨 Stored transcript (or fetched once on a miss); payload columns stay deferred
+        transcript_obj, _ = get_or_fetch_best_transcript(video_id, params.get('language'), lazy=True)
+        if not transcript_obj:
+            return Response({
+                "success": False,
+                "message": "No transcript available for this video. Try with a video that has subtitles.",
+                "reason": transcript_negative_reason(video_id, params.get('language'))
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        start, end, cursor = params.get('start'), params.get('end'), params['cursor']
+
+        if params['stream']:
+            # 🌊 Header line, then one line per segment as rows are read
+            metrics.incr("transcript_range.stream")
+            header = {
+                "video_id": video_id,
+                "language": transcript_obj.language,
+                "segment_count": transcript_obj.segment_count,
+            }
+            records = itertools.chain(
+                [header],
+                iter_transcript_range(transcript_obj, start, end, cursor),
+            )
+            return ndjson_response(
+                request, records, batch_size=getattr(settings, 'TRANSCRIPT_STREAM_BATCH_SIZE', 200)
+            )
+
+        metrics.incr("transcript_range.page")
+        segments, next_cursor = transcript_slice(transcript_obj, start, end, cursor, params['limit'])
+        return Response({
+            "success": True,
+            "video_id": video_id,
+            "transcript_language": transcript_obj.language,
+            "segments": segments,
+            "next_cursor": next_cursor
+        }, status=status.HTTP_200_OK)
+
+class TranscriptSearchAPIView(APIView):
+    """Full-text search over the transcripts of the caller's videos, ranked, with timestamps and snippets."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = TranscriptSearchSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({
+                "success": False,
+                "message": "Invalid search query.",
+                "errors": serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 🔎 Ranked segment hits, grouped per video
+        results = search_transcripts(
+            serializer.validated_data['q'], request.user, limit=serializer.validated_data['limit']
+        )
+        # Any user's row will do: a video can be searchable through a session on someone else's VideoModel
+        titles = dict(
+            VideoModel.objects.filter(youtube_video_id__in=[r["video_id"] for r in results])
+            .exclude(video_title='')
+            .values_list('youtube_video_id', 'video_title')
+        )
+        for result in results:
+            result["video_title"] = titles.get(result["video_id"], "")
+
+        return Response({
+            "success": True,
+            "message": f"{len(results)} video(s) matched.",
+            "results": results
+        }, status=status.HTTP_200_OK)
+
 from rest_framework.generics import ListAPIView
 from .models import TranscriptModel
 from .serializers import TranscriptSerializer
@@ -1629,21 +1548,21 @@ from rest_framework import status
 from django.conf import settings
 import logging
 
-from .models import VideoModel, SessionModel, TranscriptModel, MCQModel,MCQSubmission
-from .serializers import MCQModelSerializer
+from .models import VideoModel, SessionModel, TranscriptModel, MCQModel,MCQSubmission, MCQGenerationJob
+from .serializers import MCQModelSerializer, MCQGenerationJobSerializer
+from .mcq_bank import draw_mcqs, top_up_bank
+from .mcq_jobs import async_requested, enqueue_mcq_job, mcq_payload
 from .utils import (
     extract_youtube_video_id,
     get_video_title_with_cache,
     get_transcript_with_cache,
+    get_or_fetch_best_transcript,
     classify_question_type,
     generate_mcqs_from_transcript,  # your new logic
 )
 
 logger = logging.getLogger(__name__)
 
-ALLOWED_DIFFICULTIES = {"Beginner", "Intermediate", "Advanced", "Expert"}
-
-
 class GenerateMCQsAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -1652,7 +1571,7 @@ class GenerateMCQsAPIView(APIView):
         youtube_url = request.data.get("youtube_url")
 
         if not youtube_url:
-            return Response({"detail": "youtube_url is required."}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"success": False, "message": "youtube_url is required."}, status=status.HTTP_400_BAD_REQUEST)
 
         video_id = extract_youtube_video_id(youtube_url)
         if not video_id:
@@ -1669,74 +1588,63 @@ class GenerateMCQsAPIView(APIView):
         )
         session, _ = SessionModel.objects.get_or_create(user=user, video=video)
 
-        transcript_obj = TranscriptModel.objects.filter(youtube_video_id=video_id).first()
-        full_transcript = transcript_obj.transcript_text if transcript_obj else None
-
-        if not full_transcript:
-            try:
-                transcript_data = get_transcript_with_cache(video_id)
-                full_transcript = transcript_data.get("full_text")
-                segments = transcript_data.get("segments")
-
-                if full_transcript and segments:
-                    TranscriptModel.objects.create(
-                        youtube_video_id=video_id,
-                        language='en',
-                        transcript_data=segments,
-                        transcript_text=full_transcript
-                    )
-            except Exception:
-                logger.exception("Transcript fetch failed.")
-                return Response({"error": "Transcript fetch failed."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        if not full_transcript:
+        try:
+            transcript_obj, _ = get_or_fetch_best_transcript(video_id, request.data.get("language"))
+        except Exception:
+            logger.exception("Transcript fetch failed.")
+            return Response({"success": False, "message": "Transcript fetch failed."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if not transcript_obj or not transcript_obj.get_text():
             return Response({
                 "success": False,
                 "message": "No transcript data found for this video."
             }, status=status.HTTP_404_NOT_FOUND)
+        # The bank holds questions per transcript, which may be a fallback language
+        language = transcript_obj.language
+
+        # 🏦 Popular videos are served from the shared question bank without an LLM call
+        saved_mcqs = draw_mcqs(session, language)
+        if saved_mcqs:
+            return Response(mcq_payload(
+                video_id, f"{len(saved_mcqs)} MCQs drawn from the question bank.",
+                MCQModelSerializer(saved_mcqs, many=True).data,
+            ), status=status.HTTP_201_CREATED)
+
+        if async_requested(request.data):
+            # ⏳ Generated by run_mcq_worker; the client polls the job's status_url for progress and the MCQs
+            job, created = enqueue_mcq_job(session, language)
+            return Response(mcq_payload(
+                video_id, "MCQ generation queued." if created else "MCQ generation already in progress.",
+                job=job, status_url=request.build_absolute_uri(reverse('mcq-job-status', args=[job.id])),
+            ), status=status.HTTP_202_ACCEPTED)
 
         try:
-            mcqs = generate_mcqs_from_transcript(full_transcript)
-            if not mcqs:
-                return Response({"detail": "Parsing Gemini response failed."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            top_up_bank(video_id, language, lambda: generate_mcqs(transcript_obj))
+        except LLMOverloaded:
+            raise
         except Exception:
             logger.exception("MCQ generation failed")
-            return Response({"detail": "Failed to generate MCQs."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        saved_mcqs = []
-        for mcq in mcqs:
-            question = mcq.get("question")
-            options = mcq.get("options", {})
-            correct_answer = mcq.get("correct_answer")
-            explanation = mcq.get("explanation", "")
-            difficulty = mcq.get("difficulty", "").capitalize()
-
-            if difficulty not in ALLOWED_DIFFICULTIES:
-                difficulty = "Intermediate"
-
-            # ✅ Validate MCQ format before saving
-            if question and len(options) == 4 and all(k in options for k in ["A", "B", "C", "D"]) and correct_answer:
-                question_type = classify_question_type(question)
-                saved = MCQModel.objects.create(
-                    session=session,
-                    question_text=question,
-                    option_a=options.get("A", ""),
-                    option_b=options.get("B", ""),
-                    option_c=options.get("C", ""),
-                    option_d=options.get("D", ""),
-                    correct_option=correct_answer,
-                    explanation=explanation,
-                    difficulty=difficulty,
-                    question_type=question_type,
-                )
-                saved_mcqs.append(saved)
-        serializer = MCQModelSerializer(saved_mcqs, many=True)
+            return Response({"success": False, "message": "Failed to generate MCQs."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        saved_mcqs = draw_mcqs(session, language, minimum=1)
+        if not saved_mcqs:
+            return Response({"success": False, "message": "Parsing Gemini response failed."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(mcq_payload(
+            video_id, f"{len(saved_mcqs)} MCQs generated successfully.",
+            MCQModelSerializer(saved_mcqs, many=True).data,
+        ), status=status.HTTP_201_CREATED)
+
+
+class MCQJobStatusAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(
+            MCQGenerationJob.objects.select_related('session__video'), pk=job_id, session__user=request.user
+        )
         return Response({
-            "video_id": video_id,
             "success": True,
-            "message": f"{len(saved_mcqs)} MCQs generated successfully.",
-            "mcqs": serializer.data
-        }, status=status.HTTP_201_CREATED)
+            "data": MCQGenerationJobSerializer(job).data
+        }, status=status.HTTP_200_OK)
 
 
 # from django.shortcuts import get_object_or_404
@@ -1885,3 +1793,17 @@ class SubmitMCQAnswersAPIView(APIView):
             "message": "Answers submitted successfully.",
             "results": results
         }, status=status.HTTP_200_OK)
+
+
+from rest_framework.permissions import IsAdminUser
+
+
+class MetricsAPIView(APIView):
+    """Per-worker cache and timing counters for operators."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "success": True,
+            "data": metrics.snapshot()
+        }, status=status.HTTP_200_OK)
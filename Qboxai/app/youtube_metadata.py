@@ -0,0 +1,137 @@
+import logging
+import re
+import threading
+
+from django.conf import settings
+from googleapiclient.discovery import build
+
+from . import metrics
+from .cache import video_metadata_cache, video_title_cache
+from .models import VideoModel
+from .negative_cache import negative_cache, KIND_VIDEO, REASON_VIDEO_UNAVAILABLE
+
+logger = logging.getLogger(__name__)
+
+# videos.list accepts at most 50 ids per call
+MAX_IDS_PER_CALL = 50
+PARTS = "snippet,contentDetails"
+FIELDS = "items(id,snippet/title,contentDetails/duration)"
+
+_duration_re = re.compile(
+    r'^P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+    r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$'
+)
+_duration_units = {'weeks': 604800, 'days': 86400, 'hours': 3600, 'minutes': 60, 'seconds': 1}
+
+
+def parse_duration(value):
+    """Seconds in an ISO 8601 duration such as ``PT1H2M3S``; None for blanks, live streams (``P0D``) and bad input."""
+    match = _duration_re.match(value or "")
+    if not match:
+        return None
+    seconds = sum(float(amount) * _duration_units[unit] for unit, amount in match.groupdict().items() if amount)
+    return int(seconds) or None
+
+
+class YouTubeMetadataClient:
+    """
+    YouTube Data API ``videos.list`` client that builds the discovery client once
+    per thread (httplib2 connections are not thread-safe) and asks for title and
+    duration of up to 50 videos per call.
+    """
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self._local = threading.local()
+
+    def _service(self, api_key):
+        services = getattr(self._local, 'services', None)
+        if services is None:
+            services = self._local.services = {}
+        if api_key not in services:
+            services[api_key] = build('youtube', 'v3', developerKey=api_key, cache_discovery=False)
+        return services[api_key]
+
+    def fetch(self, video_ids, api_key=None):
+        """
+        ``{video_id: {"title", "duration_seconds"}}`` for the ids YouTube returns.
+        Ids missing from the result are deleted, private or mistyped. API errors
+        (quota, network) are raised.
+        """
+        service = self._service(api_key or self.api_key)
+        found = {}
+        for i in range(0, len(video_ids), MAX_IDS_PER_CALL):
+            batch = video_ids[i:i + MAX_IDS_PER_CALL]
+            with metrics.timer("youtube_metadata.videos_list"):
+                response = service.videos().list(part=PARTS, id=",".join(batch), fields=FIELDS,
+                                                 maxResults=MAX_IDS_PER_CALL).execute()
+            metrics.incr("youtube_metadata.calls")
+            for item in response.get('items', []):
+                found[item['id']] = {
+                    "title": item.get('snippet', {}).get('title'),
+                    "duration_seconds": parse_duration(item.get('contentDetails', {}).get('duration')),
+                }
+        return found
+
+
+youtube_metadata_client = YouTubeMetadataClient(getattr(settings, 'YOUTUBE_API_KEY', None))
+
+
+def get_video_metadata(video_ids, youtube_api_key=None):
+    """
+    Metadata for ``video_ids`` from the cache, fetching the misses in batches.
+    Fetched titles also warm ``video_title_cache``; ids the API does not return
+    are recorded in the negative cache as unavailable. Returns only the ids
+    that have metadata; API errors are raised.
+    """
+    result = {}
+    missing = []
+    for video_id in dict.fromkeys(video_ids):
+        metadata = video_metadata_cache.get(video_id)
+        if metadata:
+            result[video_id] = metadata
+        elif not negative_cache.get(video_id, KIND_VIDEO):
+            missing.append(video_id)
+
+    if not missing:
+        return result
+
+    fetched = youtube_metadata_client.fetch(missing, youtube_api_key)
+    for video_id in missing:
+        metadata = fetched.get(video_id)
+        if metadata is None:
+            negative_cache.set(video_id, KIND_VIDEO, REASON_VIDEO_UNAVAILABLE)
+            continue
+        video_metadata_cache.set(video_id, metadata)
+        if metadata["title"]:
+            video_title_cache.set(video_id, metadata["title"])
+        result[video_id] = metadata
+    return result
+
+
+def apply_video_metadata(metadata_by_id, overwrite=False):
+    """
+    Copy fetched title and duration onto every VideoModel row for those videos
+    (one row per user) with a single bulk_update. Only blank fields are filled
+    unless ``overwrite``. Returns the number of rows changed.
+    """
+    changed = []
+    rows = (
+        VideoModel.objects.filter(youtube_video_id__in=list(metadata_by_id))
+        .only('id', 'youtube_video_id', 'video_title', 'duration_seconds')
+    )
+    for video in rows:
+        metadata = metadata_by_id[video.youtube_video_id]
+        dirty = False
+        if metadata["title"] and (overwrite or not video.video_title) and video.video_title != metadata["title"]:
+            video.video_title = metadata["title"][:255]
+            dirty = True
+        if metadata["duration_seconds"] and (overwrite or video.duration_seconds is None) \
+                and video.duration_seconds != metadata["duration_seconds"]:
+            video.duration_seconds = metadata["duration_seconds"]
+            dirty = True
+        if dirty:
+            changed.append(video)
+    # bulk_update leaves last_accessed_at (auto_now) alone, so list ordering is unaffected
+    VideoModel.objects.bulk_update(changed, ['video_title', 'duration_seconds'], batch_size=500)
+    return len(changed)
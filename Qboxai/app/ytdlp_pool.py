@@ -0,0 +1,195 @@
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import metrics
+from .cache import TwoTierCache
+from .negative_cache import REASON_PROVIDER_ERROR, REASON_VIDEO_UNAVAILABLE
+from .ytdlp_worker import extract_info, warm_up
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = getattr(settings, 'YTDLP_MAX_WORKERS', 2)
+MAX_PENDING = getattr(settings, 'YTDLP_MAX_PENDING', 8)
+# Hard limit inside the worker process; the job is abandoned after this long
+JOB_DEADLINE = getattr(settings, 'YTDLP_JOB_DEADLINE', 30.0)
+# How long a request thread waits for a result before falling back
+WAIT_TIMEOUT = getattr(settings, 'YTDLP_WAIT_TIMEOUT', 10.0)
+SOCKET_TIMEOUT = getattr(settings, 'YTDLP_SOCKET_TIMEOUT', 10.0)
+
+# Caption URLs in the info are signed and expire after a few hours
+ytdlp_info_cache = TwoTierCache(
+    "ytdlp_info",
+    max_entries=getattr(settings, 'YTDLP_CACHE_MAX_ENTRIES', 1024),
+    ttl=getattr(settings, 'YTDLP_CACHE_TTL', 60 * 60),
+)
+
+
+class YtDlpPool:
+    """
+    yt-dlp ``extract_info`` on a small pool of spawned processes, so extraction
+    CPU and stalls stay out of the web worker.
+
+    At most ``max_workers`` extractions run at once and at most ``max_pending``
+    are queued or running; beyond that callers get an immediate miss instead of
+    queueing. Each job is killed by a timer in the worker after ``job_deadline``.
+    Callers wait up to ``wait_timeout`` and then fall back, while the job keeps
+    running and its result is cached for the next request. Concurrent requests
+    for one video share a single job.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING, job_deadline=JOB_DEADLINE,
+                 wait_timeout=WAIT_TIMEOUT, socket_timeout=SOCKET_TIMEOUT, worker=extract_info,
+                 max_tasks_per_child=50):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.job_deadline = job_deadline
+        self.wait_timeout = wait_timeout
+        self.socket_timeout = socket_timeout
+        self.worker = worker
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "coalesced": 0, "rejected": 0, "timeouts": 0, "errors": 0, "pool_restarts": 0}
+        metrics.register_provider("ytdlp_pool", self.stats)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                # spawn, not fork: the web process has threads, sockets and DB connections
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=warm_up,
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+        return self._executor
+
+    def _reset_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self._stats["pool_restarts"] += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.warning("yt-dlp process pool broke; a new one will be started on the next job")
+
+    def _submit(self, video_id):
+        """The in-flight future for the video, a new one, or None when the pool is saturated."""
+        with self._lock:
+            future = self._inflight.get(video_id)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future
+            if len(self._inflight) >= self.max_pending:
+                self._stats["rejected"] += 1
+                metrics.incr("ytdlp_pool.rejected")
+                return None
+            executor = self._get_executor()
+            try:
+                future = executor.submit(self.worker, video_id, self.job_deadline, self.socket_timeout)
+            except BrokenProcessPool:
+                self._executor = None
+                self._stats["pool_restarts"] += 1
+                executor = self._get_executor()
+                future = executor.submit(self.worker, video_id, self.job_deadline, self.socket_timeout)
+            self._inflight[video_id] = future
+            self._stats["submitted"] += 1
+        future.add_done_callback(partial(self._done, video_id, executor))
+        return future
+
+    def _done(self, video_id, executor, future):
+        with self._lock:
+            if self._inflight.get(video_id) is future:
+                del self._inflight[video_id]
+        if future.cancelled():
+            return
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._reset_executor(executor)
+            return
+        if error is None and not future.result().get('error'):
+            # Cached here so a result that arrives after every caller gave up is still used
+            ytdlp_info_cache.set(video_id, future.result())
+
+    def _interpret(self, video_id, result):
+        if result.get('error'):
+            with self._lock:
+                self._stats["timeouts" if result.get('timeout') else "errors"] += 1
+            logger.warning(f"yt-dlp extraction failed for {video_id}: {result['error']}")
+            return None, REASON_VIDEO_UNAVAILABLE if result.get('unavailable') else REASON_PROVIDER_ERROR
+        return result, None
+
+    def extract_or_reason(self, video_id, timeout=None):
+        """``(info, None)`` or ``(None, reason)``; waits at most ``timeout`` (default ``wait_timeout``)."""
+        info = ytdlp_info_cache.get(video_id)
+        if info:
+            return info, None
+
+        future = self._submit(video_id)
+        if future is None:
+            return None, REASON_PROVIDER_ERROR
+        try:
+            with metrics.timer("ytdlp_pool.wait"):
+                result = future.result(timeout=self.wait_timeout if timeout is None else timeout)
+        except FuturesTimeout:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            return None, REASON_PROVIDER_ERROR
+        except Exception as e:
+            logger.warning(f"yt-dlp job for {video_id} failed: {e}")
+            return None, REASON_PROVIDER_ERROR
+        return self._interpret(video_id, result)
+
+    async def aextract_or_reason(self, video_id, timeout=None):
+        """Async variant for the ASGI views; the event loop is never blocked on the pool."""
+        # A local-tier miss reads the shared cache backend, so do it off the event loop
+        info = await sync_to_async(ytdlp_info_cache.get, thread_sensitive=False)(video_id)
+        if info:
+            return info, None
+
+        future = self._submit(video_id)
+        if future is None:
+            return None, REASON_PROVIDER_ERROR
+        try:
+            # shield: one caller timing out must not cancel the job other callers share
+            result = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                self.wait_timeout if timeout is None else timeout,
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            return None, REASON_PROVIDER_ERROR
+        except Exception as e:
+            logger.warning(f"yt-dlp job for {video_id} failed: {e}")
+            return None, REASON_PROVIDER_ERROR
+        return self._interpret(video_id, result)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def extract(self, video_id, timeout=None):
+        return self.extract_or_reason(video_id, timeout)[0]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["inflight"] = len(self._inflight)
+        stats["max_workers"] = self.max_workers
+        stats["max_pending"] = self.max_pending
+        return stats
+
+
+ytdlp_pool = YtDlpPool()
+atexit.register(ytdlp_pool.shutdown)
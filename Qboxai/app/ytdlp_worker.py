@@ -0,0 +1,82 @@
+"""
+Runs inside the yt-dlp worker processes (see app/ytdlp_pool.py). Kept free of
+Django imports so spawned workers start quickly and never touch the database.
+"""
+import signal
+
+UNAVAILABLE_MARKERS = ("Video unavailable", "Private video", "This video has been removed", "is not a valid URL")
+
+
+class ExtractionTimeout(BaseException):
+    """
+    Raised by the SIGALRM handler. A BaseException so yt-dlp's own
+    ``except Exception`` handlers (which wrap errors in DownloadError and may
+    retry) let it through to ``extract_info``.
+    """
+
+
+def _on_alarm(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _wrapped_timeout(error):
+    """True when a yt-dlp error (``exc_info``) or exception chain carries an ExtractionTimeout."""
+    exc_info = getattr(error, 'exc_info', None)
+    if exc_info and isinstance(exc_info[1], ExtractionTimeout):
+        return True
+    cause = error.__cause__ or error.__context__
+    return cause is not None and (isinstance(cause, ExtractionTimeout) or _wrapped_timeout(cause))
+
+
+def warm_up():
+    """Pool initializer: pay the yt-dlp import once per worker, not on the first job."""
+    import yt_dlp  # noqa: F401
+
+
+def _vtt_tracks(tracks):
+    return {
+        language: [{'ext': fmt['ext'], 'url': fmt['url']} for fmt in formats if fmt.get('ext') == 'vtt']
+        for language, formats in (tracks or {}).items()
+    }
+
+
+def extract_info(video_id, deadline, socket_timeout):
+    """
+    ``extract_info(download=False)`` for a video, trimmed to what the app uses
+    (title, duration and the WebVTT caption URLs) so little is pickled back.
+    A SIGALRM timer enforces ``deadline``; errors come back as
+    ``{"error": ..., "unavailable": bool}`` instead of being raised, since
+    yt-dlp exceptions do not always survive pickling.
+    """
+    from yt_dlp import YoutubeDL
+
+    has_alarm = hasattr(signal, 'SIGALRM')
+    if has_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, deadline)
+    try:
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': True,
+            'socket_timeout': socket_timeout,
+        }
+        with YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+        return {
+            'id': info.get('id', video_id),
+            'title': info.get('title'),
+            'duration': info.get('duration'),
+            'subtitles': _vtt_tracks(info.get('subtitles')),
+            'automatic_captions': _vtt_tracks(info.get('automatic_captions')),
+        }
+    except ExtractionTimeout:
+        return {'error': f"extraction exceeded {deadline}s", 'unavailable': False, 'timeout': True}
+    except Exception as e:
+        if _wrapped_timeout(e):
+            return {'error': f"extraction exceeded {deadline}s", 'unavailable': False, 'timeout': True}
+        message = str(e) or e.__class__.__name__
+        return {'error': message, 'unavailable': any(marker in message for marker in UNAVAILABLE_MARKERS)}
+    finally:
+        if has_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
@@ -295,20 +295,139 @@ RAPIDAPI_KEY = env("RAPIDAPI_KEY")
 RAPIDAPI_HOST = env("RAPIDAPI_HOST", default="youtube-transcripts.p.rapidapi.com")
 
 
-#
-#
-#
-# CACHES = {
-#     "default": {
-#         "BACKEND": "django_redis.cache.RedisCache",
-#         "LOCATION": "redis://127.0.0.1:6379/1",  # Change to AWS ElastiCache endpoint if using in production
-#         "OPTIONS": {
-#             "CLIENT_CLASS": "django_redis.client.DefaultClient",
-#             "SERIALIZER": "django_redis.serializers.json.JSONSerializer",  # Optional: readable cache format
-#             # "PASSWORD": "your_redis_password",  # If Redis is password protected
-#         }
-#     }
-# }
+# Shared cache tier. Set CACHE_URL=rediscache://127.0.0.1:6379/1 (or the
+# ElastiCache endpoint) in production so every worker sees the same entries;
+# the default keeps a per-process locmem cache for local development.
+CACHES = {
+    "default": env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# In-process LRU tier in front of CACHES (see app/cache.py)
+TRANSCRIPT_CACHE_MAX_ENTRIES = env.int('TRANSCRIPT_CACHE_MAX_ENTRIES', default=128)
+TRANSCRIPT_CACHE_TTL = env.int('TRANSCRIPT_CACHE_TTL', default=60 * 60 * 24)
+VIDEO_TITLE_CACHE_MAX_ENTRIES = env.int('VIDEO_TITLE_CACHE_MAX_ENTRIES', default=4096)
+VIDEO_TITLE_CACHE_TTL = env.int('VIDEO_TITLE_CACHE_TTL', default=60 * 60 * 24)
+TRANSCRIPT_LANGUAGES_CACHE_MAX_ENTRIES = env.int('TRANSCRIPT_LANGUAGES_CACHE_MAX_ENTRIES', default=4096)
+TRANSCRIPT_LANGUAGES_CACHE_TTL = env.int('TRANSCRIPT_LANGUAGES_CACHE_TTL', default=60 * 60 * 24)
+
+# Remembered "no transcript" / "no metadata" results (app/negative_cache.py).
+# Provider errors use the shorter TTL since they are often transient.
+NEGATIVE_CACHE_MAX_ENTRIES = env.int('NEGATIVE_CACHE_MAX_ENTRIES', default=8192)
+NEGATIVE_CACHE_TTL = env.int('NEGATIVE_CACHE_TTL', default=60 * 60)
+NEGATIVE_CACHE_ERROR_TTL = env.int('NEGATIVE_CACHE_ERROR_TTL', default=5 * 60)
+
+# Write one TranscriptSegment row per segment at ingest so windows are SQL range reads
+TRANSCRIPT_SEGMENT_TABLE = env.bool('TRANSCRIPT_SEGMENT_TABLE', default=True)
+
+# Store new transcripts as a compressed CompactTranscript blob instead of the
+# JSON segment list and full-text column (zstd when the `zstandard` package is installed, else zlib)
+TRANSCRIPT_COMPACT_STORAGE = env.bool('TRANSCRIPT_COMPACT_STORAGE', default=False)
+
+# Transcripts are stored per (video, language). Requests without a language get
+# the default; ingestion fetches each of TRANSCRIPT_INGEST_LANGUAGES the video has.
+TRANSCRIPT_DEFAULT_LANGUAGE = env.str('TRANSCRIPT_DEFAULT_LANGUAGE', default='en')
+TRANSCRIPT_INGEST_LANGUAGES = env.list('TRANSCRIPT_INGEST_LANGUAGES', default=['en'])
+
+# Transcript provider chain (app/transcript_providers.py), tried in this order.
+# The next provider is started alongside a slow one after TRANSCRIPT_HEDGE_AFTER
+# seconds; a provider's breaker opens after TRANSCRIPT_BREAKER_THRESHOLD
+# consecutive errors and is retried after TRANSCRIPT_BREAKER_COOLDOWN seconds.
+TRANSCRIPT_PROVIDERS = env.list('TRANSCRIPT_PROVIDERS', default=['rapidapi', 'youtube_transcript_api', 'ytdlp'])
+TRANSCRIPT_HEDGE_AFTER = env.float('TRANSCRIPT_HEDGE_AFTER', default=3.0)
+TRANSCRIPT_FETCH_DEADLINE = env.float('TRANSCRIPT_FETCH_DEADLINE', default=25.0)
+TRANSCRIPT_BREAKER_THRESHOLD = env.int('TRANSCRIPT_BREAKER_THRESHOLD', default=5)
+TRANSCRIPT_BREAKER_COOLDOWN = env.float('TRANSCRIPT_BREAKER_COOLDOWN', default=30.0)
+
+# /app/transcripts/<video_id>/segments/: largest page a client may ask for,
+# and how many NDJSON lines are flushed together in ?stream=1 mode
+TRANSCRIPT_RANGE_MAX_LIMIT = env.int('TRANSCRIPT_RANGE_MAX_LIMIT', default=1000)
+TRANSCRIPT_STREAM_BATCH_SIZE = env.int('TRANSCRIPT_STREAM_BATCH_SIZE', default=200)
+
+# /app/transcripts/search/: words of context around each hit in the snippets
+TRANSCRIPT_SEARCH_SNIPPET_WORDS = env.int('TRANSCRIPT_SEARCH_SNIPPET_WORDS', default=12)
+
+# yt-dlp extraction (app/ytdlp_pool.py) runs on a per-web-worker process pool.
+# YTDLP_MAX_WORKERS extractions run at once and at most YTDLP_MAX_PENDING are
+# queued or running (more are refused). A job is killed after
+# YTDLP_JOB_DEADLINE seconds; request threads wait YTDLP_WAIT_TIMEOUT seconds.
+YTDLP_MAX_WORKERS = env.int('YTDLP_MAX_WORKERS', default=2)
+YTDLP_MAX_PENDING = env.int('YTDLP_MAX_PENDING', default=8)
+YTDLP_JOB_DEADLINE = env.float('YTDLP_JOB_DEADLINE', default=30.0)
+YTDLP_WAIT_TIMEOUT = env.float('YTDLP_WAIT_TIMEOUT', default=10.0)
+YTDLP_SOCKET_TIMEOUT = env.float('YTDLP_SOCKET_TIMEOUT', default=10.0)
+YTDLP_CACHE_TTL = env.int('YTDLP_CACHE_TTL', default=60 * 60)
+
+# Shared answers for /app/ask-question/ (app/answer_cache.py), keyed by video,
+# transcript language, ANSWER_CACHE_BUCKET_SECONDS-wide timestamp bucket and
+# normalized question. Clients can send "use_cache": false to bypass it.
+ANSWER_CACHE_ENABLED = env.bool('ANSWER_CACHE_ENABLED', default=True)
+ANSWER_CACHE_BUCKET_SECONDS = env.int('ANSWER_CACHE_BUCKET_SECONDS', default=30)
+ANSWER_CACHE_TTL = env.int('ANSWER_CACHE_TTL', default=60 * 60 * 24)
+ANSWER_CACHE_MAX_ENTRIES = env.int('ANSWER_CACHE_MAX_ENTRIES', default=4096)
+
+# Ask-question context (app/retrieval.py): besides the ±60s window, up to
+# RETRIEVAL_TOP_K RETRIEVAL_CHUNK_SECONDS-long chunks ranked by BM25 against
+# the question, while the transcript context stays under the token budget
+RETRIEVAL_CHUNK_SECONDS = env.int('RETRIEVAL_CHUNK_SECONDS', default=30)
+RETRIEVAL_TOP_K = env.int('RETRIEVAL_TOP_K', default=4)
+RETRIEVAL_CONTEXT_TOKEN_BUDGET = env.int('RETRIEVAL_CONTEXT_TOKEN_BUDGET', default=1500)
+
+# Gemini models (app/llm.py). Model handles are built once per process and
+# reused; LLM_TRANSPORT picks 'grpc' or 'rest' (unset = library default)
+LLM_DEFAULT_MODEL = env('LLM_DEFAULT_MODEL', default='gemini-1.5-pro')
+LLM_VISION_MODEL = env('LLM_VISION_MODEL', default='models/gemini-1.5-flash')
+LLM_MCQ_MODEL = env('LLM_MCQ_MODEL', default='models/gemini-1.5-flash-latest')
+LLM_TRANSPORT = env('LLM_TRANSPORT', default=None)
+
+# Gemini call limits (app/llm_limiter.py), shared by all workers through
+# CACHES. Per model: LLM_RATE_LIMITS requests per minute, with bursts of up to
+# LLM_DEFAULT_BURST, and LLM_CONCURRENCY_LIMITS calls in flight, given as
+# "model=value;model=value" (other models use the LLM_DEFAULT_* values). Up to
+# LLM_MAX_QUEUE requests per worker wait at most LLM_MAX_WAIT seconds for a
+# slot; the rest get a 503 with Retry-After. Held slots are renewed every
+# LLM_SLOT_LEASE / 3 seconds and expire LLM_SLOT_LEASE seconds after a worker dies.
+LLM_DEFAULT_RPM = env.int('LLM_DEFAULT_RPM', default=60)
+LLM_DEFAULT_BURST = env.int('LLM_DEFAULT_BURST', default=5)
+LLM_DEFAULT_CONCURRENCY = env.int('LLM_DEFAULT_CONCURRENCY', default=8)
+LLM_RATE_LIMITS = env.dict('LLM_RATE_LIMITS', cast={'value': int}, default={})
+LLM_CONCURRENCY_LIMITS = env.dict('LLM_CONCURRENCY_LIMITS', cast={'value': int}, default={})
+LLM_MAX_QUEUE = env.int('LLM_MAX_QUEUE', default=16)
+LLM_MAX_WAIT = env.float('LLM_MAX_WAIT', default=20.0)
+LLM_SLOT_LEASE = env.int('LLM_SLOT_LEASE', default=120)
+
+# MCQ generation (app/mcq_generation.py): transcripts spanning at least
+# MCQ_CHUNKED_MIN_SECONDS are split into MCQ_CHUNK_SECONDS-long parts (longer
+# videos merge neighbouring parts into MCQ_MAX_CHUNKS) that are prompted
+# MCQ_PARALLEL_CHUNKS at a time (never more than the MCQ model's concurrency
+# limit); near-duplicate questions above MCQ_DUPLICATE_SIMILARITY word overlap
+# are dropped
+MCQ_CHUNK_SECONDS = env.int('MCQ_CHUNK_SECONDS', default=600)
+MCQ_MAX_CHUNKS = env.int('MCQ_MAX_CHUNKS', default=8)
+MCQ_PARALLEL_CHUNKS = env.int('MCQ_PARALLEL_CHUNKS', default=4)
+MCQ_CHUNKED_MIN_SECONDS = env.int('MCQ_CHUNKED_MIN_SECONDS', default=1200)
+MCQ_DUPLICATE_SIMILARITY = env.float('MCQ_DUPLICATE_SIMILARITY', default=0.6)
+
+# MCQ generation jobs (python manage.py run_mcq_worker): a failed job is
+# retried with backoff up to MCQ_JOB_MAX_ATTEMPTS times; a running job whose
+# worker died is picked up again after MCQ_JOB_STALE_AFTER_SECONDS
+MCQ_JOB_MAX_ATTEMPTS = env.int('MCQ_JOB_MAX_ATTEMPTS', default=3)
+MCQ_JOB_STALE_AFTER_SECONDS = env.int('MCQ_JOB_STALE_AFTER_SECONDS', default=10 * 60)
+
+# Shared per-video MCQ bank (app/mcq_bank.py): sessions draw unseen questions
+# from it and only an exhausted bank is topped up with a new generation; other
+# workers wait up to MCQ_BANK_TOP_UP_TIMEOUT seconds for a top-up in progress
+MCQ_BANK_TOP_UP_TIMEOUT = env.int('MCQ_BANK_TOP_UP_TIMEOUT', default=300)
+
+# Outbound HTTP (app/http_client.py): pooled sessions per host
+HTTP_CONNECT_TIMEOUT = env.float('HTTP_CONNECT_TIMEOUT', default=3.05)
+HTTP_READ_TIMEOUT = env.float('HTTP_READ_TIMEOUT', default=20)
+HTTP_POOL_MAXSIZE = env.int('HTTP_POOL_MAXSIZE', default=20)
+HTTP_MAX_RETRIES = env.int('HTTP_MAX_RETRIES', default=2)
+
+# Background ingestion queue (python manage.py run_ingestion_worker)
+INGESTION_MAX_ATTEMPTS = env.int('INGESTION_MAX_ATTEMPTS', default=5)
+INGESTION_BACKOFF_SECONDS = env.int('INGESTION_BACKOFF_SECONDS', default=30)
+INGESTION_STALE_AFTER_SECONDS = env.int('INGESTION_STALE_AFTER_SECONDS', default=10 * 60)
 
 
 
@@ -18,7 +18,7 @@ from .serializers import (
 )
 
 import logging
-import requests
+from app import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -116,7 +116,7 @@ class LogoutView(APIView):
 
 def revoke_google_token(token):
     url = "https://oauth2.googleapis.com/revoke"
-    response = requests.post(url, data={"token": token})
+    response = http_client.post(url, data={"token": token})
     if response.status_code != 200:
         raise Exception("Failed to revoke token.")
 